@@ -0,0 +1,138 @@
+import pytest
+
+from petlib.bn import Bn
+
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.exceptions import ValidationError
+from zksk.pairings import BilinearGroupPair
+from zksk.primitives.baseu_rangeproof import (
+    BaseURangeStmt,
+    DigitSignatures,
+    choose_base,
+    decompose_into_digits,
+    estimate_proof_size,
+)
+
+
+@pytest.fixture(scope="module")
+def bp():
+    return BilinearGroupPair()
+
+
+@pytest.fixture
+def commitment(bp):
+    g = bp.G1.generator()
+    h = bp.G1.hash_to_point(b"h")
+
+    def make(value):
+        x = Secret(value=value)
+        r = Secret(value=bp.G1.order().random())
+        return x, r, x.value * g + r.value * h
+
+    return g, h, make
+
+
+@pytest.mark.parametrize(
+    "base,lo,hi,value", [(2, 0, 16, 0), (4, 0, 16, 15), (5, 3, 40, 17), (16, 6, 2 ** 20, 99)]
+)
+def test_baseu_range_stmt(bp, commitment, base, lo, hi, value):
+    g, h, make = commitment
+    x, r, com = make(value)
+    signatures = DigitSignatures.generate(bp, base)
+    stmt = BaseURangeStmt(com, g, h, lo, hi, x, r, signatures)
+    nizk = NIZK.deserialize(stmt.prove().serialize())
+    verifier = BaseURangeStmt(com, g, h, lo, hi, Secret(), Secret(), signatures)
+    assert verifier.verify(nizk)
+
+
+def test_baseu_range_stmt_outside_range(bp, commitment):
+    g, h, make = commitment
+    x, r, com = make(16)
+    signatures = DigitSignatures.generate(bp, 4)
+    with pytest.warns(UserWarning):
+        stmt = BaseURangeStmt(com, g, h, 0, 16, x, r, signatures)
+    with pytest.raises(ValueError):
+        stmt.prove()
+
+
+def rehash(stmt, nizk):
+    # Let the statement hash match, to reach the checks of the range proof itself.
+    stmt.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = stmt.prehash_statement().digest()
+
+
+def test_baseu_range_stmt_neutral_signature(bp, commitment):
+    g, h, make = commitment
+    x, r, com = make(5)
+    signatures = DigitSignatures.generate(bp, 4)
+    nizk = BaseURangeStmt(com, g, h, 0, 16, x, r, signatures).prove()
+    nizk.precommitment["V"][0] = bp.G1.infinite()
+    verifier = BaseURangeStmt(com, g, h, 0, 16, Secret(), Secret(), signatures)
+    rehash(verifier, nizk)
+    with pytest.raises(ValidationError):
+        verifier.verify(nizk)
+
+
+def test_baseu_range_stmt_in_conjunction(bp, commitment):
+    g, h, make = commitment
+    x, r, com = make(7)
+    k = bp.G1.hash_to_point(b"k")
+    signatures = DigitSignatures.generate(bp, 4)
+    stmt = DLRep(7 * k, x * k) & BaseURangeStmt(com, g, h, 0, 16, x, r, signatures)
+    nizk = stmt.prove()
+
+    x_prime, r_prime = Secret(), Secret()
+    verifier = DLRep(7 * k, x_prime * k) & BaseURangeStmt(
+        com, g, h, 0, 16, x_prime, r_prime, signatures
+    )
+    assert verifier.verify(nizk)
+
+
+def test_baseu_range_stmt_in_or_proof(bp, commitment):
+    g, h, make = commitment
+    x, r, com = make(20)
+    k = bp.G1.hash_to_point(b"k")
+    y = Secret(value=3)
+    signatures = DigitSignatures.generate(bp, 4)
+    stmt = BaseURangeStmt(com, g, h, 0, 16, x, r, signatures) | DLRep(
+        3 * k, y * k
+    )
+    stmt.subproofs[0].set_simulated()
+    nizk = stmt.prove()
+
+    verifier = BaseURangeStmt(
+        com, g, h, 0, 16, Secret(), Secret(), signatures
+    ) | DLRep(3 * k, Secret() * k)
+    assert verifier.verify(nizk)
+
+
+def test_digit_signatures_verify(bp):
+    signatures = DigitSignatures.generate(bp, 3)
+    assert signatures.verify()
+    signatures.signatures[1] = signatures.signatures[2]
+    assert not signatures.verify()
+
+
+def test_decompose_into_digits():
+    assert decompose_into_digits(10, 3, 4) == [1, 0, 1, 0]
+    assert decompose_into_digits(Bn(2) ** 64 - 1, 2 ** 16, 4) == [2 ** 16 - 1] * 4
+    with pytest.raises(ValueError):
+        decompose_into_digits(16, 2, 4)
+
+
+def test_choose_base():
+    assert choose_base(0, 2 ** 64) == 2 ** 16
+    assert choose_base(0, 2 ** 64, max_base=256) == 256
+    assert choose_base(0, 2 ** 32, num_proofs=100) == 256
+    assert choose_base(0, 2 ** 64, objective="time", num_proofs=1) == 16
+    with pytest.raises(ValueError):
+        choose_base(0, 2 ** 64, objective="memory")
+    with pytest.raises(ValueError):
+        choose_base(5, 5)
+
+
+def test_estimate_proof_size():
+    # An exact power needs a single decomposition.
+    assert estimate_proof_size(0, 2 ** 16, 16) * 2 == estimate_proof_size(0, 2 ** 16 - 1, 16)
+    assert estimate_proof_size(0, 2 ** 64, 2 ** 16) < estimate_proof_size(0, 2 ** 64, 2)
@@ -1,9 +1,16 @@
+import struct
+
+import msgpack
+import pytest
+
 from petlib.bn import Bn
 
-from zksk import Secret
-from zksk.pairings import BilinearGroupPair
-from zksk.primitives.bbsplus import BBSPlusKeypair, BBSPlusSignatureCreator
-from zksk.primitives.bbsplus import BBSPlusSignatureStmt
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.exceptions import StatementMismatch, ValidationError
+from zksk.pairings import BilinearGroupPair, PreparedG2Point
+from zksk.primitives.bbsplus import BBSPlusKeypair, BBSPlusPublicKey, BBSPlusSignatureCreator
+from zksk.primitives.bbsplus import BBSPlusSignatureStmt, BBSPlusPairingFreeStmt
 
 
 def test_signature_setup():
@@ -20,6 +27,87 @@ def test_signature_setup():
     signature = creator.obtain_signature(presignature)
 
     assert com.verify_blinding(pk) and signature.verify_signature(pk, messages)
+    assert isinstance(pk.w, PreparedG2Point) and isinstance(pk.h0, PreparedG2Point)
+
+
+def sign_many(keypair, message_lists):
+    signatures = []
+    for messages in message_lists:
+        creator = BBSPlusSignatureCreator(keypair.pk)
+        com = creator.commit(messages, zkp=False)
+        signatures.append(creator.obtain_signature(keypair.sk.sign(com.com_message)))
+    return signatures
+
+
+def test_verify_many():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    message_lists = [[Bn(30), Bn(31)], [Bn(12)], [Bn(1), Bn(2), Bn(3), Bn(4)]]
+    signatures = sign_many(keypair, message_lists)
+    assert keypair.pk.verify_many(signatures, message_lists)
+
+    message_lists[1] = [Bn(13)]
+    assert not signatures[1].verify_signature(keypair.pk, message_lists[1])
+    assert not keypair.pk.verify_many(signatures, message_lists)
+
+
+def test_sign_many():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    message_lists = [[Bn(30), Bn(31)], [Bn(12)], [Bn(1), Bn(2), Bn(3)], [Bn(4)]]
+    creators = [BBSPlusSignatureCreator(keypair.pk) for _ in message_lists]
+    requests = [
+        creator.commit(messages, zkp=i != 1)
+        for i, (creator, messages) in enumerate(zip(creators, message_lists))
+    ]
+    presignatures = keypair.sk.sign_many(requests)
+    signatures = [
+        creator.obtain_signature(presignature)
+        for creator, presignature in zip(creators, presignatures)
+    ]
+    assert keypair.pk.verify_many(signatures, message_lists)
+    assert all(request.verify_blinding(keypair.pk) for request in requests[::2])
+
+
+def test_sign_many_reuses_table():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    creator = BBSPlusSignatureCreator(keypair.pk)
+    request = creator.commit([Bn(7)], zkp=False)
+    keypair.sk.sign_many([request])
+    table = keypair.sk._precomputed_g1()
+    presignature = keypair.sk.sign_many([request])[0]
+    assert keypair.sk._precomputed_g1() is table
+    assert creator.obtain_signature(presignature).verify_signature(keypair.pk, [Bn(7)])
+
+
+def test_sign_many_invalid_blinding():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    requests = [
+        BBSPlusSignatureCreator(keypair.pk).commit([Bn(i), Bn(i + 1)]) for i in range(4)
+    ]
+    requests[2].com_nizk_proof.responses[1] += 1
+    with pytest.raises(ValidationError):
+        keypair.sk.sign_many(requests)
+
+
+@pytest.mark.parametrize("with_pairings", [True, False])
+def test_public_key_serialization(with_pairings):
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 4)
+    messages = [Bn(30), Bn(31)]
+    signature = sign_many(keypair, [messages])[0]
+
+    pk = BBSPlusPublicKey.deserialize(keypair.pk.serialize(with_pairings=with_pairings))
+    assert pk.w == keypair.pk.w and pk.generators == keypair.pk.generators
+    assert pk.gen_pairs == keypair.pk.gen_pairs
+    assert signature.verify_signature(pk, messages)
+
+    secrets = [Secret() for _ in range(4)]
+    stmt = BBSPlusSignatureStmt(secrets, keypair.pk, signature)
+    nizk = stmt.prove(dict(zip(secrets, [signature.e, signature.s] + messages)))
+    assert BBSPlusSignatureStmt([Secret() for _ in range(4)], pk).verify(nizk)
 
 
 def test_signature_proof():
@@ -109,3 +197,87 @@ def test_bbsplus_and_range():
     stmt = p1 & p2
     proof = stmt.prove()
     assert stmt.verify(proof)
+
+
+def make_pairing_free_proof(keypair, messages):
+    signature = sign_many(keypair, [messages])[0]
+    secrets = [Secret() for _ in range(len(messages) + 2)]
+    stmt = BBSPlusPairingFreeStmt(secrets, keypair.pk, signature)
+    nizk = stmt.prove(dict(zip(secrets, [signature.e, signature.s] + messages)))
+    return nizk
+
+
+def test_pairing_free_proof():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    messages = [Bn(30), Bn(31), Bn(32)]
+    nizk = NIZK.deserialize(make_pairing_free_proof(keypair, messages).serialize())
+    stmt = BBSPlusPairingFreeStmt([Secret() for _ in range(5)], keypair.pk)
+    assert stmt.verify(nizk)
+
+
+def test_pairing_free_proof_not_binding():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    messages = [Bn(30), Bn(31)]
+    signature = sign_many(keypair, [messages])[0]
+    m1, m2 = Secret(messages[0]), Secret(messages[1])
+    g = mG.G1.hash_to_point(b"g")
+    stmt = BBSPlusPairingFreeStmt([m1, m2], keypair.pk, signature, binding=False) & DLRep(
+        30 * g, m1 * g
+    )
+    nizk = stmt.prove()
+
+    m1_prime = Secret()
+    verifier = BBSPlusPairingFreeStmt(
+        [m1_prime, Secret()], keypair.pk, binding=False
+    ) & DLRep(30 * g, m1_prime * g)
+    assert verifier.verify(nizk)
+
+
+def test_pairing_free_proof_wrong_signature():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    messages = [Bn(30), Bn(31), Bn(32)]
+    nizk = make_pairing_free_proof(keypair, messages)
+    nizk.precommitment["A_bar"] = nizk.precommitment["A_prime"]
+    stmt = BBSPlusPairingFreeStmt([Secret() for _ in range(5)], keypair.pk)
+    stmt.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = stmt.prehash_statement().digest()
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+def test_pairing_free_proof_other_key():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    other = BBSPlusKeypair.generate(mG, 9)
+    other.pk.generators = keypair.pk.generators
+    messages = [Bn(30), Bn(31), Bn(32)]
+    nizk = make_pairing_free_proof(keypair, messages)
+    stmt = BBSPlusPairingFreeStmt([Secret() for _ in range(5)], other.pk)
+    # The key is part of the statement hash.
+    with pytest.raises(StatementMismatch):
+        stmt.verify(nizk)
+
+    stmt.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = stmt.prehash_statement().digest()
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+def test_pairing_free_proof_lazy():
+    mG = BilinearGroupPair()
+    keypair = BBSPlusKeypair.generate(mG, 9)
+    other = BBSPlusKeypair.generate(mG, 9)
+    messages = [Bn(30), Bn(31), Bn(32)]
+    nizk = make_pairing_free_proof(keypair, messages)
+    stmt = BBSPlusPairingFreeStmt([Secret() for _ in range(5)], keypair.pk)
+    assert stmt.verify(NIZK.deserialize(nizk.serialize(), lazy=True))
+
+    # A point that is not on the curve, never decoded for the proofs of other keys.
+    junk = b"\x01" + struct.pack(">I", mG.bpgp.nid) + b"junk"
+    nizk.precommitment["d"] = msgpack.ExtType(111, junk)
+    stmt = BBSPlusPairingFreeStmt([Secret() for _ in range(5)], other.pk)
+    with pytest.raises(StatementMismatch):
+        stmt.verify(NIZK.deserialize(nizk.serialize(), lazy=True))
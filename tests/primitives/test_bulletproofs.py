@@ -0,0 +1,138 @@
+import pytest
+
+from petlib.bn import Bn
+
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.exceptions import ValidationError
+from zksk.primitives.bulletproofs import BulletproofRangeStmt
+from zksk.utils import make_generators
+
+
+def make_commitments(group, values):
+    g, h = make_generators(2, group)
+    xs = [Secret(value=v) for v in values]
+    rs = [Secret(value=group.order().random()) for _ in values]
+    coms = [(x * g + r * h).eval() for x, r in zip(xs, rs)]
+    return g, h, xs, rs, coms
+
+
+def verifier_stmt(coms, g, h, lo, hi):
+    return BulletproofRangeStmt(
+        coms, g, h, lo, hi, [Secret() for _ in coms], [Secret() for _ in coms]
+    )
+
+
+@pytest.mark.parametrize("lo,hi,value", [(0, 16, 0), (0, 16, 15), (6, 100, 99)])
+def test_bulletproof_range_stmt(group, lo, hi, value):
+    g, h, xs, rs, coms = make_commitments(group, [value])
+    stmt = BulletproofRangeStmt(coms[0], g, h, lo, hi, xs[0], rs[0])
+    nizk = NIZK.deserialize(stmt.prove().serialize())
+    assert verifier_stmt(coms, g, h, lo, hi).verify(nizk)
+
+
+def test_bulletproof_range_stmt_64_bits(group):
+    g, h, xs, rs, coms = make_commitments(group, [2 ** 64 - 1])
+    stmt = BulletproofRangeStmt(coms, g, h, 0, Bn(2) ** 64, xs, rs)
+    nizk = stmt.prove()
+    assert len(nizk.serialize()) < 1024
+    assert verifier_stmt(coms, g, h, 0, Bn(2) ** 64).verify(nizk)
+
+
+def test_bulletproof_range_stmt_aggregated(group):
+    g, h, xs, rs, coms = make_commitments(group, [3, 10, 42])
+    stmt = BulletproofRangeStmt(coms, g, h, 2, 50, xs, rs)
+    nizk = stmt.prove()
+    assert verifier_stmt(coms, g, h, 2, 50).verify(nizk)
+
+
+def test_bulletproof_range_stmt_outside_range(group):
+    g, h, xs, rs, coms = make_commitments(group, [16])
+    with pytest.warns(UserWarning):
+        stmt = BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs)
+    nizk = stmt.prove()
+    with pytest.raises(ValidationError):
+        verifier_stmt(coms, g, h, 0, 16).verify(nizk)
+
+
+def test_bulletproof_range_stmt_wrapping_range(group):
+    # -1 is in [0, 2^256) modulo the order of the group.
+    g, h, xs, rs, coms = make_commitments(group, [group.order() - 1])
+    with pytest.raises(ValueError):
+        BulletproofRangeStmt(coms, g, h, 0, Bn(2) ** 129, xs, rs)
+    with pytest.raises(ValueError):
+        verifier_stmt(coms, g, h, 0, Bn(2) ** 129)
+    with pytest.raises(ValueError):
+        verifier_stmt(coms * 4, g, h, 0, Bn(2) ** 64)
+
+    with pytest.warns(UserWarning):
+        stmt = BulletproofRangeStmt(coms, g, h, 0, Bn(2) ** 64, xs, rs)
+    nizk = stmt.prove()
+    with pytest.raises(ValidationError):
+        verifier_stmt(coms, g, h, 0, Bn(2) ** 64).verify(nizk)
+
+
+def rehash(stmt, nizk):
+    # Let the statement hash match, to reach the checks of the range proof itself.
+    stmt.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = stmt.prehash_statement().digest()
+
+
+def test_bulletproof_range_stmt_wrong_commitment(group):
+    g, h, xs, rs, coms = make_commitments(group, [5])
+    nizk = BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs).prove()
+    stmt = verifier_stmt([coms[0] + g], g, h, 0, 16)
+    rehash(stmt, nizk)
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+def test_bulletproof_range_stmt_tampered_proof(group):
+    g, h, xs, rs, coms = make_commitments(group, [5])
+    nizk = BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs).prove()
+    nizk.precommitment["t"] += 1
+    stmt = verifier_stmt(coms, g, h, 0, 16)
+    rehash(stmt, nizk)
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+def test_bulletproof_range_stmt_malformed_proof(group):
+    g, h, xs, rs, coms = make_commitments(group, [5])
+    nizk = BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs).prove()
+    nizk.precommitment["L"].pop()
+    stmt = verifier_stmt(coms, g, h, 0, 16)
+    rehash(stmt, nizk)
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+@pytest.mark.parametrize("key,value", [("A", 5), ("L", [1, 2])])
+def test_bulletproof_range_stmt_non_point_values(group, key, value):
+    g, h, xs, rs, coms = make_commitments(group, [5])
+    nizk = BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs).prove()
+    nizk.precommitment[key] = value
+    stmt = verifier_stmt(coms, g, h, 0, 16)
+    rehash(stmt, nizk)
+    with pytest.raises(ValidationError):
+        stmt.verify(nizk)
+
+
+def test_bulletproof_range_stmt_in_conjunction(group):
+    g, h, xs, rs, coms = make_commitments(group, [7])
+    k = make_generators(3, group)[2]
+    x = xs[0]
+    stmt = DLRep(7 * k, x * k) & BulletproofRangeStmt(coms, g, h, 0, 16, xs, rs)
+    nizk = stmt.prove()
+
+    x_prime, r_prime = Secret(), Secret()
+    verifier = DLRep(7 * k, x_prime * k) & BulletproofRangeStmt(
+        coms, g, h, 0, 16, [x_prime], [r_prime]
+    )
+    assert verifier.verify(nizk)
+
+
+def test_bulletproof_range_stmt_empty_range(group):
+    g, h, xs, rs, coms = make_commitments(group, [5])
+    with pytest.raises(ValueError):
+        BulletproofRangeStmt(coms, g, h, 5, 5, xs, rs)
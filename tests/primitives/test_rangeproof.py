@@ -4,16 +4,24 @@ Unit tests for rangeproofs.
 TODO: Add tests for failure conditions of PowerTwoRangeStmt
 
 """
+import functools
+
+import msgpack
 import pytest
 
 from petlib.bn import Bn
 from petlib.ec import EcGroup
 
-from zksk import Secret
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.batch import verify_many
+from zksk.composition import AndProofStmt
 from zksk.pairings import BilinearGroupPair
 from zksk.primitives.rangeproof import PowerTwoRangeStmt, RangeStmt, RangeOnlyStmt
+from zksk.primitives.rangeproof import MultiRangeStmt
 from zksk.primitives.rangeproof import decompose_into_n_bits
-from zksk.utils import make_generators
+from zksk.exceptions import InconsistentChallengeError, StatementMismatch, ValidationError
+from zksk.utils import make_generators, ensure_bn
 from zksk.utils.debug import SigmaProtocol
 
 
@@ -83,6 +91,174 @@ def test_power_two_range_stmt_interactive():
     verifier.stmt.full_validate()
 
 
+def construct_tree_stmt(stmt, precommitment):
+    # The bit proofs, built as a tree of and/or-proofs.
+    if stmt.is_prover:
+        bits = decompose_into_n_bits(ensure_bn(stmt.x.value), stmt.num_bits)
+    bit_proofs = []
+    for i, r in enumerate(stmt.randomizers):
+        p0 = DLRep(precommitment["Cs"][i], r * stmt.h)
+        p1 = DLRep(precommitment["Cs"][i] - stmt.g, r * stmt.h)
+        if stmt.is_prover:
+            p0.set_simulated(bits[i] == 1)
+            p1.set_simulated(bits[i] == 0)
+        bit_proofs.append(p0 | p1)
+    return AndProofStmt(*bit_proofs)
+
+
+def TreePowerTwoRangeStmt(*args):
+    stmt = PowerTwoRangeStmt(*args)
+    stmt.construct_stmt = functools.partial(construct_tree_stmt, stmt)
+    return stmt
+
+
+@pytest.mark.parametrize("include_commitment", [False, True])
+def test_power_two_range_stmt_tree_compatible(group, include_commitment):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    for prover_cls, verifier_cls in [
+        (PowerTwoRangeStmt, TreePowerTwoRangeStmt),
+        (TreePowerTwoRangeStmt, PowerTwoRangeStmt),
+    ]:
+        prover = prover_cls(com, g, h, 5, x, r)
+        nizk = prover.prove(include_commitment=include_commitment)
+        verifier = verifier_cls(com, g, h, 5, Secret(), Secret())
+        assert verifier.verify(NIZK.deserialize(nizk.serialize()))
+
+
+def test_power_two_range_stmt_same_digest_as_tree(group):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    stmt = PowerTwoRangeStmt(com, g, h, 5, x, r)
+    tree = TreePowerTwoRangeStmt(com, g, h, 5, x, r)
+    tree.randomizers = stmt.randomizers
+    precommitment = stmt._precommit()
+    stmt.full_construct_stmt(precommitment)
+    tree.full_construct_stmt(precommitment)
+    assert stmt.get_proof_id() == tree.get_proof_id()
+    assert stmt.get_digest() == tree.get_digest()
+
+
+def test_power_two_range_stmt_in_or_proof(group):
+    g, h, k = make_generators(3, group)
+    x = Secret(value=Bn(40))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+    y = Secret(value=3)
+
+    with pytest.warns(UserWarning):
+        range_stmt = PowerTwoRangeStmt(com, g, h, 5, x, r)
+    range_stmt.set_simulated()
+    stmt = range_stmt | DLRep(3 * k, y * k)
+    nizk = stmt.prove()
+
+    verifier = PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret()) | DLRep(
+        3 * k, Secret() * k
+    )
+    assert verifier.verify(nizk)
+
+
+def test_power_two_range_stmt_inconsistent_challenges(group):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove()
+    nizk.responses[0][0][0] += 1
+    with pytest.raises(InconsistentChallengeError):
+        PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret()).verify(nizk)
+
+
+@pytest.mark.parametrize("include_commitment", [False, True])
+def test_power_two_range_stmt_truncated_responses(group, include_commitment):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove(
+        include_commitment=include_commitment
+    )
+    nizk.responses = nizk.responses[:-1]
+    verifier = PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret())
+    if include_commitment:
+        # Proofs that carry their commitment are rejected with the checks of the commitment.
+        nizk.commitment = nizk.commitment[:-1]
+        assert not verifier.verify(nizk)
+    else:
+        with pytest.raises(ValidationError):
+            verifier.verify(nizk)
+
+
+def test_power_two_range_stmt_malformed_bit_proof(group):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove()
+    challenges, responses = nizk.responses[0]
+    nizk.responses[0] = (challenges, [responses[0], []])
+    with pytest.raises(ValidationError):
+        PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret()).verify(nizk)
+
+
+def test_power_two_range_stmt_wrong_number_of_commitments(group):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove()
+    nizk.precommitment["Cs"].append(group.infinite())
+    verifier = PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret())
+    verifier.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = verifier.prehash_statement().digest()
+    with pytest.raises(ValidationError):
+        verifier.verify(nizk)
+
+
+@pytest.mark.parametrize("include_commitment", [False, True])
+def test_power_two_range_stmt_lazy(group, include_commitment):
+    g, h = make_generators(2, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove(include_commitment=include_commitment)
+    data = nizk.serialize()
+    verifier = PowerTwoRangeStmt(com, g, h, 5, Secret(), Secret())
+    assert verifier.verify(NIZK.deserialize(data, lazy=True))
+    assert verify_many([verifier], [NIZK.deserialize(data, lazy=True)]) == [True]
+
+
+def test_power_two_range_stmt_lazy_checks_statement_first(group):
+    g, h, k = make_generators(3, group)
+    x = Secret(value=Bn(10))
+    r = Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+
+    nizk = PowerTwoRangeStmt(com, g, h, 5, x, r).prove(include_commitment=True)
+    # Bit commitments that are not points.
+    junk = msgpack.ExtType(2, msgpack.packb((group.nid(), b"junk")))
+    nizk.precommitment["Cs"] = [junk] * 5
+    data = nizk.serialize()
+    with pytest.raises(Exception):
+        NIZK.deserialize(data)
+
+    other = PowerTwoRangeStmt(com, g, k, 5, Secret(), Secret())
+    with pytest.raises(StatementMismatch):
+        other.verify(NIZK.deserialize(data, lazy=True))
+    assert verify_many([other], [NIZK.deserialize(data, lazy=True)]) == [False]
+
+
 def test_range_stmt_non_interactive_start_at_zero(group):
     x = Secret(value=3)
     randomizer = Secret(value=group.order().random())
@@ -129,6 +305,23 @@ def test_range_stmt_non_interactive_start_at_nonzero(group):
     assert stmt2.verify(tr)
 
 
+def test_range_stmt_non_interactive_with_commitment(group):
+    x = Secret(value=14)
+    randomizer = Secret(value=group.order().random())
+
+    g, h = make_generators(2, group)
+    lo = 6
+    hi = 16
+
+    com = x * g + randomizer * h
+
+    stmt1 = RangeStmt(com.eval(), g, h, lo, hi, x, randomizer)
+    tr = NIZK.deserialize(stmt1.prove(include_commitment=True).serialize())
+
+    stmt2 = RangeStmt(com.eval(), g, h, lo, hi, Secret(), Secret())
+    assert stmt2.verify(tr)
+
+
 def test_range_stmt_non_interactive_outside_range(group):
     x = Secret(value=15)
     randomizer = Secret(value=group.order().random())
@@ -204,3 +397,106 @@ def test_range_proof_outside_range_below():
         stmt = RangeOnlyStmt(lo, hi, x)
         nizk = stmt.prove()
         stmt.verify(nizk)
+
+
+def test_range_proof_with_executor():
+    from concurrent.futures import ThreadPoolExecutor
+
+    x = Secret(value=7)
+    stmt = RangeOnlyStmt(0, 2 ** 16, x)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        nizk = stmt.prove(executor=executor)
+    assert stmt.verify(nizk)
+
+
+def test_range_proof_many():
+    xs = [Secret(value=v) for v in [0, 3, 99]]
+    stmts = RangeOnlyStmt.many(0, 100, xs)
+    assert len(stmts) == 3
+    for stmt in stmts:
+        assert stmt.verify(stmt.prove())
+
+
+def test_range_proof_generators_are_cached():
+    stmt1 = RangeOnlyStmt(0, 10, Secret(value=3))
+    stmt2 = RangeOnlyStmt(0, 10, Secret(value=4))
+    assert stmt1.subproofs[1].g is stmt2.subproofs[1].g
+    assert stmt1.subproofs[1].h is stmt2.subproofs[1].h
+
+
+def make_multi_range_stmts(group, values, lo, hi):
+    g, h = make_generators(2, group)
+    xs = [Secret(value=v) for v in values]
+    rs = [Secret(value=group.order().random()) for _ in values]
+    coms = [(x * g + r * h).eval() for x, r in zip(xs, rs)]
+    prover = MultiRangeStmt(coms, g, h, lo, hi, xs, rs)
+    verifier = MultiRangeStmt(
+        coms, g, h, lo, hi, [Secret() for _ in coms], [Secret() for _ in coms]
+    )
+    return prover, verifier
+
+
+@pytest.mark.parametrize(
+    "lo,hi,values",
+    [(0, 16, [0, 5, 15]), (6, 100, [6, 50, 99]), ([0, 5, 10], [16, 6, 2 ** 40], [6, 5, 15])],
+)
+def test_multi_range_stmt(group, lo, hi, values):
+    prover, verifier = make_multi_range_stmts(group, values, lo, hi)
+    nizk = NIZK.deserialize(prover.prove().serialize())
+    assert verifier.verify(nizk)
+
+
+def test_multi_range_stmt_with_commitment(group):
+    prover, verifier = make_multi_range_stmts(group, [7, 8], 6, 100)
+    nizk = prover.prove(include_commitment=True)
+    assert verifier.verify(NIZK.deserialize(nizk.serialize()))
+
+
+def test_multi_range_stmt_outside_range(group):
+    with pytest.warns(UserWarning):
+        prover, _ = make_multi_range_stmts(group, [5, 16], 0, 16)
+    with pytest.raises(Exception):
+        prover.prove()
+
+
+def test_multi_range_stmt_wrong_randomizers(group):
+    prover, verifier = make_multi_range_stmts(group, [5, 9], 0, 10)
+    nizk = prover.prove()
+    nizk.precommitment["rands"][1] += 1
+    verifier.full_construct_stmt(nizk.precommitment)
+    nizk.stmt_hash = verifier.prehash_statement().digest()
+    with pytest.raises(ValidationError):
+        verifier.verify(nizk)
+
+
+@pytest.mark.parametrize("include_commitment", [False, True])
+def test_multi_range_stmt_truncated_responses(group, include_commitment):
+    prover, verifier = make_multi_range_stmts(group, [5, 9], 0, 10)
+    nizk = prover.prove(include_commitment=include_commitment)
+    nizk.responses[-1] = nizk.responses[-1][:-1]
+    if include_commitment:
+        nizk.commitment[-1] = nizk.commitment[-1][:-1]
+        assert not verifier.verify(nizk)
+    else:
+        with pytest.raises(ValidationError):
+            verifier.verify(nizk)
+
+
+def test_multi_range_stmt_mismatching_bounds(group):
+    g, h = make_generators(2, group)
+    with pytest.raises(ValueError):
+        MultiRangeStmt([g, h], g, h, [0], 10, [Secret(), Secret()], [Secret(), Secret()])
+
+
+def test_multi_range_stmt_in_conjunction(group):
+    g, h, k = make_generators(3, group)
+    x, r = Secret(value=7), Secret(value=group.order().random())
+    com = (x * g + r * h).eval()
+    stmt = DLRep(7 * k, x * k) & MultiRangeStmt([com], g, h, 0, 10, [x], [r])
+    nizk = stmt.prove()
+
+    x_prime = Secret()
+    verifier = DLRep(7 * k, x_prime * k) & MultiRangeStmt(
+        [com], g, h, 0, 10, [x_prime], [Secret()]
+    )
+    assert verifier.verify(nizk)
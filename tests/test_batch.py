@@ -0,0 +1,139 @@
+import pytest
+
+from petlib.ec import EcGroup
+
+from zksk import Secret, DLRep
+from zksk.base import build_fiat_shamir_challenge
+from zksk.batch import verify_many
+from zksk.utils import make_generators
+
+
+@pytest.fixture
+def proofs(group):
+    g, h = make_generators(2, group)
+    x, r = Secret(), Secret()
+    stmts = []
+    nizks = []
+    for i in range(8):
+        stmt = DLRep((i + 1) * g + (i + 2) * h, x * g + r * h)
+        stmts.append(stmt)
+        nizks.append(stmt.prove({x: i + 1, r: i + 2}, include_commitment=True))
+    return stmts, nizks
+
+
+def test_verify_many_all_valid(proofs):
+    stmts, nizks = proofs
+    assert verify_many(stmts, nizks) == [True] * len(nizks)
+
+
+def test_verify_many_finds_invalid_proofs(proofs):
+    stmts, nizks = proofs
+    nizks[2].responses[1] += 1
+    nizks[5].responses[0] += 1
+    expected = [True] * len(nizks)
+    expected[2] = expected[5] = False
+    assert verify_many(stmts, nizks) == expected
+
+
+def test_verify_many_rejects_forged_commitment(group, proofs):
+    stmts, nizks = proofs
+    nizks[3].commitment = nizks[3].commitment + group.generator()
+    expected = [True] * len(nizks)
+    expected[3] = False
+    assert verify_many(stmts, nizks) == expected
+
+
+def set_commitment(stmt, nizk, commitment):
+    # Let the challenge match the commitment, to reach the checks of the commitment itself.
+    nizk.commitment = commitment
+    nizk.challenge = build_fiat_shamir_challenge(stmt.prehash_statement(), None, commitment)
+
+
+@pytest.mark.parametrize(
+    "junk", [5, EcGroup(714).generator(), [], None], ids=["int", "other-curve", "list", "none"]
+)
+def test_verify_many_rejects_junk_commitment(proofs, junk):
+    stmts, nizks = proofs
+    set_commitment(stmts[3], nizks[3], junk)
+    expected = [True] * len(nizks)
+    expected[3] = False
+    assert verify_many(stmts, nizks) == expected
+
+
+def test_verify_many_rejects_junk_composed_commitment(group):
+    g, h = make_generators(2, group)
+    stmts = []
+    nizks = []
+    for _ in range(4):
+        x, y, z = Secret(), Secret(), Secret()
+        stmt = (DLRep(3 * g, x * g) | DLRep(4 * h, y * h)) & DLRep(5 * h, z * h)
+        stmts.append(stmt)
+        nizks.append(stmt.prove({x: 3, z: 5}, include_commitment=True))
+    set_commitment(stmts[0], nizks[0], 5)
+    set_commitment(stmts[1], nizks[1], [5, 5])
+    set_commitment(stmts[2], nizks[2], [[g], nizks[2].commitment[1]])
+    assert verify_many(stmts, nizks) == [False, False, False, True]
+
+
+def test_verify_many_rejects_mismatched_statement(proofs):
+    stmts, nizks = proofs
+    stmts[0], stmts[1] = stmts[1], stmts[0]
+    assert verify_many(stmts, nizks) == [False, False] + [True] * (len(nizks) - 2)
+
+
+def test_verify_many_with_messages(proofs):
+    stmts, nizks = proofs
+    x, r = stmts[0].secret_vars
+    stmt = stmts[0]
+    signed = stmt.prove({x: 1, r: 2}, message="signed", include_commitment=True)
+    assert verify_many([stmt, stmt], [signed, signed], ["signed", "other"]) == [
+        True,
+        False,
+    ]
+
+
+def test_verify_many_without_commitments(group):
+    g, h = make_generators(2, group)
+    x = Secret()
+    stmts = [DLRep(3 * g, x * g), DLRep(4 * h, x * h)]
+    nizks = [stmts[0].prove({x: 3}), stmts[1].prove({x: 4})]
+    assert nizks[0].commitment is None
+    nizks[1].responses[0] += 1
+    assert verify_many(stmts, nizks) == [True, False]
+
+
+def test_verify_many_length_mismatch(proofs):
+    stmts, nizks = proofs
+    with pytest.raises(ValueError):
+        verify_many(stmts, nizks[:-1])
+
+
+def test_verify_many_and_or_proofs(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    stmts = []
+    nizks = []
+    for i in range(4):
+        stmt = (DLRep(i * g, x * g) | DLRep(i * h, y * h)) & DLRep(
+            (i + 1) * h, Secret() * h
+        )
+        secrets = {x: i, stmt.subproofs[1].secret_vars[0]: i + 1}
+        stmts.append(stmt)
+        nizks.append(stmt.prove(secrets, include_commitment=True))
+
+    assert verify_many(stmts, nizks) == [True] * 4
+
+    # Shift the responses of one or-clause: each equation must hold on its own.
+    or_responses = nizks[1].responses[0][1]
+    or_responses[0][0] += 1
+    or_responses[1][0] -= 1
+    assert verify_many(stmts, nizks) == [True, False, True, True]
+
+
+def test_verify_many_inconsistent_or_challenges(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    stmt = DLRep(3 * g, x * g) | DLRep(4 * h, y * h)
+    nizk = stmt.prove({x: 3}, include_commitment=True)
+    nizk.responses[0][0] += 1
+    assert verify_many([stmt], [nizk]) == [False]
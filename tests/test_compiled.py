@@ -0,0 +1,109 @@
+import pytest
+
+from zksk import Secret, DLRep
+from zksk.batch import verify_many
+from zksk.exceptions import InvalidSecretsError
+from zksk.primitives.dl_notequal import DLNotEqual
+from zksk.utils import make_generators
+
+
+@pytest.fixture
+def shape(group):
+    g, h, k = make_generators(3, group)
+    x, r, s = Secret(), Secret(), Secret()
+
+    def make_stmt(i):
+        return DLRep(i * g + 2 * h, x * g + r * h) & DLRep(
+            i * h + 5 * k, x * h + s * k
+        )
+
+    def secrets(i):
+        return {x: i, r: 2, s: 5}
+
+    def lhs(i):
+        return [i * g + 2 * h, i * h + 5 * k]
+
+    return make_stmt, secrets, lhs
+
+
+def test_compiled_proofs_match_statements(shape):
+    make_stmt, secrets, lhs = shape
+    template = make_stmt(1).compile()
+    for i in range(2, 5):
+        nizk = template.prove(secrets(i), lhs=lhs(i))
+        assert template.verify(nizk, lhs=lhs(i))
+        assert make_stmt(i).verify(nizk)
+        assert template.verify(make_stmt(i).prove(secrets(i)), lhs=lhs(i))
+
+
+def test_compiled_digest_matches_statement(shape):
+    make_stmt, _, lhs = shape
+    template = make_stmt(1).compile()
+    stmt = template.instantiate(lhs(7))
+    assert stmt.prehash_statement().digest() == make_stmt(7).prehash_statement().digest()
+
+
+def test_compiled_default_lhs(shape):
+    make_stmt, secrets, lhs = shape
+    template = make_stmt(3).compile()
+    assert list(template.lhs) == lhs(3)
+    assert template.verify(template.prove(secrets(3)))
+
+
+def test_compiled_template_is_not_modified(shape):
+    make_stmt, secrets, lhs = shape
+    stmt = make_stmt(1)
+    template = stmt.compile()
+    template.prove(secrets(4), lhs=lhs(4))
+    stmt.subproofs[0].lhs = lhs(4)[0]
+    assert list(template.lhs) == lhs(1)
+
+
+def test_compiled_instances_batch_verify(shape):
+    make_stmt, secrets, lhs = shape
+    template = make_stmt(1).compile()
+    stmts = [template.instantiate(lhs(i)) for i in range(4)]
+    nizks = [
+        template.prove(secrets(i), lhs=lhs(i), include_commitment=True)
+        for i in range(4)
+    ]
+    nizks[2].responses[0][0] += 1
+    assert verify_many(stmts, nizks) == [True, True, False, True]
+
+
+def test_compiled_wrong_number_of_lhs(shape):
+    make_stmt, _, lhs = shape
+    template = make_stmt(1).compile()
+    with pytest.raises(ValueError):
+        template.instantiate(lhs(1)[:1])
+
+
+def test_compiled_or_proof(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    template = (DLRep(g, x * g) | DLRep(h, y * h)).compile()
+    for i in range(1, 4):
+        nizk = template.prove({x: i}, lhs=[i * g, 7 * h])
+        assert template.verify(nizk, lhs=[i * g, 7 * h])
+
+
+def test_compile_validates_composition(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    stmt = DLRep(g, x * g) & (DLRep(g, x * g) | DLRep(h, y * h))
+    with pytest.raises(InvalidSecretsError):
+        stmt.compile()
+
+
+def test_compiled_extended_proof(group):
+    g, h = make_generators(2, group)
+    x, r = Secret(), Secret()
+    y, y2, g2 = 3 * g, 397474 * g, 1397 * g
+    stmt = DLRep(3 * g + 4 * h, r * h + x * g) & DLNotEqual(
+        [y, g], [y2, g2], x, bind=True
+    )
+    template = stmt.compile()
+    for i in range(2):
+        lhs = [3 * g + (4 + i) * h]
+        nizk = template.prove({x: 3, r: 4 + i}, lhs=lhs)
+        assert template.verify(nizk, lhs=lhs)
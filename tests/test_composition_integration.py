@@ -1,9 +1,11 @@
 import random
 
+import msgpack
 import pytest
 
 from petlib.bn import Bn
 from petlib.ec import EcGroup
+from petlib.pack import encode
 
 from zksk import DLRep, Secret
 from zksk.exceptions import (
@@ -11,11 +13,13 @@ from zksk.exceptions import (
     InvalidSecretsError,
     ValidationError,
     GroupMismatchError,
+    StatementMismatch,
 )
 from zksk.composition import AndProofStmt, OrProofStmt
 from zksk.expr import wsum_secrets
 from zksk.utils import make_generators
-from zksk.base import NIZK
+from zksk.base import NIZK, LazyNIZK, build_fiat_shamir_challenge
+from zksk.batch import verify_many
 
 @pytest.fixture
 def params(group):
@@ -424,6 +428,95 @@ def test_or_non_interactive_fails_on_wrong_secrets(group, params):
     assert not p.verify(tr, message=message)
 
 
+@pytest.fixture
+def and_or_stmt(group, params):
+    p1, p2, secrets = params
+    g = group.generator()
+    x10 = Secret()
+    secrets.update({x10: 13})
+    return OrProofStmt(p1, p2) & DLRep(13 * g, x10 * g), secrets
+
+
+def test_and_or_non_interactive_with_commitment(and_or_stmt):
+    p, secrets = and_or_stmt
+    tr = p.prove(secrets, message="whatever", include_commitment=True)
+    assert len(tr.commitment) == 2
+    assert p.verify(tr, message="whatever")
+    assert not p.verify(tr, message="other")
+
+
+def test_and_or_non_interactive_with_commitment_serialization(and_or_stmt):
+    p, secrets = and_or_stmt
+    tr = p.prove(secrets, include_commitment=True)
+    tr_dec = NIZK.deserialize(tr.serialize())
+    assert tr_dec.commitment == tr.commitment
+    assert p.verify(tr_dec)
+
+    tr = p.prove(secrets)
+    assert NIZK.deserialize(tr.serialize()).commitment is None
+
+
+def test_lazy_deserialization(and_or_stmt):
+    p, secrets = and_or_stmt
+    tr = p.prove(secrets, include_commitment=True)
+    tr_dec = NIZK.deserialize(tr.serialize(), lazy=True)
+    assert isinstance(tr_dec, LazyNIZK)
+    assert p.verify(tr_dec)
+    assert tr_dec.commitment == tr.commitment
+    assert verify_many([p], [NIZK.deserialize(tr.serialize(), lazy=True)]) == [True]
+    assert NIZK.deserialize(p.prove(secrets).serialize(), lazy=True).commitment is None
+
+
+def test_lazy_deserialization_checks_statement_first(group, and_or_stmt):
+    p, secrets = and_or_stmt
+    fields = msgpack.unpackb(p.prove(secrets, include_commitment=True).serialize())
+    # A commitment that fails to decode.
+    fields[4] = encode([msgpack.ExtType(2, b"junk")])
+    data = msgpack.packb(fields, use_bin_type=True)
+    with pytest.raises(ValueError):
+        NIZK.deserialize(data)
+
+    g = group.generator()
+    other = DLRep(g, Secret() * g)
+    with pytest.raises(StatementMismatch):
+        other.verify(NIZK.deserialize(data, lazy=True))
+    assert verify_many([other], [NIZK.deserialize(data, lazy=True)]) == [False]
+
+
+def test_and_or_non_interactive_with_commitment_fails_on_wrong_commitment(
+    group, and_or_stmt
+):
+    p, secrets = and_or_stmt
+    tr = p.prove(secrets, include_commitment=True)
+    tr.commitment[0][1] = tr.commitment[0][1] + group.generator()
+    assert not p.verify(tr)
+
+
+@pytest.mark.parametrize(
+    "junk", [5, [5, 5], [None, None], "other-curve"], ids=["int", "ints", "nones", "other-curve"]
+)
+def test_and_non_interactive_with_junk_commitment(group, junk):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    p = DLRep(3 * g, x * g) & DLRep(4 * h, y * h)
+    tr = p.prove({x: 3, y: 4}, include_commitment=True)
+    if junk == "other-curve":
+        junk = [tr.commitment[0], EcGroup(714).generator()]
+    # The challenge matches the junk, so that only the checks of the commitment reject it.
+    tr.commitment = junk
+    tr.challenge = build_fiat_shamir_challenge(p.prehash_statement(), None, junk)
+    assert not p.verify(tr)
+
+
+def test_and_or_non_interactive_with_commitment_fails_on_wrong_secrets(
+    group, and_or_stmt
+):
+    p, secrets = and_or_stmt
+    bad_secrets = {k: group.order().random() for k in secrets}
+    tr = p.prove(bad_secrets, include_commitment=True)
+    assert not p.verify(tr)
+
+
 def test_malicious_and_proofs():
     x0 = Secret()
     x2 = Secret()
@@ -483,3 +576,95 @@ def test_invalid_or_composition_inside_two_or():
 
     with pytest.raises(InvalidSecretsError):
         st.prove()
+
+
+@pytest.fixture
+def and_tree(group):
+    generators = make_generators(8, group)
+    secrets = [Secret() for _ in range(8)]
+    values = {s: i + 2 for i, s in enumerate(secrets)}
+    leaves = [
+        DLRep(values[s] * g + values[t] * h, s * g + t * h)
+        for s, t, g, h in zip(secrets, secrets[1:], generators, generators[1:])
+    ]
+    y = Secret()
+    values[y] = 5
+    or_stmt = DLRep(5 * generators[0], y * generators[0]) | DLRep(
+        3 * generators[1], Secret() * generators[1]
+    )
+    stmt = AndProofStmt(AndProofStmt(*leaves[:4]), AndProofStmt(*leaves[4:]), or_stmt)
+    return stmt, values
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_and_proof_with_executor(and_tree, max_workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    stmt, values = and_tree
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        nizk = stmt.prove(values, executor=executor)
+    assert stmt.verify(nizk)
+
+
+def test_and_proof_with_executor_same_transcript(and_tree):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The true clause of an or-proof draws its own randomizers, so leave it out.
+    stmt = AndProofStmt(*and_tree[0].subproofs[:2])
+    values = and_tree[1]
+    randomizers = stmt.get_randomizers()
+    challenge = Bn(123456789)
+
+    prover = stmt.get_prover(values)
+    prover.precommit()
+    commitment = prover.internal_commit(randomizers)
+    responses = prover.compute_response(challenge)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        prover.executor = executor
+        prover.precommit()
+        assert prover.internal_commit(randomizers) == commitment
+        assert prover.compute_response(challenge) == responses
+
+
+def test_prove_rejects_process_pool(and_tree):
+    from concurrent.futures import ProcessPoolExecutor
+
+    stmt, values = and_tree
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(ValueError):
+            stmt.prove(values, executor=executor)
+
+
+def test_statement_digest_is_cached(params):
+    p1, p2, secrets = params
+    and_stmt = p1 & p2
+    digest = and_stmt.get_digest()
+    assert and_stmt.get_digest() is digest
+    assert and_stmt.prehash_statement().digest() == and_stmt.prehash_statement().digest()
+
+
+def test_statement_digest_tracks_changes(params):
+    p1, p2, secrets = params
+    and_stmt = p1 & p2
+    stmt_hash = and_stmt.prehash_statement().digest()
+
+    # Subproofs are copied by the and-proof.
+    sub = and_stmt.subproofs[1]
+    lhs = sub.lhs
+    sub.lhs = sub.lhs + sub.bases[0]
+    assert and_stmt.prehash_statement().digest() != stmt_hash
+    sub.lhs = lhs
+    assert and_stmt.prehash_statement().digest() == stmt_hash
+
+    and_stmt.subproofs = and_stmt.subproofs[::-1]
+    assert and_stmt.prehash_statement().digest() != stmt_hash
+
+
+def test_statement_digest_binds_shared_secrets(group):
+    g, h = make_generators(2, group)
+    x, y, z = Secret(), Secret(), Secret()
+    shared = DLRep(3 * g, x * g) & DLRep(3 * h, x * h)
+    distinct = DLRep(3 * g, y * g) & DLRep(3 * h, z * h)
+    assert shared.get_digest()[0] != distinct.get_digest()[0]
+    assert shared.prehash_statement().digest() != distinct.prehash_statement().digest()
@@ -0,0 +1,73 @@
+from hashlib import sha256
+
+import msgpack
+import pytest
+
+from petlib.bn import Bn
+from petlib.ec import POINT_CONVERSION_UNCOMPRESSED
+from petlib.pack import encode
+
+from zksk.exceptions import ValidationError
+from zksk.utils import make_generators
+from zksk.utils.encoding import canonical_encode, decode_points, unpack_lazily, update_hash
+from zksk.utils.fixedbase import precompute, PrecomputedBase
+
+
+def test_canonical_encode_numbers():
+    assert canonical_encode(5) == canonical_encode(Bn(5))
+    assert canonical_encode(-5) == canonical_encode(Bn(-5))
+    assert canonical_encode(0) == canonical_encode(Bn(0))
+    assert canonical_encode(5) != canonical_encode(-5)
+    assert canonical_encode(2 ** 100) == canonical_encode(Bn(2) ** 100)
+
+
+def test_canonical_encode_is_unambiguous():
+    assert canonical_encode(["ab", "c"]) != canonical_encode(["a", "bc"])
+    assert canonical_encode([[1], 2]) != canonical_encode([1, [2]])
+    assert canonical_encode("a") != canonical_encode(b"a")
+    assert canonical_encode(None) != canonical_encode([])
+    assert canonical_encode([1, 2]) == canonical_encode((1, 2))
+
+
+def test_canonical_encode_dict_order():
+    assert canonical_encode({"a": 1, "b": 2}) == canonical_encode({"b": 2, "a": 1})
+
+
+def test_canonical_encode_points(group):
+    g, h = make_generators(2, group)
+    assert canonical_encode(g) != canonical_encode(h)
+    assert canonical_encode(precompute(g)) == canonical_encode(g)
+    assert canonical_encode(PrecomputedBase(g, window=2)) == canonical_encode(g)
+
+
+def test_update_hash_streams_encoding(group):
+    g = group.generator()
+    obj = ["DLRep", [g, g], [0, 1], {"rand": Bn(3)}, None]
+    h = sha256()
+    update_hash(h, obj)
+    assert h.digest() == sha256(canonical_encode(obj)).digest()
+
+
+def test_unpack_lazily(group):
+    g, h = make_generators(2, group)
+    obj = {"Cs": [g, h], "rand": Bn(3)}
+    data = encode(obj)
+    lazy = unpack_lazily(data)
+    assert isinstance(lazy["Cs"][0], msgpack.ExtType)
+    assert lazy["rand"] == Bn(3)
+    assert canonical_encode(lazy) == canonical_encode(obj)
+    assert encode(lazy) == data
+    assert decode_points(lazy) == obj
+
+
+def test_decode_points_non_canonical(group):
+    g = group.generator()
+    data = msgpack.packb((group.nid(), g.export(POINT_CONVERSION_UNCOMPRESSED)))
+    with pytest.raises(ValidationError):
+        decode_points([msgpack.ExtType(2, data)])
+
+
+@pytest.mark.parametrize("data", [b"junk", msgpack.packb((713, b"junk"))])
+def test_decode_points_malformed(data):
+    with pytest.raises(ValidationError):
+        decode_points(msgpack.ExtType(2, data))
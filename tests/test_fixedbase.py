@@ -0,0 +1,69 @@
+import pytest
+
+from petlib.bn import Bn
+
+from zksk import Secret, DLRep
+from zksk.utils import make_generators, multiexp
+from zksk.utils.fixedbase import precompute, PrecomputedBase, PrecomputedEcPt
+
+
+@pytest.fixture
+def scalars(group):
+    order = group.order()
+    return [Bn(0), Bn(3), Bn(-5), order - 1, order + 2, order.random()]
+
+
+def test_precompute_generator(group, scalars):
+    g = group.generator()
+    pg = precompute(g)
+    assert isinstance(pg, PrecomputedEcPt)
+    assert pg.is_generator
+    assert pg == g
+    for k in scalars:
+        assert k * pg == k * g
+        assert pg * k == k * g
+    assert 7 * pg == 7 * g
+
+
+def test_precompute_other_point(group):
+    h = make_generators(1, group)[0]
+    # Only the generator of a petlib curve gets faster, other points are left as they are.
+    assert precompute(h) is h
+
+
+def test_precompute_is_idempotent(group):
+    pg = precompute(group.generator())
+    assert precompute(pg) is pg
+
+
+def test_precomputed_base_table(group, scalars):
+    g, h = make_generators(2, group)
+    pg = PrecomputedBase(g, window=4)
+    for k in scalars:
+        assert k * pg == k * g
+    assert pg + h == g + h
+    assert h - pg == h - g
+    assert -pg == -g
+    assert pg == g
+    assert repr(pg) == repr(g)
+
+
+def test_multiexp_with_precomputed_bases(group):
+    g, h, k = make_generators(3, group)
+    weights = [group.order().random() for _ in range(3)]
+    expected = weights[0] * g + weights[1] * h + weights[2] * k
+    points = [PrecomputedBase(g), precompute(h), k]
+    assert multiexp(weights, points) == expected
+    assert multiexp(weights, points, algorithm="straus") == expected
+
+
+@pytest.mark.parametrize("include_commitment", [False, True])
+def test_dlrep_with_precomputed_bases(group, include_commitment):
+    h = make_generators(1, group)[0]
+    x, y = Secret(), Secret()
+    lhs = 3 * group.generator() + 4 * h
+    prover_stmt = DLRep(lhs, x * precompute(group.generator()) + y * PrecomputedBase(h))
+    verifier_stmt = DLRep(lhs, Secret() * group.generator() + Secret() * h)
+
+    nizk = prover_stmt.prove({x: 3, y: 4}, include_commitment=include_commitment)
+    assert verifier_stmt.verify(nizk)
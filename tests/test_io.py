@@ -0,0 +1,207 @@
+import io
+
+import pytest
+
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.io import ProofArchive, ProofArchiveWriter, ProofReader, ProofWriter
+from zksk.utils import make_generators
+from zksk.wire import WireFormat
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Return short reads, as pipes and sockets do.
+        data = self.data.read(min(len(buffer), 7))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+@pytest.fixture
+def proofs(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+    stmts = [DLRep(i * g, x * g) for i in range(1, 4)] + [DLRep(5 * h, y * h)]
+    nizks = [stmt.prove({x: i}) for i, stmt in enumerate(stmts[:3], 1)]
+    nizks.append(stmts[3].prove({y: 5}))
+    return stmts, nizks
+
+
+def write(nizks, **kwargs):
+    f = io.BytesIO()
+    writer = ProofWriter(f, **kwargs)
+    for nizk in nizks:
+        writer.write(nizk)
+    return f.getvalue()
+
+
+def test_proof_stream_roundtrip(proofs):
+    stmts, nizks = proofs
+    decoded = list(ProofReader(io.BytesIO(write(nizks))))
+    assert len(decoded) == len(stmts)
+    assert all(stmt.verify(nizk) for stmt, nizk in zip(stmts, decoded))
+
+
+def test_proof_stream_is_lazy(proofs):
+    _, nizks = proofs
+    data = write(nizks[:2])
+    f = io.BytesIO(data + b"\xff" * 8)
+    reader = iter(ProofReader(f))
+    assert next(reader).stmt_hash == nizks[0].stmt_hash
+    assert f.tell() < len(data)
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_proof_stream_filter(proofs, seekable):
+    stmts, nizks = proofs
+    data = write(nizks)
+    f = io.BytesIO(data) if seekable else Unseekable(data)
+    reader = ProofReader(f, stmt_hashes=[nizks[1].stmt_hash, nizks[3].stmt_hash])
+    decoded = list(reader)
+    assert len(decoded) == 2
+    assert stmts[1].verify(decoded[0])
+    assert stmts[3].verify(decoded[1])
+
+
+def test_proof_stream_wire_format(proofs):
+    stmts, nizks = proofs
+    wire = WireFormat(nizks[0])
+    data = write(nizks[:3], wire=wire)
+    assert len(data) < len(write(nizks[:3]))
+    decoded = list(ProofReader(io.BytesIO(data), wire=wire))
+    assert all(stmt.verify(nizk) for stmt, nizk in zip(stmts, decoded))
+
+
+def test_proof_stream_truncated(proofs):
+    _, nizks = proofs
+    data = write(nizks[:2])
+    with pytest.raises(ValueError):
+        list(ProofReader(Unseekable(data[:-1])))
+    with pytest.raises(ValueError):
+        list(ProofReader(io.BytesIO(data[:-1]), stmt_hashes=[]))
+
+
+def test_proof_stream_max_size(proofs):
+    _, nizks = proofs
+    data = write(nizks[:1])
+    with pytest.raises(ValueError):
+        list(ProofReader(io.BytesIO(data), max_size=len(nizks[0].serialize()) - 1))
+
+
+def test_proof_archive(tmp_path, proofs):
+    stmts, nizks = proofs
+    path = str(tmp_path / "archive")
+    with ProofArchiveWriter(path) as writer:
+        for i, nizk in enumerate(nizks):
+            assert writer.write(nizk, key="proof-{}".format(i) if i % 2 else None) == i
+
+    with ProofArchive(path) as archive:
+        assert len(archive) == len(nizks)
+        assert stmts[2].verify(archive[2])
+        assert stmts[3].verify(archive.get("proof-3"))
+        with pytest.raises(KeyError):
+            archive.get("proof-2")
+        assert [nizk.stmt_hash for nizk in archive.find(nizks[1].stmt_hash)] == [
+            nizks[1].stmt_hash
+        ]
+        assert list(archive.find(b"\x00" * 32)) == []
+        assert all(stmt.verify(nizk) for stmt, nizk in zip(stmts, archive))
+
+    with ProofArchive(path, lazy=True) as archive:
+        assert stmts[1].verify(archive[1])
+
+
+def test_proof_archive_keys(tmp_path, proofs):
+    stmts, nizks = proofs
+    path = str(tmp_path / "archive")
+    keys = [("alice", 1), b"bob", 7, ("carol", (b"x", 2))]
+    with ProofArchiveWriter(path) as writer:
+        for key, nizk in zip(keys, nizks):
+            writer.write(nizk, key=key)
+        for key in [["alice", 1], {"alice": 1}, 1.5]:
+            with pytest.raises(TypeError):
+                writer.write(nizks[0], key=key)
+    with ProofArchiveWriter(path) as writer:
+        writer.write(nizks[0], key=("dave", 0))
+
+    with ProofArchive(path) as archive:
+        for i, key in enumerate(keys):
+            assert stmts[i].verify(archive.get(key))
+        assert stmts[0].verify(archive.get(("dave", 0)))
+
+
+def test_proof_archive_append(tmp_path, proofs):
+    stmts, nizks = proofs
+    path = str(tmp_path / "archive")
+    with ProofArchiveWriter(path) as writer:
+        writer.write(nizks[0], key=0)
+    with ProofArchiveWriter(path) as writer:
+        assert writer.write(nizks[1], key=1) == 1
+        writer.write(nizks[0])
+
+    with ProofArchive(path) as archive:
+        assert len(archive) == 3
+        assert stmts[1].verify(archive.get(1))
+        assert len(list(archive.find(nizks[0].stmt_hash))) == 2
+
+
+def test_proof_archive_unclosed_append(tmp_path, proofs):
+    stmts, nizks = proofs
+    path = str(tmp_path / "archive")
+    with ProofArchiveWriter(path) as writer:
+        writer.write(nizks[0])
+        writer.write(nizks[1])
+    writer = ProofArchiveWriter(path)
+    writer.write(nizks[2])
+    # The process dies before closing the writer.
+    writer.f.close()
+
+    with ProofArchive(path) as archive:
+        assert len(archive) == 2
+        assert stmts[1].verify(archive[1])
+    with ProofArchiveWriter(path) as writer:
+        assert writer.write(nizks[3]) == 2
+    with ProofArchive(path) as archive:
+        assert stmts[3].verify(archive[2])
+
+
+def test_proof_archive_close_with_views(tmp_path, proofs):
+    stmts, nizks = proofs
+    path = str(tmp_path / "archive")
+    with ProofArchiveWriter(path) as writer:
+        writer.write(nizks[0])
+    archive = ProofArchive(path)
+    data = archive.raw(0)
+    archive.close()
+    archive.close()
+    assert stmts[0].verify(NIZK.deserialize(data))
+    data.release()
+
+
+def test_proof_archive_wire_format(tmp_path, proofs):
+    stmts, nizks = proofs
+    wire = WireFormat(nizks[0])
+    path = str(tmp_path / "archive")
+    with ProofArchiveWriter(path, wire=wire) as writer:
+        for nizk in nizks[:3]:
+            writer.write(nizk)
+    with ProofArchive(path, wire=wire) as archive:
+        assert len(archive.raw(1)) == wire.size
+        assert stmts[1].verify(archive[1])
+
+
+def test_proof_archive_rejects_other_files(tmp_path, proofs):
+    _, nizks = proofs
+    path = tmp_path / "stream"
+    path.write_bytes(write(nizks))
+    with pytest.raises(ValueError):
+        ProofArchive(str(path))
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        ProofArchive(str(path))
@@ -0,0 +1,51 @@
+import pytest
+
+from petlib.bn import Bn
+
+from zksk.utils import make_generators, multiexp
+
+
+def naive_wsum(group, weights, points):
+    res = group.infinite()
+    for w, p in zip(weights, points):
+        res = res + w * p
+    return res
+
+
+@pytest.mark.parametrize("algorithm", [None, "straus", "pippenger"])
+@pytest.mark.parametrize("num", [1, 3, 70])
+def test_multiexp(group, algorithm, num):
+    points = make_generators(num, group)
+    weights = [group.order().random() for _ in range(num)]
+    expected = naive_wsum(group, weights, points)
+    assert multiexp(weights, points, algorithm=algorithm) == expected
+
+
+@pytest.mark.parametrize("algorithm", ["straus", "pippenger"])
+def test_multiexp_reduces_weights(group, algorithm):
+    g, h, k = make_generators(3, group)
+    weights = [-3, group.order() + 5, 0]
+    expected = (-3) * g + 5 * h
+    assert multiexp(weights, [g, h, k], algorithm=algorithm) == expected
+
+
+def test_multiexp_repeated_points(group):
+    g, h = make_generators(2, group)
+    assert multiexp([2, Bn(3), 4], [g, h, g], algorithm="pippenger") == 6 * g + 3 * h
+
+
+def test_multiexp_null_weights(group):
+    g, h = make_generators(2, group)
+    assert multiexp([0, group.order()], [g, h], algorithm="straus") == group.infinite()
+
+
+def test_multiexp_empty(group):
+    assert multiexp([], [], group=group) == group.infinite()
+    with pytest.raises(ValueError):
+        multiexp([], [])
+
+
+def test_multiexp_unknown_algorithm(group):
+    g = group.generator()
+    with pytest.raises(ValueError):
+        multiexp([1], [g], algorithm="unknown")
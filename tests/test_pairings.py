@@ -1,12 +1,19 @@
 # TODO: Fix the disastrous variable naming.
 # TODO: Split into more granular unit tests.
 
+import struct
+
 import pytest
 
-from bplib.bp import BpGroup
+import msgpack
+
+from bplib.bp import BpGroup, G1Elem
 from petlib import pack
+from petlib.bn import Bn
 
-from zksk.pairings import BilinearGroupPair, G1Point, AdditivePoint
+from zksk.pairings import BilinearGroupPair, G1Point, AdditivePoint, get_group_pair
+from zksk.pairings import MAX_LAZY_TERMS, PreparedG2Point, multi_pair, prepare, pt_dec
+from zksk.utils import multiexp, precompute
 
 
 @pytest.fixture
@@ -71,6 +78,77 @@ def test_g1_g2_groups(bp_group, group_pair):
     assert g2 * 0 == g2 * bp_group.order()
 
 
+def test_multi_pair(group_pair):
+    G1, G2, GT = group_pair.groups()
+    g1, g2 = G1.generator(), G2.generator()
+    a, b = G1.order().random(), G1.order().random()
+    expected = (a * g1).pair(g2) + (b * g1).pair(b * g2)
+    assert multi_pair([a * g1, b * g1], [g2, b * g2]) == expected
+    assert multi_pair([a * g1, (G1.order() - a) * g1], [g2, g2]) == GT.infinite()
+    assert multi_pair([G1.infinite(), g1], [g2, g2]) == g1.pair(g2)
+    assert multi_pair([g1, g1], [G2.infinite(), g2]) == g1.pair(g2)
+    assert multi_pair([G1.infinite()], [g2]) == GT.infinite()
+    with pytest.raises(ValueError):
+        multi_pair([g1], [g2, g2])
+
+
+def test_lazy_pairings(bp_group, group_pair):
+    G1, G2, GT = group_pair.groups()
+    g1, g2 = G1.generator(), G2.generator()
+    h1, h2 = G1.hash_to_point(b"h"), 5 * g2
+    a, b = G1.order().random(), G1.order().random()
+
+    e_gh = AdditivePoint(bp_group.pair(g1.pt, h2.pt), group_pair)
+    e_hg = AdditivePoint(bp_group.pair(h1.pt, g2.pt), group_pair)
+    expected = a * e_gh + b * e_hg + GT.generator()
+
+    lazy = GT.wsum([a, b], [g1.pair(h2), h1.pair(g2)])
+    assert lazy.const is None and len(lazy.terms) == 2
+    assert lazy + GT.generator() == expected
+    assert GT.wsum([a, b, 1], [g1.pair(h2), e_hg, GT.generator()]) == expected
+    assert -1 * lazy + lazy == GT.infinite()
+    assert 0 * lazy == GT.infinite()
+
+
+def test_lazy_pairings_stay_small(group_pair):
+    G1, G2, GT = group_pair.groups()
+    gt = G1.generator().pair(G2.generator())
+    point = gt
+    for _ in range(40):
+        point = point + point
+    assert len(point.terms) <= 1
+    assert point == Bn(2) ** 40 * GT.generator()
+
+    total = GT.infinite()
+    for i in range(100):
+        total = total + (i + 1) * G1.generator().pair(G2.generator())
+    assert len(total.terms) <= MAX_LAZY_TERMS
+    assert total == 5050 * GT.generator()
+
+
+def test_precompute_gt_point(group_pair):
+    G1, G2, GT = group_pair.groups()
+    gt = G1.generator().pair(G2.generator())
+    k = G1.order().random()
+    assert k * precompute(gt) == k * GT.generator()
+    for algorithm in ("straus", "pippenger"):
+        assert multiexp([k, 3], [gt, gt], algorithm=algorithm) == (k + 3) * GT.generator()
+
+
+def test_prepared_g2_point(group_pair):
+    G1, G2, GT = group_pair.groups()
+    g1, g2 = G1.generator(), G2.generator()
+    q = 7 * g2 + g2
+    prepared = prepare(q)
+    assert isinstance(prepared, PreparedG2Point)
+    assert prepare(prepared) is prepared
+    assert prepared == q and prepared.pt is not q.pt
+    assert g1.pair(prepared) == g1.pair(q)
+    assert GT.sum([g1.pair(prepared), g1.pair(prepared)]) == 16 * GT.generator()
+    assert prepare(precompute(q)) == q
+    assert prepare(G2.infinite()) == G2.infinite()
+
+
 def test_pack_unpack_g1(group_pair):
     """
     Testing packing and unpacking G1 element
@@ -114,3 +192,51 @@ def test_pack_unpack_gt(group_pair):
     pt2 = pack.decode(data)
 
     assert pt1 == pt2
+
+
+def test_group_pair_uses_given_bp_group(bp_group):
+    assert BilinearGroupPair(bp_group).bpgp is bp_group
+
+
+def test_get_group_pair_is_shared():
+    bp = get_group_pair()
+    assert get_group_pair() is bp
+    assert get_group_pair(bp.bpgp.nid) is bp
+
+
+def test_unpacked_points_share_group_pair(group_pair):
+    points = [
+        group_pair.G1.generator(),
+        group_pair.G2.generator(),
+        group_pair.GT.generator(),
+    ]
+    decoded = pack.decode(pack.encode(points))
+    again = pack.decode(pack.encode(points))
+    shared = get_group_pair()
+    for pt, pt1, pt2 in zip(points, decoded, again):
+        assert pt1 == pt
+        assert pt1.bp is shared
+        assert pt1.group is pt2.group
+        assert pt1.group == pt.group
+
+
+def test_unpack_legacy_encoding(group_pair):
+    pt = 42 * group_pair.G1.generator()
+    data = msgpack.packb((group_pair.bpgp.nid, pt.pt.export()))
+    assert pt_dec(G1Elem, G1Point)(data) == pt
+
+
+@pytest.mark.parametrize("encoding", ["current", "legacy"])
+def test_unpack_forged_curve(group_pair, encoding):
+    pt = 42 * group_pair.G1.generator()
+    nid = group_pair.bpgp.nid + 1
+    if encoding == "current":
+        data = b"\x01" + struct.pack(">I", nid) + pt.pt.export()
+    else:
+        data = msgpack.packb((nid, pt.pt.export()))
+    with pytest.raises(ValueError):
+        pt_dec(G1Elem, G1Point)(data)
+    with pytest.raises(ValueError):
+        pack.decode(pack.encode(msgpack.ExtType(111, data)))
+    with pytest.raises(ValueError):
+        get_group_pair(nid)
@@ -0,0 +1,100 @@
+import functools
+
+import pytest
+
+from zksk import Secret, DLRep
+from zksk.base import NIZK
+from zksk.parallel import verify_many, VerifierPool
+from zksk.utils import make_generators, multiexp
+
+
+def make_stmt(num_bases=2):
+    generators = make_generators(num_bases)
+    lhs = multiexp(range(1, num_bases + 1), generators)
+    expr = Secret() * generators[0]
+    for g in generators[1:]:
+        expr = expr + Secret() * g
+    return DLRep(lhs, expr)
+
+
+def failing_stmt():
+    raise ValueError("Cannot build the statement.")
+
+
+def make_proofs(num, message=""):
+    stmt = make_stmt()
+    secrets = dict(zip(stmt.secret_vars, [1, 2]))
+    return [stmt.prove(secrets, message=message).serialize() for _ in range(num)]
+
+
+def test_parallel_verify_many():
+    proofs = make_proofs(20)
+    proofs[3] = proofs[3][:-1]
+    proofs[11] = b"garbage"
+    expected = [True] * 20
+    expected[3] = expected[11] = False
+    assert verify_many(make_stmt, proofs, workers=2) == expected
+
+
+def test_parallel_verify_many_message():
+    proofs = make_proofs(2, message="signed")
+    assert verify_many(make_stmt, proofs, workers=2, message="signed") == [True] * 2
+    assert verify_many(make_stmt, proofs, workers=2, message="other") == [False] * 2
+
+
+def test_verifier_pool_reuse_and_small_ring():
+    proofs = make_proofs(10)
+    with VerifierPool(make_stmt, workers=2, num_slots=2) as pool:
+        assert pool.verify(proofs) == [True] * 10
+        assert pool.verify(iter(proofs[:3])) == [True] * 3
+        assert pool.verify([]) == []
+
+
+def test_verifier_pool_oversize_proofs():
+    stmt_factory = functools.partial(make_stmt, 4)
+    stmt = stmt_factory()
+    secrets = dict(zip(stmt.secret_vars, [1, 2, 3, 4]))
+    proof = stmt.prove(secrets).serialize()
+    with VerifierPool(stmt_factory, workers=2, slot_size=len(proof) - 1) as pool:
+        assert pool.verify([proof] * 5) == [True] * 5
+
+
+def test_verifier_pool_factory_error():
+    with VerifierPool(failing_stmt, workers=1) as pool:
+        with pytest.raises(RuntimeError):
+            pool.verify(make_proofs(1))
+
+
+def test_verifier_pool_error_then_valid_batch():
+    proofs = make_proofs(12)
+    nizk = NIZK.deserialize(proofs[5])
+    # Too few responses: verification raises an IndexError in the worker.
+    nizk.responses = nizk.responses[:1]
+    proofs[5] = nizk.serialize()
+    with VerifierPool(make_stmt, workers=2, num_slots=4) as pool:
+        with pytest.raises(RuntimeError):
+            pool.verify(proofs)
+        assert pool.verify(make_proofs(7)) == [True] * 7
+
+
+def test_verifier_pool_iterator_error():
+    proofs = make_proofs(10)
+
+    def proofs_then_error():
+        yield from proofs
+        raise KeyError("Proof store unavailable.")
+
+    bad_proof = make_proofs(1)[0][:-1]
+    with VerifierPool(make_stmt, workers=2, num_slots=4, chunk_size=1) as pool:
+        with pytest.raises(KeyError):
+            pool.verify(proofs_then_error())
+        assert pool.verify([bad_proof]) == [False]
+        assert pool.verify(proofs[:3]) == [True] * 3
+
+
+def test_verifier_pool_unusable_after_factory_error():
+    with VerifierPool(failing_stmt, workers=1) as pool:
+        with pytest.raises(RuntimeError):
+            pool.verify(make_proofs(1))
+        with pytest.raises(RuntimeError):
+            pool.verify(make_proofs(1))
@@ -0,0 +1,126 @@
+import mmap
+
+import pytest
+
+from zksk import Secret, DLRep
+from zksk.batch import verify_many
+from zksk.primitives.rangeproof import RangeStmt
+from zksk.utils import make_generators
+from zksk.wire import WireFormat
+
+
+@pytest.fixture
+def dlrep(group):
+    g, h = make_generators(2, group)
+    x, r = Secret(), Secret()
+
+    def make_stmt(i):
+        return DLRep(i * g + 4 * h, x * g + r * h)
+
+    def prove(i, **kwargs):
+        return make_stmt(i).prove({x: i, r: 4}, **kwargs)
+
+    return make_stmt, prove
+
+
+def test_wire_roundtrip(dlrep):
+    make_stmt, prove = dlrep
+    wire = WireFormat(prove(1))
+    for i in range(2, 5):
+        data = wire.encode(prove(i))
+        assert len(data) == wire.size
+        assert make_stmt(i).verify(wire.decode(data))
+
+
+def test_wire_is_smaller(dlrep):
+    _, prove = dlrep
+    nizk = prove(3)
+    assert len(WireFormat(nizk).encode(nizk)) < len(nizk.serialize())
+
+
+def test_wire_point_forms(group, dlrep):
+    make_stmt, prove = dlrep
+    nizk = prove(3, include_commitment=True)
+    compressed = WireFormat(nizk, group=group)
+    uncompressed = WireFormat(nizk, group=group, point_form="uncompressed")
+    assert uncompressed.size > compressed.size
+    for wire in (compressed, uncompressed):
+        decoded = wire.decode(wire.encode(nizk))
+        assert decoded.commitment == nizk.commitment
+        assert verify_many([make_stmt(3)], [decoded]) == [True]
+    with pytest.raises(ValueError):
+        WireFormat(nizk, point_form="hybrid")
+
+
+def test_wire_or_proof(group):
+    g, h = make_generators(2, group)
+    x, y = Secret(), Secret()
+
+    def make_stmt():
+        return DLRep(3 * g, x * g) | DLRep(5 * h, y * h)
+
+    wire = WireFormat(make_stmt().prove({x: 3}))
+    for _ in range(4):
+        # The challenge of the proven branch is usually negative.
+        nizk = make_stmt().prove({x: 3})
+        assert make_stmt().verify(wire.decode(wire.encode(nizk)))
+
+
+def test_wire_extended_proof(group):
+    g, h = make_generators(2, group)
+    x, r = Secret(value=13), Secret(value=42)
+    com = (x * g + r * h).eval()
+    stmt = RangeStmt(com, g, h, 0, 64, x, r)
+    wire = WireFormat(stmt.prove())
+    nizk = stmt.prove()
+    decoded = wire.decode(bytearray(wire.encode(nizk)))
+    assert RangeStmt(com, g, h, 0, 64, Secret(), Secret()).verify(decoded)
+
+
+def test_wire_decode_mmap(tmp_path, dlrep):
+    make_stmt, prove = dlrep
+    wire = WireFormat(prove(1))
+    path = tmp_path / "proof"
+    path.write_bytes(wire.encode(prove(2)))
+    with open(str(path), "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            assert make_stmt(2).verify(wire.decode(data))
+
+
+def test_wire_neutral_point(group):
+    g = group.generator()
+    x = Secret()
+    stmt = DLRep(group.infinite(), x * g)
+    nizk = stmt.prove({x: 0}, include_commitment=True)
+    wire = WireFormat(nizk)
+    assert wire.decode(wire.encode(nizk)).responses == nizk.responses
+
+
+def test_wire_rejects_wrong_size(dlrep):
+    _, prove = dlrep
+    wire = WireFormat(prove(1))
+    data = wire.encode(prove(2))
+    with pytest.raises(ValueError):
+        wire.decode(data[:-1])
+    with pytest.raises(ValueError):
+        wire.decode(data + b"\x00")
+
+
+def test_wire_rejects_other_template(group, dlrep):
+    _, prove = dlrep
+    g = group.generator()
+    x = Secret()
+    wire = WireFormat(DLRep(3 * g, x * g).prove({x: 3}))
+    with pytest.raises(ValueError):
+        wire.encode(prove(2))
+
+
+def test_wire_limits(dlrep):
+    _, prove = dlrep
+    nizk = prove(1)
+    with pytest.raises(ValueError):
+        WireFormat(nizk, max_size=64)
+    nizk.precommitment = [[[nizk.challenge]]]
+    with pytest.raises(ValueError):
+        WireFormat(nizk, max_depth=2)
+    assert WireFormat(nizk, max_depth=3).size > WireFormat(prove(1)).size
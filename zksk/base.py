@@ -12,11 +12,13 @@ import binascii
 import msgpack
 from hashlib import sha256
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import attr
 
-from zksk.utils import get_random_num
+from zksk.utils import get_random_num, weigh_equations, check_equations
+from zksk.utils.encoding import unpack_lazily
 from zksk.consts import CHALLENGE_LENGTH
-from zksk.exceptions import ValidationError
+from zksk.exceptions import ValidationError, VerificationError
 
 
 @attr.s
@@ -29,11 +31,14 @@ class NIZK:
     responses = attr.ib()
     precommitment = attr.ib(default=None)
     stmt_hash = attr.ib(default=None)
+    commitment = attr.ib(default=None)
 
 
     def serialize(self):
         """
         Serialize a non-interactive zero-knowledge proof.
+
+        The commitment is only serialized if the proof carries one.
         """
         as_list = [
             encode(self.challenge),
@@ -41,17 +46,102 @@ class NIZK:
             encode(self.precommitment),
             encode(self.stmt_hash)
         ]
+        if self.commitment is not None:
+            as_list.append(encode(self.commitment))
         return msgpack.packb(as_list, use_bin_type=True)
 
 
     @classmethod
-    def deserialize(cls, nizk_raw):
+    def deserialize(cls, nizk_raw, lazy=False):
         """
         Deserialize a non-interactive zero-knowledge proof.
+
+        Args:
+            nizk_raw: Serialized proof, as a bytes-like object.
+            lazy (bool): Keep the precommitment and the commitment, which hold the points of the
+                proof, encoded until they are first accessed. See :py:class:`LazyNIZK`.
         """
-        as_list = [decode(x) for x in msgpack.unpackb(nizk_raw)]
+        fields = msgpack.unpackb(nizk_raw)
+        if lazy:
+            as_list = [decode(x) for x in fields[:2]]
+            as_list.append(_Encoded(fields[2]))
+            as_list.append(decode(fields[3]))
+            if len(fields) > 4:
+                as_list.append(_Encoded(fields[4]))
+            return LazyNIZK(*as_list)
+        as_list = [decode(x) for x in fields]
         return NIZK(*as_list)
 
+    def get_precommitment(self):
+        """
+        Return the precommitment, as processed by verifiers.
+
+        Verifiers decode the points of the precommitment of a :py:class:`LazyNIZK` when they use
+        them.
+        """
+        return self.precommitment
+
+    def has_commitment(self):
+        """
+        Tell whether the proof carries its commitment.
+        """
+        return self.commitment is not None
+
+
+class _Encoded:
+    """
+    A field of a proof, kept in its serialized form.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _lazy_field(name):
+    key = "_" + name
+
+    def get(self):
+        value = self.__dict__[key]
+        if isinstance(value, _Encoded):
+            value = decode(value.data)
+            self.__dict__[key] = value
+        return value
+
+    def set(self, value):
+        self.__dict__[key] = value
+
+    return property(get, set)
+
+
+class LazyNIZK(NIZK):
+    """
+    Non-interactive zero-knowledge proof whose points are decoded on first access.
+
+    Decoding points checks that they are on the curve, and decompresses them, which costs more than
+    the rest of the deserialization. The challenge, the responses and the statement hash are
+    decoded right away. The precommitment and the commitment are only decoded when accessed.
+
+    Verifiers get the precommitment with its points still encoded (see
+    :py:func:`zksk.utils.encoding.unpack_lazily`), check the statement hash, and only then access
+    the commitment. Hence, they reject the proofs of other statements without decoding any point,
+    unless the hash of an extended statement (see :py:mod:`zksk.extended`) depends on its
+    constructed statement. The points of the precommitment are then decoded to construct it.
+    """
+
+    precommitment = _lazy_field("precommitment")
+    commitment = _lazy_field("commitment")
+
+    def get_precommitment(self):
+        value = self.__dict__["_precommitment"]
+        if isinstance(value, _Encoded):
+            return unpack_lazily(value.data)
+        return value
+
+    def has_commitment(self):
+        return self.__dict__["_commitment"] is not None
+
 
 @attr.s
 class SimulationTranscript:
@@ -65,6 +155,10 @@ class SimulationTranscript:
     precommitment = attr.ib(default=None)
     stmt_hash = attr.ib(default=None)
 
+    # Transcripts are verified as proofs.
+    get_precommitment = NIZK.get_precommitment
+    has_commitment = NIZK.has_commitment
+
 
 def build_fiat_shamir_challenge(stmt_prehash, *args, message=""):
     """Generate a Fiat-Shamir challenge.
@@ -100,6 +194,9 @@ class Prover(metaclass=abc.ABCMeta):
         secret_values: The values of the secrets as a dict.
     """
 
+    # Optional ``concurrent.futures`` executor to run independent subprovers on.
+    executor = None
+
     def __init__(self, stmt, secret_values):
         self.stmt = stmt
         self.secret_values = secret_values
@@ -132,19 +229,28 @@ class Prover(metaclass=abc.ABCMeta):
             self.internal_commit(randomizers_dict),
         )
 
-    def get_nizk_proof(self, message=""):
+    def get_nizk_proof(self, message="", include_commitment=False, executor=None):
         """
         Construct a non-interactive proof transcript using Fiat-Shamir heuristic.
 
-        The transcript contains only the challenge and the responses, as the commitment can be
-        deterministically recomputed.
+        By default, the transcript contains only the challenge and the responses, as the commitment
+        can be deterministically recomputed.
 
         The challenge is a hash of the commitment, the stmt statement and all the bases in the
         statement (including the left-hand-side).
 
         Args:
             message (str): Optional message to make a signature stmt of knowledge.
+            include_commitment (bool): Whether to also include the commitment in the transcript.
+                Such transcripts can be verified in batches, see :py:func:`zksk.batch.verify_many`.
+            executor: Optional thread-pool executor on which to run the subprovers of
+                and-proofs concurrently. The proof is the same as with a sequential run.
         """
+        if isinstance(executor, ProcessPoolExecutor):
+            # Provers keep their state in the statements, which would stay in the workers.
+            raise ValueError("Provers can only run on executors sharing their memory.")
+        self.executor = executor
+
         # Precommit to gather encapsulated precommitments. They are already included in their
         # respective statement.
         precommitment = self.precommit()
@@ -163,6 +269,7 @@ class Prover(metaclass=abc.ABCMeta):
             responses=responses,
             precommitment=precommitment,
             stmt_hash=stmt_hash,
+            commitment=commitment if include_commitment else None,
         )
 
 
@@ -230,6 +337,53 @@ class Verifier(metaclass=abc.ABCMeta):
             self.challenge, response
         )
 
+    def get_nizk_equations(self, nizk, message="", *args, **kwargs):
+        """
+        Run the checks of a non-interactive proof that come before its verification identities.
+
+        Processes the precommitment, checks the statement and the responses, and, if the proof
+        carries its commitment, checks the commitment and that the challenge is its hash.
+
+        Args:
+            nizk (:py:class:`NIZK`): Non-interactive proof
+            message: A message if a signature proof.
+
+        Returns:
+            tuple: The pre-hash of the statement, the precommitment, and the verification
+                equations of the proof. The equations are None if the proof does not carry its
+                commitment, or the statement does not support them.
+
+        Raises:
+            VerificationError: If the commitment is malformed, or the challenge is not its hash.
+        """
+        # Build the complete stmt if necessary.
+        # TODO: If empty precommit() function, this is always true.
+        precommitment = nizk.get_precommitment()
+        if precommitment is not None:
+            self.process_precommitment(precommitment)
+
+        # Check the proofs statements match, gather the local statement. Do it before accessing
+        # the commitment, which a lazy proof only decodes then.
+        prehash = self.stmt.check_statement(nizk.stmt_hash)
+        self.pre_verification_validation(nizk.responses, *args, **kwargs)
+        if not nizk.has_commitment():
+            return prehash, precommitment, None
+
+        try:
+            equations = self.stmt.get_verification_equations(
+                nizk.challenge, nizk.responses, nizk.commitment
+            )
+        except (ValidationError, IndexError, KeyError, TypeError) as e:
+            # The commitment and the responses come from the proof, and may have any shape.
+            raise VerificationError("Malformed commitment.") from e
+        if equations is not None:
+            challenge = build_fiat_shamir_challenge(
+                prehash, precommitment, nizk.commitment, message=message
+            )
+            if challenge != nizk.challenge:
+                raise VerificationError("The challenge does not match the commitment.")
+        return prehash, precommitment, equations
+
     def verify_nizk(self, nizk, message="", *args, **kwargs):
         """
         Verify a non-interactive proof.
@@ -237,6 +391,11 @@ class Verifier(metaclass=abc.ABCMeta):
         Unpacks the attributes and checks their consistency by computing a pseudo-commitment and
         drawing from a pseudo-challenge. Compares the pseudo-challenge with the nizk challenge.
 
+        If the proof carries its commitment, and the statement supports it, the commitment is
+        not recomputed. Instead, the challenge is compared to the hash of the carried commitment,
+        and all verification equations of the statement are checked together with a single
+        randomized multi-exponentiation per group.
+
         Args:
             nizk (:py:class:`NIZK`): Non-interactive proof
             message: A message if a signature proof.
@@ -244,20 +403,20 @@ class Verifier(metaclass=abc.ABCMeta):
         Return:
             bool: True of verification succeeded, False otherwise.
         """
-        # Build the complete stmt if necessary.
-        # TODO: If empty precommit() function, this is always true.
-        if nizk.precommitment is not None:
-            self.process_precommitment(nizk.precommitment)
-
-        # Check the proofs statements match, gather the local statement.
-        prehash = self.stmt.check_statement(nizk.stmt_hash)
-        self.pre_verification_validation(nizk.responses, *args, **kwargs)
+        try:
+            prehash, precommitment, equations = self.get_nizk_equations(
+                nizk, message, *args, **kwargs
+            )
+        except VerificationError:
+            return False
+        if equations is not None:
+            return check_equations(weigh_equations(equations))
 
         # Retrieve the commitment using the verification identity.
         commitment_prime = self.stmt.recompute_commitment(
             nizk.challenge, nizk.responses
         )
         challenge_prime = build_fiat_shamir_challenge(
-            prehash, nizk.precommitment, commitment_prime, message=message
+            prehash, precommitment, commitment_prime, message=message
         )
         return nizk.challenge == challenge_prime
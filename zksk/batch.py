@@ -0,0 +1,122 @@
+"""
+Batch verification of non-interactive proofs.
+
+A non-interactive proof that carries its commitment (see the ``include_commitment`` argument of
+:py:meth:`zksk.composition.ComposableProofStmt.prove`) can be checked without recomputing the
+commitment: it is enough to check that the challenge is the hash of the commitment, and that the
+verification identities of the statement hold. These identities are equations in a group, e.g.,
+:math:`s G - c Y - R = 0` for a :py:class:`zksk.primitives.dlrep.DLRep`.
+
+Instead of checking the equations of :math:`N` proofs one by one, :py:func:`verify_many` draws a
+random weight for each equation and checks that the weighted sum of all equations vanishes, using
+a single multi-exponentiation per group. A cheating proof passes this test only with negligible
+probability. If the combined test fails, the batch is bisected to find the invalid proofs.
+
+>>> from zksk import Secret, DLRep
+>>> from zksk.utils import make_generators
+>>> g, h = make_generators(2)
+>>> x, r = Secret(), Secret()
+>>> stmts = [DLRep(i * g + 42 * h, x * g + r * h) for i in range(3)]
+>>> nizks = [stmt.prove({x: i, r: 42}, include_commitment=True) for i, stmt in enumerate(stmts)]
+>>> nizks[1].responses[0] += 1
+>>> verify_many(stmts, nizks)
+[True, False, True]
+
+"""
+
+from zksk.utils import weigh_equations, check_equations
+from zksk.exceptions import StatementMismatch, ValidationError, VerificationError
+from zksk.exceptions import InconsistentChallengeError
+
+
+# Errors that mean the proof is invalid, as opposed to the statement being ill-formed.
+_REJECTION_ERRORS = (
+    StatementMismatch,
+    ValidationError,
+    VerificationError,
+    InconsistentChallengeError,
+)
+
+
+def _verify_single(stmt, nizk, message):
+    """
+    Verify a single proof, reporting invalid proofs as False rather than with an exception.
+    """
+    try:
+        return stmt.verify(nizk, message=message)
+    except _REJECTION_ERRORS:
+        return False
+
+
+def _extract_equations(stmt, nizk, message):
+    """
+    Run the cheap checks on a proof and extract its verification equations.
+
+    Returns:
+        list or None: The equations of the proof, or None if the proof cannot be batched.
+
+    Raises:
+        VerificationError: If the commitment is malformed, or the challenge is not its hash.
+    """
+    # Proofs without their commitment are verified one by one, which runs all the checks.
+    if not nizk.has_commitment():
+        return None
+    _, _, equations = stmt.get_verifier().get_nizk_equations(nizk, message)
+    return equations
+
+
+def _bisect(entries, indices, results):
+    """
+    Mark as valid the proofs whose equations hold, splitting failing batches in halves.
+
+    Args:
+        entries: Mapping from proof indices to their weighted equations.
+        indices: Indices of the proofs to check.
+        results: List of verification results to update.
+    """
+    if check_equations([eq for i in indices for eq in entries[i]]):
+        for i in indices:
+            results[i] = True
+    elif len(indices) > 1:
+        middle = len(indices) // 2
+        _bisect(entries, indices[:middle], results)
+        _bisect(entries, indices[middle:], results)
+
+
+def verify_many(stmts, nizks, messages=None):
+    """
+    Verify many non-interactive proofs at once.
+
+    Proofs that include their commitment, and whose statements support
+    :py:meth:`zksk.composition.ComposableProofStmt.get_verification_equations`, are checked
+    together with a random linear combination. Other proofs are verified one by one.
+
+    Args:
+        stmts: Proof statements, one per proof.
+        nizks: Non-interactive proofs (:py:class:`zksk.base.NIZK`).
+        messages: Optional messages, one per proof, if the proofs are signatures.
+
+    Returns:
+        list: For every proof, True if it verifies and False otherwise.
+    """
+    if messages is None:
+        messages = [""] * len(nizks)
+    if not len(stmts) == len(nizks) == len(messages):
+        raise ValueError("Need as many statements and messages as proofs.")
+
+    results = [False] * len(nizks)
+    entries = {}
+    for idx, (stmt, nizk, message) in enumerate(zip(stmts, nizks, messages)):
+        try:
+            equations = _extract_equations(stmt, nizk, message)
+        except _REJECTION_ERRORS:
+            continue
+
+        if equations is None:
+            results[idx] = _verify_single(stmt, nizk, message)
+        else:
+            entries[idx] = weigh_equations(equations)
+
+    if entries:
+        _bisect(entries, list(entries.keys()), results)
+    return results
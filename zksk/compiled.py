@@ -0,0 +1,212 @@
+"""
+Compiled statements: templates to prove and verify many statements of the same shape.
+
+Proving or verifying a statement does some work that only depends on its shape: flattening the
+secrets and bases of composed statements, checking the group orders of shared secrets and the
+re-occurrence of secrets in or-proofs, looking up group orders, and hashing the bases into the
+statement digest. A :py:class:`CompiledStmt`, obtained with
+:py:meth:`zksk.composition.ComposableProofStmt.compile`, does this work once. It can then prove
+and verify statements of the same shape, with new left-hand sides for the
+:py:class:`zksk.primitives.dlrep.DLRep` statements it contains:
+
+>>> from zksk import Secret, DLRep
+>>> from zksk.utils import make_generators
+>>> g, h = make_generators(2)
+>>> x, r = Secret(), Secret()
+>>> template = DLRep(g + h, x * g + r * h).compile()
+>>> nizks = [template.prove({x: i, r: 2}, lhs=[i * g + 2 * h]) for i in range(3)]
+>>> [template.verify(nizk, lhs=[i * g + 2 * h]) for i, nizk in enumerate(nizks)]
+[True, True, True]
+
+Extended statements (see :py:mod:`zksk.extended`) build their inner statement from the
+precommitment of every proof, so their inner statements are not compiled. The template still
+compiles the rest of the tree.
+
+Templates are not modified by proving or verifying: each proof runs on a fresh copy of the
+compiled statement tree, which shares the compiled data. Hence a template can be used from several
+threads at once.
+"""
+
+import copy
+from hashlib import sha256
+
+from zksk.composition import _CommonComposedStmtMixin
+from zksk.extended import ExtendedProofStmt
+from zksk.primitives.dlrep import DLRep
+from zksk.utils.encoding import update_hash_prefix
+
+
+class _CompiledNode:
+    """
+    Shape of a statement in a compiled tree, shared by all the copies of the statement.
+
+    Args:
+        secret_vars: Secrets of the subtree, in order.
+        bases: Bases of the subtree, in order.
+    """
+
+    def __init__(self, secret_vars, bases):
+        self.secret_vars = secret_vars
+        self.bases = bases
+        self.secret_names = tuple(s.name for s in secret_vars)
+
+        # Bases of a same secret yield groups of the same order, as checked at compilation.
+        self.orders = {}
+        for secret, base in zip(secret_vars, bases):
+            if secret not in self.orders:
+                self.orders[secret] = base.group.order()
+
+        # For DLRep leaves, the group order, and the hash of the statement identifier without its
+        # last element, the left-hand side.
+        self.order = None
+        self.digest_prefix = None
+
+
+def _copy_tree(stmt):
+    """
+    Copy a statement tree, down to the leaves.
+
+    Unlike the shallow copies of composed statements, the copies do not share the secret values of
+    their leaves.
+    """
+    stmt = copy.copy(stmt)
+    if isinstance(stmt, _CommonComposedStmtMixin):
+        stmt.subproofs = [_copy_tree(sub) for sub in stmt.subproofs]
+    elif isinstance(getattr(stmt, "secret_values", None), dict):
+        stmt.secret_values = dict(stmt.secret_values)
+    return stmt
+
+
+def _compile_tree(stmt, leaves):
+    """
+    Attach the compiled shape to the statements of a tree, and collect its DLRep leaves.
+
+    Returns:
+        bool: Whether the whole subtree could be compiled.
+    """
+    if isinstance(stmt, ExtendedProofStmt):
+        return False
+
+    if isinstance(stmt, _CommonComposedStmtMixin):
+        compiled = [_compile_tree(sub, leaves) for sub in stmt.subproofs]
+        if not all(compiled):
+            return False
+        # Validate once, before the shape is attached and the validation skipped.
+        stmt.validate_composition()
+        stmt._compiled = _CompiledNode(stmt.get_secret_vars(), stmt.get_bases())
+        return True
+
+    node = _CompiledNode(list(stmt.get_secret_vars()), list(stmt.get_bases()))
+    if isinstance(stmt, DLRep):
+        node.order = stmt.get_order()
+        proof_id = stmt.get_proof_id()
+        node.digest_prefix = sha256()
+        update_hash_prefix(node.digest_prefix, proof_id[:-1], len(proof_id))
+        leaves.append(stmt)
+    stmt._compiled = node
+    return True
+
+
+class CompiledStmt:
+    """
+    Template of a statement, to prove and verify many statements of the same shape.
+
+    The template is built on a copy of the statement: later changes to the statement do not affect
+    it.
+
+    Args:
+        stmt (:py:class:`zksk.composition.ComposableProofStmt`): Statement to compile.
+
+    Raises:
+        :py:class:`zksk.exceptions.GroupMismatchError`,
+        :py:class:`zksk.exceptions.InvalidSecretsError`: If the statement is ill-composed.
+    """
+
+    def __init__(self, stmt):
+        self._stmt = _copy_tree(stmt)
+        self._leaves = []
+        _compile_tree(self._stmt, self._leaves)
+
+    @property
+    def lhs(self):
+        """
+        Default left-hand sides of the DLRep statements of the template, in tree order.
+        """
+        return tuple(leaf.lhs for leaf in self._leaves)
+
+    def instantiate(self, lhs=None):
+        """
+        Build a statement of the template's shape.
+
+        The statement can be used as any other, e.g., in interactive proofs or with
+        :py:func:`zksk.batch.verify_many`. It should not be modified.
+
+        Args:
+            lhs: Left-hand sides of the DLRep statements of the template, in tree order. Defaults
+                to the left-hand sides of the compiled statement.
+
+        Raises:
+            ValueError: If the number of left-hand sides does not match the template.
+        """
+        stmt = _copy_tree(self._stmt)
+        if lhs is None:
+            return stmt
+        if not isinstance(lhs, (list, tuple)):
+            lhs = [lhs]
+        if len(lhs) != len(self._leaves):
+            raise ValueError(
+                "Expected %d left-hand sides, got %d." % (len(self._leaves), len(lhs))
+            )
+
+        # The leaves of the copy, in the same order as the leaves of the template.
+        leaves = []
+        _collect_leaves(stmt, leaves)
+        for leaf, value in zip(leaves, lhs):
+            if value is not leaf.lhs:
+                leaf.lhs = value
+        return stmt
+
+    def prove(
+        self,
+        secret_dict=None,
+        lhs=None,
+        message="",
+        include_commitment=False,
+        executor=None,
+    ):
+        """
+        Generate the transcript of a non-interactive proof of a statement of the template's shape.
+
+        Args:
+            secret_dict: Optional mapping from secrets to their values.
+            lhs: Left-hand sides, as in :py:meth:`instantiate`.
+            message (str): Optional message to make a signature proof of knowledge.
+            include_commitment (bool): Whether to include the commitment in the transcript.
+            executor: Optional thread-pool executor, see
+                :py:meth:`zksk.composition.ComposableProofStmt.prove`.
+        """
+        return self.instantiate(lhs).prove(
+            secret_dict,
+            message=message,
+            include_commitment=include_commitment,
+            executor=executor,
+        )
+
+    def verify(self, nizk, lhs=None, message=""):
+        """
+        Verify a non-interactive proof of a statement of the template's shape.
+
+        Args:
+            nizk (:py:class:`zksk.base.NIZK`): Non-interactive proof.
+            lhs: Left-hand sides, as in :py:meth:`instantiate`.
+            message: A message if a signature proof.
+        """
+        return self.instantiate(lhs).verify(nizk, message=message)
+
+
+def _collect_leaves(stmt, leaves):
+    if isinstance(stmt, _CommonComposedStmtMixin):
+        for sub in stmt.subproofs:
+            _collect_leaves(sub, leaves)
+    elif isinstance(stmt, DLRep) and "_compiled" in stmt.__dict__:
+        leaves.append(stmt)
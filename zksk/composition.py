@@ -6,19 +6,19 @@ import abc
 import copy
 import random
 from hashlib import sha256
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 from petlib.bn import Bn
-from petlib.pack import encode
 
 from zksk.consts import CHALLENGE_LENGTH
 from zksk.base import Prover, Verifier, SimulationTranscript
 from zksk.expr import Secret, update_secret_values
 from zksk.utils import get_random_num, sum_bn_array
-from zksk.utils.misc import get_default_attr
+from zksk.utils.encoding import update_hash
+from zksk.utils.misc import get_default_attr, map_in_order
 from zksk.exceptions import StatementSpecError, StatementMismatch
 from zksk.exceptions import InvalidSecretsError, GroupMismatchError
-from zksk.exceptions import InconsistentChallengeError
+from zksk.exceptions import InconsistentChallengeError, ValidationError
 
 
 def _find_residual_challenge(subchallenges, challenge, modulus):
@@ -39,6 +39,17 @@ def _find_residual_challenge(subchallenges, challenge, modulus):
     return -sum_bn_array(temp_arr, modulus)
 
 
+def _check_commitments(commitment, subproofs):
+    """
+    Check that an untrusted commitment of a composed proof has one part per subproof.
+
+    Raises:
+        ValidationError: If it does not.
+    """
+    if not isinstance(commitment, (list, tuple)) or len(commitment) != len(subproofs):
+        raise ValidationError("Malformed commitment.")
+
+
 def _assign_secret_ids(secret_vars):
     """
     Assign consecutive identifiers to secrets.
@@ -61,6 +72,17 @@ def _assign_secret_ids(secret_vars):
     return secret_id_map
 
 
+# Attributes of statements that their digest depends on.
+_DIGEST_ATTRS = {
+    "lhs",
+    "bases",
+    "secret_vars",
+    "subproofs",
+    "_precommitment",
+    "_constructed_stmt",
+}
+
+
 class ComposableProofStmt(metaclass=abc.ABCMeta):
     """
     A composable sigma-protocol proof statement.
@@ -188,14 +210,26 @@ class ComposableProofStmt(metaclass=abc.ABCMeta):
         """
         pass
 
-    def prove(self, secret_dict=None, message=""):
+    def prove(
+        self, secret_dict=None, message="", include_commitment=False, executor=None
+    ):
         """
         Generate the transcript of a non-interactive proof.
+
+        Args:
+            secret_dict: Optional mapping from secrets to their values.
+            message (str): Optional message to make a signature proof of knowledge.
+            include_commitment (bool): Whether to include the commitment in the transcript, which
+                enables batch verification (see :py:func:`zksk.batch.verify_many`).
+            executor: Optional ``concurrent.futures.ThreadPoolExecutor`` on which to run the
+                subprovers of and-proofs concurrently.
         """
         if secret_dict is None:
             secret_dict = {}
         prover = self.get_prover(secret_dict)
-        return prover.get_nizk_proof(message)
+        return prover.get_nizk_proof(
+            message, include_commitment=include_commitment, executor=executor
+        )
 
     def verify(self, nizk, message=""):
         """
@@ -204,6 +238,37 @@ class ComposableProofStmt(metaclass=abc.ABCMeta):
         verifier = self.get_verifier()
         return verifier.verify_nizk(nizk, message)
 
+    def compile(self):
+        """
+        Compile the statement into a template, to prove and verify many statements of its shape.
+
+        See :py:mod:`zksk.compiled`.
+
+        Returns:
+            :py:class:`zksk.compiled.CompiledStmt`: Template.
+        """
+        from zksk.compiled import CompiledStmt
+
+        return CompiledStmt(self)
+
+    def get_verification_equations(self, challenge, responses, commitment):
+        """
+        Express the verification identity as group equations. Override if possible.
+
+        Each equation is a tuple ``(group, weights, points)`` standing for the claim that the
+        weighted sum of the points is the neutral element of the group. Used by
+        :py:func:`zksk.batch.verify_many` to check many proofs with a single multi-exponentiation.
+
+        Args:
+            challenge: The challenge used in the proof.
+            responses: The responses, as in :py:meth:`recompute_commitment`.
+            commitment: The commitment that was sent by the prover.
+
+        Returns:
+            list: Equations, or None if the statement does not support this.
+        """
+        return None
+
     def check_statement(self, statement_hash):
         """
         Verify the current proof corresponds to the hash passed as a parameter.
@@ -267,11 +332,60 @@ class ComposableProofStmt(metaclass=abc.ABCMeta):
 
         return randomizers_dict
 
+    def __setattr__(self, name, value):
+        # Replacing an attribute the digest depends on invalidates the cached digest.
+        if name in _DIGEST_ATTRS:
+            object.__setattr__(self, "_digest_cache", None)
+        object.__setattr__(self, name, value)
+
+    def get_digest(self):
+        """
+        Compute the digest of the statement, Merkle-style.
+
+        The digest of a composed statement is computed over the digests of its substatements, and
+        every digest is cached. Hence, only the statements that changed since the last call, and
+        their ancestors, are hashed again. Statements are deemed to change when their ``lhs``,
+        ``bases``, ``secret_vars``, ``subproofs`` or precommitment attribute is set. Lists held by
+        these attributes should thus be replaced rather than modified in place.
+
+        Returns:
+            tuple: The digest, and the names of the secrets of the statement in order.
+        """
+        key = self._get_digest_key()
+        cache = self.__dict__.get("_digest_cache")
+        if cache is not None and cache[0] == key:
+            return cache[1]
+        result = self._compute_digest(key)
+        object.__setattr__(self, "_digest_cache", (key, result))
+        return result
+
+    def _get_digest_key(self):
+        """
+        Return what the digest depends on besides the attributes of the statement itself.
+        """
+        return None
+
+    def _compute_digest(self, key):
+        """
+        Compute the digest of the statement.
+
+        Args:
+            key: Output of :py:meth:`_get_digest_key`.
+        """
+        h = sha256()
+        update_hash(h, self.get_proof_id())
+        return h.digest(), tuple(s.name for s in self.get_secret_vars())
+
     def prehash_statement(self):
         """
-        Return a hash of the proof's ID.
+        Return a hash of the statement digest, to be updated with the rest of the transcript.
         """
-        return sha256(encode(str(self.get_proof_id())))
+        digest, _ = self.get_digest()
+        cache = self.__dict__.get("_prehash_cache")
+        if cache is None or cache[0] != digest:
+            cache = (digest, sha256(digest))
+            object.__setattr__(self, "_prehash_cache", cache)
+        return cache[1].copy()
 
     @property
     def simulated(self):
@@ -334,12 +448,18 @@ class ComposableProofStmt(metaclass=abc.ABCMeta):
 
 class _CommonComposedStmtMixin:
     def get_secret_vars(self):
+        compiled = self.__dict__.get("_compiled")
+        if compiled is not None:
+            return compiled.secret_vars
         secret_vars = []
         for sub in self.subproofs:
             secret_vars.extend(sub.get_secret_vars())
         return secret_vars
 
     def get_bases(self):
+        compiled = self.__dict__.get("_compiled")
+        if compiled is not None:
+            return compiled.bases
         bases = []
         for sub in self.subproofs:
             bases.extend(sub.get_bases())
@@ -390,6 +510,20 @@ class _CommonComposedStmtMixin:
         proof_ids = [sub.get_proof_id(secret_id_map) for sub in self.subproofs]
         return (self.__class__.__name__, proof_ids)
 
+    def _get_digest_key(self):
+        return tuple(sub.get_digest() for sub in self.subproofs)
+
+    def _compute_digest(self, key):
+        # Subdigests use identifiers local to each subproof. Bind how secrets are shared among
+        # subproofs with the identifiers over the whole subtree.
+        names = [name for _, sub_names in key for name in sub_names]
+        secret_id_map = {}
+        secret_ids = [secret_id_map.setdefault(name, len(secret_id_map)) for name in names]
+        sub_digests = [digest for digest, _ in key]
+        h = sha256()
+        update_hash(h, [self.__class__.__name__, sub_digests, secret_ids])
+        return h.digest(), tuple(names)
+
     def full_validate(self, *args, **kwargs):
         for sub in self.subproofs:
             sub.full_validate(*args, **kwargs)
@@ -438,6 +572,24 @@ class OrProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
             )
         return com
 
+    def get_verification_equations(self, challenge, responses, commitment):
+        or_challenges, responses = responses
+        if _find_residual_challenge(
+            or_challenges, challenge, CHALLENGE_LENGTH
+        ) != Bn(0):
+            raise InconsistentChallengeError("Inconsistent challenges.")
+
+        _check_commitments(commitment, self.subproofs)
+        equations = []
+        for index, subproof in enumerate(self.subproofs):
+            sub_equations = subproof.get_verification_equations(
+                or_challenges[index], responses[index], commitment[index]
+            )
+            if sub_equations is None:
+                return None
+            equations.extend(sub_equations)
+        return equations
+
     def get_prover(self, secrets_dict=None):
         if secrets_dict is None:
             secrets_dict = {}
@@ -488,7 +640,11 @@ class OrProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
     def validate_composition(self):
         """
         Validate that composition is done correctly.
+
+        Compiled statements were validated at compilation.
         """
+        if "_compiled" in self.__dict__:
+            return
         self.validate_group_orders()
 
     def validate_secrets_reoccurence(self, forbidden_secrets=None):
@@ -508,8 +664,9 @@ class OrProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
         if forbidden_secrets is None:
             return
 
-        for secret in set(secret_vars):
-            if forbidden_secrets.count(secret) > secret_vars.count(secret):
+        forbidden_counts = Counter(forbidden_secrets)
+        for secret, count in Counter(secret_vars).items():
+            if forbidden_counts[secret] > count:
                 raise InvalidSecretsError(
                     "Invalid secrets found. Try to flatten the proof to avoid "
                     "using secrets used inside an or-proof in other parts of "
@@ -588,6 +745,7 @@ class OrProver(Prover):
     def precommit(self):
         # Generate precommitment for the legit subprover, and gather the precommitments from the
         # stored simulations.
+        self.subprover.executor = self.executor
         precommitment = []
         for index, _ in enumerate(self.stmt.subproofs):
             if index == self.true_prover_idx:
@@ -613,6 +771,7 @@ class OrProver(Prover):
         # Now that all proofs have been constructed, we can check
         self.stmt.validate_composition()
 
+        self.subprover.executor = self.executor
         commitment = []
         for index, _ in enumerate(self.stmt.subproofs):
             if index == self.true_prover_idx:
@@ -725,7 +884,11 @@ class AndProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
     def validate_composition(self, *args, **kwargs):
         """
         Validate that composition is done correctly.
+
+        Compiled statements were validated at compilation.
         """
+        if "_compiled" in self.__dict__:
+            return
         self.validate_group_orders()
         self.validate_secrets_reoccurence()
 
@@ -735,6 +898,18 @@ class AndProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
             com.append(subproof.recompute_commitment(challenge, responses[index]))
         return com
 
+    def get_verification_equations(self, challenge, responses, commitment):
+        _check_commitments(commitment, self.subproofs)
+        equations = []
+        for index, subproof in enumerate(self.subproofs):
+            sub_equations = subproof.get_verification_equations(
+                challenge, responses[index], commitment[index]
+            )
+            if sub_equations is None:
+                return None
+            equations.extend(sub_equations)
+        return equations
+
     def get_prover(self, secrets_dict=None):
         if secrets_dict is None:
             secrets_dict = {}
@@ -765,6 +940,12 @@ class AndProofStmt(_CommonComposedStmtMixin, ComposableProofStmt):
         """
         random_vals = {}
 
+        compiled = self.__dict__.get("_compiled")
+        if compiled is not None:
+            for u, order in compiled.orders.items():
+                random_vals[u] = order.random()
+            return random_vals
+
         # Pair each Secret to one generator. Overwrites when a Secret re-occurs but since the
         # associated bases should yield groups of same order, it's fine.
         dict_name_gen = {s: g for s, g in zip(self.get_secret_vars(), self.get_bases())}
@@ -852,10 +1033,14 @@ class AndProver(Prover):
 
         If not applicable (no subprover outputs a precommitment), returns None.
         """
+        for sub in self.subs:
+            sub.executor = self.executor
+        sub_precommitments = map_in_order(
+            self.executor, lambda sub: sub.precommit(), self.subs
+        )
+
         precommitment = []
-        for index, sub in enumerate(self.subs):
-            # Collect precommitments one by one
-            sub_precommitment = sub.precommit()
+        for index, sub_precommitment in enumerate(sub_precommitments):
             if sub_precommitment is not None:
                 if len(precommitment) == 0:
                     precommitment = [None] * len(self.subs)
@@ -875,18 +1060,22 @@ class AndProver(Prover):
         self.stmt.validate_composition()
 
         randomizers_dict = self.stmt.update_randomizers(randomizers_dict)
-        self.commitment = []
         for sub in self.subs:
-            self.commitment.append(
-                sub.internal_commit(randomizers_dict=randomizers_dict)
-            )
+            sub.executor = self.executor
+        self.commitment = map_in_order(
+            self.executor,
+            lambda sub: sub.internal_commit(randomizers_dict=randomizers_dict),
+            self.subs,
+        )
         return self.commitment
 
     def compute_response(self, challenge):
         """
         Return a list of responses of each subprover.
         """
-        return [sub.compute_response(challenge) for sub in self.subs]
+        return map_in_order(
+            self.executor, lambda sub: sub.compute_response(challenge), self.subs
+        )
 
 
 class AndVerifier(Verifier):
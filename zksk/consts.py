@@ -4,3 +4,4 @@ from petlib.bn import Bn
 
 CHALLENGE_LENGTH = Bn(128)
 DEFAULT_GROUP = EcGroup(713)
+BATCH_WEIGHT_LENGTH = Bn(128)
@@ -15,6 +15,7 @@ import struct
 import hashlib
 
 from zksk.exceptions import InvalidExpression, IncompleteValuesError
+from zksk.utils import multiexp
 
 
 class Expression:
@@ -77,13 +78,7 @@ class Expression:
                     "Secret {0} does not have a value".format(secret.name)
                 )
 
-        def ith_mul(i):
-            return self._secrets[i].value * self._bases[i]
-
-        summation = ith_mul(0)
-        for i in range(1, len(self._secrets)):
-            summation += ith_mul(i)
-        return summation
+        return multiexp([secret.value for secret in self._secrets], self._bases)
 
     def __repr__(self):
         fragments = []
@@ -24,11 +24,13 @@ The protocol of an extended proof is as follows:
 """
 
 import abc
+from hashlib import sha256
 
 from zksk.base import Prover, Verifier
-from zksk.composition import ComposableProofStmt
+from zksk.composition import ComposableProofStmt, _assign_secret_ids
 from zksk.exceptions import StatementSpecError
-from zksk.utils.misc import get_default_attr
+from zksk.utils.encoding import decode_points, update_hash
+from zksk.utils.misc import get_default_attr, map_in_order
 
 
 class ExtendedProofStmt(ComposableProofStmt, metaclass=abc.ABCMeta):
@@ -79,15 +81,40 @@ class ExtendedProofStmt(ComposableProofStmt, metaclass=abc.ABCMeta):
         """
         pass
 
+    def get_outer_proof_id(self):
+        """
+        Identify the statement without constructing it. Override if possible.
+
+        Override this method to return the public values and the secrets that the statement is
+        constructed from, besides the precommitment. They must cover everything
+        :py:meth:`construct_stmt` and :py:meth:`validate` depend on. The digest of the statement
+        is then computed over them and the precommitment, rather than over the constructed
+        statement. Hence, verifiers check the statement hash of a proof before they decode the
+        points of its precommitment and construct the statement.
+
+        Returns:
+            tuple: Public values, and list of secrets. None to compute the digest over the
+            constructed statement.
+        """
+        return None
+
     def full_validate(self, *args, **kwargs):
         self.validate(self.precommitment, *args, **kwargs)
 
     @property
     def constructed_stmt(self):
+        if self.__dict__.get("_construction_pending"):
+            self._construction_pending = False
+            precommitment = decode_points(self._precommitment)
+            # The decoded points encode as the encoded ones, so the digest does not change.
+            object.__setattr__(self, "_precommitment", precommitment)
+            object.__setattr__(self, "_constructed_stmt", self.construct_stmt(precommitment))
         return get_default_attr(self, "_constructed_stmt")
 
     @property
     def precommitment(self):
+        if self.__dict__.get("_construction_pending"):
+            self.constructed_stmt
         return get_default_attr(self, "_precommitment")
 
     def get_secret_vars(self):
@@ -120,6 +147,11 @@ class ExtendedProofStmt(ComposableProofStmt, metaclass=abc.ABCMeta):
     def recompute_commitment(self, challenge, responses):
         return self.constructed_stmt.recompute_commitment(challenge, responses)
 
+    def get_verification_equations(self, challenge, responses, commitment):
+        return self.constructed_stmt.get_verification_equations(
+            challenge, responses, commitment
+        )
+
     def get_proof_id(self, secret_id_map=None):
         """
         Identifier for the proof statement.
@@ -134,11 +166,49 @@ class ExtendedProofStmt(ComposableProofStmt, metaclass=abc.ABCMeta):
             raise ValueError("Proof ID unknown before the proof is constructed.")
         return proof_id
 
+    def _get_digest_key(self):
+        outer_id = self.get_outer_proof_id()
+        if outer_id is not None:
+            if get_default_attr(self, "_precommitment") is None:
+                raise ValueError("Proof ID unknown before the precommitment.")
+            return outer_id, None
+        if self.constructed_stmt is None:
+            raise ValueError("Proof ID unknown before the proof is constructed.")
+        return None, self.constructed_stmt.get_digest()
+
+    def _compute_digest(self, key):
+        outer_id, constructed_digest = key
+        h = sha256()
+        if outer_id is None:
+            constructed_digest, names = constructed_digest
+            update_hash(h, [self.__class__.__name__, self.precommitment, constructed_digest])
+            return h.digest(), names
+
+        public_values, secret_vars = outer_id
+        secret_id_map = _assign_secret_ids(secret_vars)
+        secret_ids = [secret_id_map[s.name] for s in secret_vars]
+        update_hash(
+            h, [self.__class__.__name__, public_values, secret_ids, self._precommitment]
+        )
+        return h.digest(), tuple(s.name for s in secret_vars)
+
     def full_construct_stmt(self, precommitment):
+        self._construction_pending = False
         self._precommitment = precommitment
         self._constructed_stmt = self.construct_stmt(precommitment)
         return self.constructed_stmt
 
+    def defer_construct_stmt(self, precommitment):
+        """
+        Keep a received precommitment, and construct the statement when it is first needed.
+
+        The points of the precommitment may still be encoded (see
+        :py:func:`zksk.utils.encoding.unpack_lazily`). They are decoded to construct the statement.
+        """
+        self._precommitment = precommitment
+        self._constructed_stmt = None
+        self._construction_pending = True
+
     def prepare_simulate_proof(self):
         self._precommitment = self.simulate_precommit()
         self.full_construct_stmt(self.precommitment)
@@ -194,11 +264,10 @@ class ExtendedProver(Prover):
     def precommit(self):
         self.precommitment = self.stmt._precommit()
         self.process_precommitment()
-        try:
-            for p in self.constructed_prover.subs:
-                p.precommit()
-        except AttributeError:
-            pass
+        subs = getattr(self.constructed_prover, "subs", [])
+        for p in subs:
+            p.executor = self.executor
+        map_in_order(self.executor, lambda p: p.precommit(), subs)
         return self.precommitment
 
     def process_precommitment(self):
@@ -209,6 +278,7 @@ class ExtendedProver(Prover):
         self.constructed_prover = self.stmt._constructed_stmt.get_prover(
             self.secret_values
         )
+        self.constructed_prover.executor = self.executor
 
 
 class ExtendedVerifier(Verifier):
@@ -219,10 +289,22 @@ class ExtendedVerifier(Verifier):
     def process_precommitment(self, precommitment):
         """
         Receive the precommitment and trigger the inner-verifier construction.
+
+        If the digest of the statement does not depend on the constructed statement, the
+        construction is deferred until it is needed, i.e., after the statement hash is checked.
         """
         self.precommitment = precommitment
-        self.stmt.full_construct_stmt(precommitment)
-        self.constructed_verifier = self.stmt.constructed_stmt.get_verifier()
+        self._constructed_verifier = None
+        if self.stmt.get_outer_proof_id() is not None:
+            self.stmt.defer_construct_stmt(precommitment)
+        else:
+            self.stmt.full_construct_stmt(decode_points(precommitment))
+
+    @property
+    def constructed_verifier(self):
+        if getattr(self, "_constructed_verifier", None) is None:
+            self._constructed_verifier = self.stmt.constructed_stmt.get_verifier()
+        return self._constructed_verifier
 
     def send_challenge(self, com):
         """
@@ -0,0 +1,364 @@
+"""
+Streams of serialized proofs.
+
+:py:class:`ProofWriter` appends proofs to a file-like object, each in a frame that starts with the
+size of the proof and the hash of its statement. :py:class:`ProofReader` reads them back lazily,
+one frame at a time. Hence, a stream of any length is processed in constant memory, and the proofs
+of other statements are skipped without being decoded.
+
+Proofs are serialized with :py:meth:`zksk.base.NIZK.serialize`, or with a
+:py:class:`zksk.wire.WireFormat` if one is given.
+
+For random access, :py:class:`ProofArchiveWriter` writes the same frames to a file, followed by an
+index of their offsets. :py:class:`ProofArchive` maps the file in memory, and decodes single proofs,
+by position, by statement hash, or by a key given when writing, from slices of the mapping.
+
+>>> import io
+>>> from zksk import Secret, DLRep
+>>> from zksk.utils import make_generators
+>>> g, h = make_generators(2)
+>>> x = Secret()
+>>> stmts = [DLRep(i * g, x * g) for i in range(1, 4)]
+>>> f = io.BytesIO()
+>>> writer = ProofWriter(f)
+>>> for i, stmt in enumerate(stmts, 1):
+...     _ = writer.write(stmt.prove({x: i}))
+>>> _ = f.seek(0)
+>>> all(stmt.verify(nizk) for stmt, nizk in zip(stmts, ProofReader(f)))
+True
+
+"""
+
+import mmap
+import os
+import struct
+
+import msgpack
+
+from zksk.base import NIZK
+from zksk.wire import MAX_SIZE
+
+
+# Frame header: size of the proof, and size of the statement hash that follows.
+_HEADER = struct.Struct(">IB")
+
+# Archive trailer: offset of the index, and magic bytes.
+_TRAILER = struct.Struct(">Q8s")
+_ARCHIVE_MAGIC = b"ZKSKARC1"
+
+# Size of the chunks in which skipped proofs are read from streams that can't seek.
+SKIP_CHUNK_SIZE = 1 << 16
+
+
+def _check_key(key):
+    """
+    Check that a key of an archive reads back as the same hashable value.
+    """
+    if isinstance(key, tuple):
+        for item in key:
+            _check_key(item)
+    elif not isinstance(key, (str, bytes, int)):
+        raise TypeError("Keys must be strings, bytes, integers, or tuples of them.")
+
+
+def _decode(data, wire, lazy):
+    if wire is not None:
+        return wire.decode(data)
+    return NIZK.deserialize(data, lazy=lazy)
+
+
+class ProofWriter:
+    """
+    Write proofs to a stream.
+
+    Args:
+        f: Binary file-like object, open for writing.
+        wire (:py:class:`zksk.wire.WireFormat`): Format of the proofs. Defaults to
+            :py:meth:`zksk.base.NIZK.serialize`.
+    """
+
+    def __init__(self, f, wire=None):
+        self.f = f
+        self.wire = wire
+
+    def write(self, nizk):
+        """
+        Append a proof to the stream.
+
+        Returns:
+            Statement hash of the proof, and size of the serialized proof.
+        """
+        data = self.wire.encode(nizk) if self.wire is not None else nizk.serialize()
+        stmt_hash = nizk.stmt_hash or b""
+        if len(stmt_hash) > 255:
+            raise ValueError("Statement hash too long.")
+        self.f.write(_HEADER.pack(len(data), len(stmt_hash)))
+        self.f.write(stmt_hash)
+        self.f.write(data)
+        return stmt_hash, len(data)
+
+
+class ProofReader:
+    """
+    Read proofs from a stream, lazily.
+
+    Iterating over the reader yields the proofs, decoded one at a time.
+
+    Args:
+        f: Binary file-like object, open for reading.
+        wire (:py:class:`zksk.wire.WireFormat`): Format of the proofs. Defaults to
+            :py:meth:`zksk.base.NIZK.deserialize`.
+        stmt_hashes: If given, only yield the proofs whose statement hash is in this collection.
+            Other proofs are skipped without being decoded.
+        max_size (int): Maximum size of a proof, in bytes. Bounds the memory used by the reader.
+        lazy (bool): Decode the points of the proofs on first access. See
+            :py:class:`zksk.base.LazyNIZK`. Only for proofs serialized with
+            :py:meth:`zksk.base.NIZK.serialize`.
+
+    Raises:
+        ValueError: While iterating, if a proof is larger than ``max_size``, or the stream ends in
+            the middle of a frame.
+    """
+
+    def __init__(self, f, wire=None, stmt_hashes=None, max_size=MAX_SIZE, lazy=False):
+        self.f = f
+        self.wire = wire
+        self.stmt_hashes = None if stmt_hashes is None else set(stmt_hashes)
+        self.max_size = max_size
+        self.lazy = lazy
+
+    def __iter__(self):
+        for _, data in self.frames():
+            yield _decode(data, self.wire, self.lazy)
+
+    def frames(self):
+        """
+        Yield the statement hashes and the serialized proofs that pass the filter.
+        """
+        while True:
+            header = self._read(_HEADER.size, allow_eof=True)
+            if header is None:
+                return
+            size, hash_size = _HEADER.unpack(header)
+            if size > self.max_size:
+                raise ValueError("Proof of {} bytes, more than {}.".format(size, self.max_size))
+            stmt_hash = self._read(hash_size)
+            if self.stmt_hashes is not None and stmt_hash not in self.stmt_hashes:
+                self._skip(size)
+                continue
+            yield stmt_hash, self._read(size)
+
+    def _read(self, size, allow_eof=False):
+        data = self.f.read(size)
+        if allow_eof and not data:
+            return None
+        while len(data) < size:
+            chunk = self.f.read(size - len(data))
+            if not chunk:
+                raise ValueError("The stream ends in the middle of a proof.")
+            data += chunk
+        return data
+
+    def _skip(self, size):
+        seekable = getattr(self.f, "seekable", None)
+        if seekable is not None and seekable():
+            end = self.f.tell() + size
+            if self.f.seek(0, 2) < end:
+                raise ValueError("The stream ends in the middle of a proof.")
+            self.f.seek(end)
+            return
+        while size > 0:
+            size -= len(self._read(min(size, SKIP_CHUNK_SIZE)))
+
+
+class ProofArchiveWriter:
+    """
+    Append proofs to an archive file.
+
+    If the file exists, it must be an archive, and the new proofs are appended to the ones in it.
+    The new index is written after them when the writer is closed. Until then, the previous index
+    stays in the file, and readers find the proofs it lists. Use the writer as a context manager::
+
+        with ProofArchiveWriter(path) as writer:
+            writer.write(nizk, key="alice")
+
+    Args:
+        path: Path of the archive.
+        wire (:py:class:`zksk.wire.WireFormat`): Format of the proofs. Defaults to
+            :py:meth:`zksk.base.NIZK.serialize`.
+    """
+
+    def __init__(self, path, wire=None):
+        if os.path.exists(path):
+            with ProofArchive(path) as archive:
+                self.entries = [list(entry) for entry in archive.entries]
+            self.f = open(path, "ab")
+        else:
+            self.entries = []
+            self.f = open(path, "wb")
+        self.writer = ProofWriter(self.f, wire=wire)
+
+    def write(self, nizk, key=None):
+        """
+        Append a proof to the archive.
+
+        Args:
+            nizk (:py:class:`zksk.base.NIZK`): Proof.
+            key: Optional key to find the proof with: a string, bytes, an integer, or a tuple
+                of them.
+
+        Returns:
+            int: Position of the proof in the archive.
+
+        Raises:
+            TypeError: If the key is of another type.
+        """
+        if key is not None:
+            _check_key(key)
+        offset = self.f.tell()
+        stmt_hash, size = self.writer.write(nizk)
+        offset += _HEADER.size + len(stmt_hash)
+        self.entries.append([offset, size, stmt_hash, key])
+        return len(self.entries) - 1
+
+    def close(self):
+        """
+        Write the index, and close the file.
+        """
+        if self.f.closed:
+            return
+        index_offset = self.f.tell()
+        self.f.write(msgpack.packb(self.entries, use_bin_type=True))
+        self.f.write(_TRAILER.pack(index_offset, _ARCHIVE_MAGIC))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ProofArchive:
+    """
+    Read proofs from an archive file, in any order.
+
+    The archive is mapped in memory. Only the index is loaded when opening it, and a proof is
+    decoded from a slice of the mapping when it is requested.
+
+    Args:
+        path: Path of the archive.
+        wire (:py:class:`zksk.wire.WireFormat`): Format of the proofs. Defaults to
+            :py:meth:`zksk.base.NIZK.deserialize`.
+        lazy (bool): Decode the points of the proofs on first access, as in
+            :py:class:`ProofReader`.
+
+    If the file does not end with an index, e.g., because a writer appending to it was not closed,
+    the last complete index is used.
+
+    Raises:
+        ValueError: If the file is not an archive, e.g., the first writer was not closed.
+    """
+
+    def __init__(self, path, wire=None, lazy=False):
+        self.wire = wire
+        self.lazy = lazy
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _TRAILER.size:
+                raise ValueError("Not a proof archive.")
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+
+        index = self._read_index(size - _TRAILER.size)
+        end = size
+        while index is None:
+            end = self.data.rfind(_ARCHIVE_MAGIC, 0, end - 1)
+            if end < _TRAILER.size - len(_ARCHIVE_MAGIC):
+                self.close()
+                raise ValueError("Not a proof archive.")
+            index = self._read_index(end + len(_ARCHIVE_MAGIC) - _TRAILER.size)
+        self.index_offset, self.entries = index
+
+        self.by_hash = {}
+        self.by_key = {}
+        for i, (_, _, stmt_hash, key) in enumerate(self.entries):
+            self.by_hash.setdefault(stmt_hash, []).append(i)
+            if key is not None:
+                self.by_key[key] = i
+
+    def _read_index(self, trailer_offset):
+        """
+        Read the index whose trailer starts at an offset, or return None if there is none.
+        """
+        index_offset, magic = _TRAILER.unpack(
+            self.view[trailer_offset : trailer_offset + _TRAILER.size]
+        )
+        if magic != _ARCHIVE_MAGIC or index_offset > trailer_offset:
+            return None
+        try:
+            # Tuple keys are read back as tuples.
+            entries = msgpack.unpackb(
+                self.view[index_offset:trailer_offset], raw=False, use_list=False
+            )
+            if all(offset + length <= index_offset for offset, length, _, _ in entries):
+                return index_offset, entries
+        except Exception:
+            pass
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def raw(self, i):
+        """
+        Serialized proof at a position, as a ``memoryview`` of the mapping.
+        """
+        offset, size, _, _ = self.entries[i]
+        return self.view[offset : offset + size]
+
+    def __getitem__(self, i):
+        return _decode(self.raw(i), self.wire, self.lazy)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, stmt_hash):
+        """
+        Yield the proofs of a statement, given its hash, in the order they were written.
+        """
+        for i in self.by_hash.get(stmt_hash, []):
+            yield self[i]
+
+    def get(self, key):
+        """
+        Proof written with a key. If several proofs have the key, the last one.
+
+        Raises:
+            KeyError: If no proof has the key.
+        """
+        return self[self.by_key[key]]
+
+    def close(self):
+        """
+        Unmap the archive.
+
+        The proofs decoded from it stay valid. The views returned by :py:meth:`raw` too: the file
+        is only unmapped once they are all released.
+        """
+        if self.data is None:
+            return
+        self.view.release()
+        try:
+            self.data.close()
+        except BufferError:
+            # The mapping is closed when the last view is garbage-collected.
+            pass
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
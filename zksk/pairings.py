@@ -1,10 +1,25 @@
 """
 Wrapper around ``bplib`` points that ensures additive notation for all points.
+
+Group pairs are heavy to build. :py:func:`get_group_pair` returns a group pair shared by the whole
+process for each curve, which decoded points also use.
+
+Pairings are lazy: they are only computed when their value is needed, and then all together (see
+:py:class:`AdditivePoint`).
 """
 
+import copy
+import struct
+
 import attr
 
 from bplib.bp import BpGroup, G1Elem, G2Elem, GTElem
+from bplib.bindings import _FFI, _C
+from petlib.bn import Bn
+
+from zksk.utils.encoding import register_lazy_point
+from zksk.utils.fixedbase import unwrap
+from zksk.utils.multiexp import multiexp
 
 import petlib.pack as pack
 import msgpack
@@ -20,7 +35,8 @@ class BilinearGroupPair:
 
     def __init__(self, bp_group=None):
         if bp_group is None:
-            self.bpgp = BpGroup()
+            bp_group = BpGroup()
+        self.bpgp = bp_group
         self.GT = GTGroup(self)
         self.G1 = G1Group(self)
         self.G2 = G2Group(self)
@@ -32,6 +48,43 @@ class BilinearGroupPair:
         return self.G1, self.G2, self.GT
 
 
+# Group pairs shared by the process, by curve identifier.
+_GROUP_PAIRS = {}
+
+# Maximum number of pairings in a lazy point of GT. Sums with more are evaluated.
+MAX_LAZY_TERMS = 32
+
+
+def get_group_pair(nid=None):
+    """
+    Return the group pair of a curve shared by the process.
+
+    Points of the shared group pair, including decoded points, live in the same group objects.
+
+    Args:
+        nid: Identifier of the curve. Defaults to the default curve of ``bplib``.
+
+    Returns:
+        :py:class:`BilinearGroupPair`: Group pair.
+
+    Raises:
+        ValueError: If ``bplib`` does not support the curve.
+    """
+    bp = _GROUP_PAIRS.get(nid) if isinstance(nid, int) or nid is None else None
+    if bp is None:
+        # bplib only supports its default curve, and crashes when given another identifier, e.g.,
+        # one read from a forged point. Never pass it one.
+        default = _GROUP_PAIRS.get(None)
+        if default is None:
+            default = BilinearGroupPair()
+            _GROUP_PAIRS[None] = default
+            _GROUP_PAIRS[default.bpgp.nid] = default
+        if nid is not None and nid != default.bpgp.nid:
+            raise ValueError("Unsupported curve: {!r}.".format(nid))
+        bp = default
+    return bp
+
+
 class GTGroup:
     """
     Wrapper for the GT group with additive points.
@@ -52,12 +105,15 @@ class GTGroup:
 
     def infinite(self):
         if self.inf is None:
-            self.inf = AdditivePoint(self.generator().pt.one(self.bp.bpgp), self.bp)
+            self.inf = AdditivePoint(GTElem.one(self.bp.bpgp), self.bp)
         return self.inf
 
     def order(self):
         return self.bp.bpgp.order()
 
+    def __eq__(self, other):
+        return self.bp.bpgp == other.bp.bpgp and self.__class__ == other.__class__
+
     def generator(self):
         if self.gen is None:
             self.gen = self.bp.G1.generator().pair(self.bp.G2.generator())
@@ -70,29 +126,97 @@ class GTGroup:
         return res
 
     def wsum(self, weights, generators):
-        res = self.infinite()
+        return multiexp(weights, generators, group=self)
+
+    def native_multiexp(self, weights, generators):
+        """
+        Weighted sum that keeps the pairings lazy, see :py:class:`AdditivePoint`.
+
+        Only the values of the points that have one are exponentiated.
+        """
+        order = self.order()
+        terms, const_weights, consts = [], [], []
         for w, g in zip(weights, generators):
-            res = res + w * g
-        return res
+            terms.extend((w * c % order, p, q) for c, p, q in g.terms)
+            if g.const is not None:
+                const_weights.append(w)
+                consts.append(AdditivePoint(g.const, self.bp))
+        const = None
+        if consts:
+            const = multiexp(const_weights, consts, group=self, algorithm="straus").pt
+        return AdditivePoint(const, self.bp, terms)
 
 
 # TODO: Why should this not just be called GTPoint?
 class AdditivePoint:
-    """
+    r"""
     A wrapper for GT points that uses additive notation.
 
+    Points of GT are lazy: pairings :math:`e(P, Q)` are recorded rather than computed, and sums and
+    scalar multiples only combine records. A point is a value of GT (possibly none) plus a sum of
+    weighted pairings :math:`\sum_i c_i e(P_i, Q_i)`. The value is only computed when needed, e.g.,
+    to compare or export the point. Then, the scalars are moved into G1, the terms that share
+    :math:`Q_i` are merged, and all the pairings are computed at once with :py:func:`multi_pair`.
+
+    Hence, a weighted sum of pairings costs multi-exponentiations in G1 and a single final
+    exponentiation, instead of as many pairings and exponentiations in GT as terms.
+
     Args:
-        pt (``bplib.bp.GTElem``): Wrapped point.
+        pt (``bplib.bp.GTElem``): Wrapped point, or None.
         bp (:py:class:`BilinearGroupPair`): Group pair.
+        terms: Weighted pairings, as triplets :math:`(c_i, P_i, Q_i)`.
+        value (``bplib.bp.GTElem``): Value of the point, if already known, e.g., loaded from disk.
     """
 
-    def __init__(self, pt, bp):
-        self.pt = pt
+    def __init__(self, pt, bp, terms=(), value=None):
+        self.const = pt
+        self.terms = list(terms)
         self.bp = bp
         self.group = self.bp.GT
+        self._value = pt if not self.terms else value
+
+    @property
+    def pt(self):
+        if self._value is None:
+            self._value = self._evaluate()
+        return self._value
+
+    def _evaluate(self):
+        """
+        Compute the value of the point.
+        """
+        # Merge the terms that share the point of G2.
+        qs, weights, points = [], [], []
+        for c, p, q in self.terms:
+            for i, other in enumerate(qs):
+                if q is other or q == other:
+                    break
+            else:
+                i = len(qs)
+                qs.append(q)
+                weights.append([])
+                points.append([])
+            weights[i].append(c)
+            points[i].append(p)
+
+        g1_points, g2_points = [], []
+        for q, ws, ps in zip(qs, weights, points):
+            p = ps[0].group.wsum(ws, ps)
+            if p != p.group.infinite():
+                g1_points.append(p)
+                g2_points.append(q)
+
+        value = self.const
+        if g1_points:
+            paired = multi_pair(g1_points, g2_points).pt
+            value = paired if value is None else value * paired
+        if value is None:
+            value = GTElem.one(self.bp.bpgp)
+        return value
 
     def export(self, form=0):
-        return self.pt.export(form) if form else self.pt.export()
+        # Elements of GT have a single encoding.
+        return self.pt.export()
 
     def __mul__(self, nb):
         """
@@ -102,8 +226,11 @@ class AdditivePoint:
         this value.
         """
         if nb == 0:
-            return AdditivePoint(self.pt / self.pt, self.bp)
-        return AdditivePoint(self.pt ** nb, self.bp)
+            return AdditivePoint(GTElem.one(self.bp.bpgp), self.bp)
+        order = self.group.order()
+        const = None if self.const is None else self.const ** nb
+        terms = [(c * nb % order, p, q) for c, p, q in self.terms]
+        return AdditivePoint(const, self.bp, terms)
 
     def __eq__(self, other):
         return self.pt == other.pt
@@ -112,7 +239,22 @@ class AdditivePoint:
         """
         Replace the multiplicative syntax between two points by an additive one.
         """
-        return AdditivePoint(self.pt * (other.pt), self.bp)
+        if other is self:
+            return self * 2
+        if self._value is not None and other._value is not None:
+            return AdditivePoint(self._value * other._value, self.bp)
+        if self.const is None:
+            const = other.const
+        elif other.const is None:
+            const = self.const
+        else:
+            const = self.const * other.const
+        point = AdditivePoint(const, self.bp, self.terms + other.terms)
+        if len(point.terms) > MAX_LAZY_TERMS:
+            # Repeated additions, e.g., in windowed multiplications, would otherwise double the
+            # number of terms at each step.
+            return AdditivePoint(point.pt, self.bp)
+        return point
 
     __rmul__ = __mul__
 
@@ -154,8 +296,16 @@ class G1Point:
 
     __rmul__ = __mul__
 
-    def pair(self, other):
-        return AdditivePoint(self.bp.bpgp.pair(self.pt, other.pt), self.bp)
+    def pair(self, other, value=None):
+        """
+        Pair with a point of G2. The pairing is only computed when its value is needed.
+
+        Args:
+            other: Point of G2.
+            value (:py:class:`AdditivePoint`): Value of the pairing, if already known.
+        """
+        value = None if value is None else value.pt
+        return AdditivePoint(None, self.bp, [(Bn(1), self, unwrap(other))], value=value)
 
     def __repr__(self):
         return "G1Pt(" + str(self.pt.__hash__()) + ")"
@@ -199,6 +349,49 @@ class G2Point:
         return "G2Pt(" + str(self.pt.__hash__()) + ")"
 
 
+class PreparedG2Point(G2Point):
+    """
+    A point of G2 prepared to be paired many times, e.g., a point of a public key.
+
+    Pairings normalize their point of G2 to affine coordinates, which costs an inversion every time
+    the point is paired. A prepared point is normalized once, when it is built. Lazy pairings (see
+    :py:class:`AdditivePoint`) with the same prepared point are also merged without comparing
+    points.
+
+    ``bplib`` does not expose the line functions of its Miller loop, so these are still computed
+    for every pairing.
+
+    Args:
+        pt (``bplib.bp.G2Point``): Point. It is copied, not modified.
+        bp (:py:class:`BilinearGroupPair`): Group pair.
+    """
+
+    def __init__(self, pt, bp):
+        pt = copy.copy(pt)
+        if not pt.isinf() and not _C.G2_ELEM_make_affine(bp.bpgp.bpg, pt.elem, _FFI.NULL):
+            raise RuntimeError("Could not normalize the point.")
+        super().__init__(pt, bp)
+
+    def __repr__(self):
+        return "PreparedG2Pt(" + str(self.pt.__hash__()) + ")"
+
+
+def prepare(point):
+    """
+    Prepare a point of G2 to be paired many times.
+
+    Args:
+        point: Point of G2, possibly wrapped (see :py:func:`zksk.utils.fixedbase.precompute`).
+
+    Returns:
+        :py:class:`PreparedG2Point`: Prepared point. Already prepared points are returned as is.
+    """
+    point = unwrap(point)
+    if isinstance(point, PreparedG2Point):
+        return point
+    return PreparedG2Point(point.pt, point.bp)
+
+
 class G1Group:
     """
     Wrapper for G1 that behaves like normal ``petlib.ec.EcGroup``.
@@ -240,10 +433,15 @@ class G1Group:
 
     # TODO throw these on a base class
     def wsum(self, weights, generators):
-        res = self.infinite()
-        for w, g in zip(weights, generators):
-            res = res + w * g
-        return res
+        return multiexp(weights, generators, group=self)
+
+    def native_multiexp(self, weights, generators):
+        return G1Point(
+            _native_multiexp(
+                G1Elem, "G1_ELEM", _C.G1_ELEMs_mul, self.bp.bpgp, weights, generators
+            ),
+            self.bp,
+        )
 
 
 class G2Group:
@@ -273,6 +471,9 @@ class G2Group:
     def order(self):
         return self.bp.bpgp.order()
 
+    def __eq__(self, other):
+        return self.bp.bpgp == other.bp.bpgp and self.__class__ == other.__class__
+
     # TODO throw these on a base class
     def sum(self, points):
         res = self.infinite()
@@ -281,33 +482,114 @@ class G2Group:
         return res
 
     def wsum(self, weights, generators):
-        res = self.infinite()
-        for w, g in zip(weights, generators):
-            res = res + w * g
-        return res
+        return multiexp(weights, generators, group=self)
+
+    def native_multiexp(self, weights, generators):
+        return G2Point(
+            _native_multiexp(
+                G2Elem, "G2_ELEM", _C.G2_ELEMs_mul, self.bp.bpgp, weights, generators
+            ),
+            self.bp,
+        )
+
+
+def _native_multiexp(elem_cls, elem_type, mul, bpgp, weights, generators):
+    """
+    Multi-exponentiation with the wNAF-based ``G1_ELEMs_mul``/``G2_ELEMs_mul`` of ``bplib``.
+
+    Args:
+        elem_cls: ``bplib`` element class of the result.
+        elem_type: C type of the elements.
+        mul: C multi-exponentiation function.
+        bpgp (``bplib.bp.BpGroup``): Group.
+        weights: Big numbers.
+        generators: Wrapped points.
+    """
+    res = elem_cls(bpgp)
+    points = _FFI.new("const %s *[]" % elem_type, [g.pt.elem for g in generators])
+    scalars = _FFI.new("const BIGNUM *[]", [w.bn for w in weights])
+    if not mul(bpgp.bpg, res.elem, _FFI.NULL, len(generators), points, scalars, _FFI.NULL):
+        raise RuntimeError("Multi-exponentiation failed.")
+    return res
+
+
+def multi_pair(g1_points, g2_points):
+    r"""
+    Compute the sum of pairings :math:`\sum_i e(P_i, Q_i)`.
+
+    The Miller loops of all the pairs share a single final exponentiation, which makes this cheaper
+    than summing the pairings one by one.
+
+    Args:
+        g1_points: Points :math:`P_i` of G1.
+        g2_points: Points :math:`Q_i` of G2, as many as points of G1.
+
+    Returns:
+        :py:class:`AdditivePoint`: The sum, in GT.
+    """
+    if len(g1_points) != len(g2_points) or not g1_points:
+        raise ValueError("Need as many points of G1 as points of G2, and at least one.")
+    bp = g1_points[0].bp
+    # Pairings with the neutral element are neutral.
+    pairs = [
+        (p.pt, q.pt)
+        for p, q in zip(g1_points, g2_points)
+        if not p.pt.isinf() and not q.pt.isinf()
+    ]
+    if not pairs:
+        return AdditivePoint(GTElem.one(bp.bpgp), bp)
+
+    res = GTElem(bp.bpgp)
+    ps = _FFI.new("const G1_ELEM *[]", [p.elem for p, _ in pairs])
+    qs = _FFI.new("const G2_ELEM *[]", [q.elem for _, q in pairs])
+    if not _C.GT_ELEMs_pairing(bp.bpgp.bpg, res.elem, len(ps), ps, qs, _FFI.NULL):
+        # Some builds of the library fail when the sum is the neutral element. Fall back to
+        # separate pairings.
+        res = GTElem.one(bp.bpgp)
+        for p, q in pairs:
+            res = res * bp.bpgp.pair(p, q)
+    return AdditivePoint(res, bp)
+
+
+# Version byte of the encoding of wrapped points. Earlier encodings are msgpack arrays of the curve
+# identifier and the point, starting with the byte 0x92.
+_PT_ENCODING_VERSION = b"\x01"
 
 
 def pt_enc(obj):
-    """Encoder for the wrapped points."""
-    nid = obj.bp.bpgp.nid
-    data = obj.pt.export()
-    packed_data = msgpack.packb((nid, data))
-    return packed_data
+    """Encoder for the wrapped points: version byte, curve identifier and point."""
+    return _PT_ENCODING_VERSION + struct.pack(">I", obj.bp.bpgp.nid) + obj.pt.export()
 
 
 def pt_dec(bptype, xtype):
     """Decoder for the wrapped points."""
 
     def dec(data):
-        nid, data = msgpack.unpackb(data)
-        bp = BilinearGroupPair()
+        if data[:1] == _PT_ENCODING_VERSION:
+            if len(data) < 5:
+                raise ValueError("Malformed point.")
+            (nid,) = struct.unpack(">I", data[1:5])
+            data = data[5:]
+        else:
+            nid, data = msgpack.unpackb(data)
+        # Check the curve before bplib sees the point.
+        bp = get_group_pair(nid)
         pt = bptype.from_bytes(data, bp.bpgp)
         return xtype(pt, bp)
 
     return dec
 
 
+def pt_export(data):
+    """Export of a wrapped point, from its encoding."""
+    if data[:1] == _PT_ENCODING_VERSION:
+        return data[5:]
+    return msgpack.unpackb(data)[1]
+
+
 # Register encoders and decoders for pairing points
 pack.register_coders(G1Point, 111, pt_enc, pt_dec(G1Elem, G1Point))
 pack.register_coders(G2Point, 112, pt_enc, pt_dec(G2Elem, G2Point))
 pack.register_coders(AdditivePoint, 113, pt_enc, pt_dec(GTElem, AdditivePoint))
+register_lazy_point(111, "G1Point", pt_export)
+register_lazy_point(112, "G2Point", pt_export)
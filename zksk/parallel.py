@@ -0,0 +1,264 @@
+"""
+Verification of serialized non-interactive proofs on several cores.
+
+A :py:class:`VerifierPool` keeps a set of worker processes alive. Every worker builds its proof
+statement once, by calling a statement factory, and then verifies serialized proofs of that
+statement. Serialized proofs are written into a ring of fixed-size slots in shared memory, so that
+only slot numbers go through the task queues, in chunks of several proofs to amortize the cost of
+the queues. Results come back in the order of the proofs.
+
+The statement factory is sent to the workers, so it must be picklable: a module-level function or
+a ``functools.partial`` of one. For instance, in a module ``stmts``::
+
+    def make_stmt():
+        g, h = make_generators(2)
+        return DLRep(3 * g + 4 * h, Secret() * g + Secret() * h)
+
+the proofs of this statement can be verified with::
+
+    from zksk.parallel import verify_many
+    from stmts import make_stmt
+
+    results = verify_many(make_stmt, serialized_proofs, workers=32)
+
+"""
+
+import multiprocessing
+import os
+import queue
+import traceback
+
+from zksk.base import NIZK
+from zksk.batch import _verify_single
+
+
+# Size of a slot of the ring buffer, in bytes. Larger proofs go through the task queue.
+DEFAULT_SLOT_SIZE = 4096
+
+# Number of slots of the ring buffer per worker.
+SLOTS_PER_WORKER = 16
+
+
+def _worker(stmt_factory, message, buffer, slot_size, tasks, results):
+    """
+    Verify the proofs given through the task queue until receiving None.
+
+    Tasks are chunks of tuples ``(index, slot, data)``. If ``slot`` is None, ``data`` holds the
+    serialized proof. Otherwise ``data`` is its length, and the proof is in the given slot of the
+    buffer. For every chunk, a list of tuples ``(index, slot, result)`` is sent back.
+    """
+    try:
+        stmt = stmt_factory()
+    except Exception:
+        results.put([(None, None, traceback.format_exc())])
+        return
+
+    view = memoryview(buffer).cast("B")
+    for chunk in iter(tasks.get, None):
+        output = []
+        for index, slot, data in chunk:
+            if slot is not None:
+                offset = slot * slot_size
+                data = bytes(view[offset : offset + data])
+            try:
+                nizk = NIZK.deserialize(data)
+            except Exception:
+                output.append((index, slot, False))
+                continue
+            try:
+                output.append((index, slot, _verify_single(stmt, nizk, message)))
+            except Exception:
+                output.append((index, slot, traceback.format_exc()))
+        results.put(output)
+
+
+class VerifierPool:
+    """
+    Persistent pool of processes verifying serialized proofs of a same statement.
+
+    The pool can be used as a context manager, which closes it on exit::
+
+        with VerifierPool(make_stmt, workers=32) as pool:
+            first_results = pool.verify(first_proofs)
+            second_results = pool.verify(second_proofs)
+
+    Args:
+        stmt_factory: Picklable callable without arguments returning the proof statement.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        message: Message, if the proofs are signatures.
+        slot_size: Size in bytes of a slot of the shared-memory ring buffer.
+        num_slots: Number of slots. Defaults to a few per worker.
+        chunk_size: Number of proofs per task. Defaults to half the slots of a worker.
+        mp_context: ``multiprocessing`` context used to start the workers.
+    """
+
+    def __init__(
+        self,
+        stmt_factory,
+        workers=None,
+        message="",
+        slot_size=DEFAULT_SLOT_SIZE,
+        num_slots=None,
+        chunk_size=None,
+        mp_context=None,
+    ):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if num_slots is None:
+            num_slots = SLOTS_PER_WORKER * workers
+        if chunk_size is None:
+            chunk_size = max(1, num_slots // (2 * workers))
+        if mp_context is None:
+            mp_context = multiprocessing.get_context()
+
+        self.slot_size = slot_size
+        self.num_slots = num_slots
+        self.chunk_size = chunk_size
+        # A shared ctypes array, inherited by the workers on every start method.
+        self.buffer = mp_context.RawArray("B", slot_size * num_slots)
+        self.view = memoryview(self.buffer).cast("B")
+        # Error that left the pool unusable, e.g., a failing statement factory.
+        self.error = None
+        self.tasks = mp_context.Queue()
+        self.results = mp_context.Queue()
+        self.processes = [
+            mp_context.Process(
+                target=_worker,
+                args=(
+                    stmt_factory,
+                    message,
+                    self.buffer,
+                    slot_size,
+                    self.tasks,
+                    self.results,
+                ),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def _get_results(self):
+        while True:
+            try:
+                output = self.results.get(timeout=1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.processes):
+                    self.error = "A verification worker died."
+                    raise RuntimeError(self.error)
+                continue
+            if output and output[0][0] is None:
+                self.error = "Could not build the statement in a worker:\n" + output[0][2]
+                raise RuntimeError(self.error)
+            return output
+
+    def verify(self, nizk_bytes_iter):
+        """
+        Verify serialized proofs.
+
+        Args:
+            nizk_bytes_iter: Iterable of serialized proofs (see :py:meth:`zksk.base.NIZK.serialize`).
+
+        Returns:
+            list: For every proof, True if it verifies and False otherwise.
+
+        Raises:
+            RuntimeError: If verifying a proof raised an error other than a rejection, once all
+                the proofs are processed, or if the pool is unusable.
+        """
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        results = []
+        # First error raised while verifying a proof.
+        error = None
+        free_slots = list(range(self.num_slots))
+        chunk = []
+        # Number of chunks given to the workers, but whose results have not come back.
+        pending = 0
+        # Also bounds the number of proofs in flight that do not take a slot.
+        max_pending = max(1, self.num_slots // self.chunk_size)
+
+        def flush():
+            nonlocal chunk, pending
+            self.tasks.put(chunk)
+            chunk = []
+            pending += 1
+
+        def collect():
+            nonlocal pending, error
+            for index, slot, result in self._get_results():
+                if not isinstance(result, bool):
+                    # Keep collecting, so that no result is left for the next call.
+                    if error is None:
+                        error = result
+                    result = False
+                results[index] = result
+                if slot is not None:
+                    free_slots.append(slot)
+            pending -= 1
+
+        try:
+            for index, data in enumerate(nizk_bytes_iter):
+                results.append(None)
+                if len(data) > self.slot_size:
+                    chunk.append((index, None, bytes(data)))
+                else:
+                    while not free_slots:
+                        if chunk:
+                            flush()
+                        collect()
+                    slot = free_slots.pop()
+                    offset = slot * self.slot_size
+                    self.view[offset : offset + len(data)] = data
+                    chunk.append((index, slot, len(data)))
+
+                if len(chunk) >= self.chunk_size:
+                    flush()
+                    while pending > max_pending:
+                        collect()
+
+            if chunk:
+                flush()
+        finally:
+            # Also on errors, e.g., from the iterator: the results of the chunks given to the
+            # workers must not be collected by the next call, nor their slots overwritten while
+            # the workers read them. If the pool broke, there is nothing left to wait for.
+            while pending and self.error is None:
+                collect()
+        if error is not None:
+            raise RuntimeError("Verification failed in a worker:\n" + error)
+        return results
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.view.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def verify_many(stmt_factory, nizk_bytes_iter, workers=None, message=""):
+    """
+    Verify serialized proofs of a same statement with a pool of processes.
+
+    See :py:class:`VerifierPool` to keep the pool alive between calls.
+
+    Args:
+        stmt_factory: Picklable callable without arguments returning the proof statement.
+        nizk_bytes_iter: Iterable of serialized proofs.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        message: Message, if the proofs are signatures.
+
+    Returns:
+        list: For every proof, True if it verifies and False otherwise.
+    """
+    with VerifierPool(stmt_factory, workers=workers, message=message) as pool:
+        return pool.verify(nizk_bytes_iter)
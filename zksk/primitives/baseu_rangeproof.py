@@ -0,0 +1,348 @@
+r"""
+Base-:math:`u` range proof, from signatures on digits.
+
+.. math::
+
+    PK \{ (r, x): \underbrace{C = x G + r H}_{Commitment} \land \underbrace{l \leq x < v}_{Range} \}
+
+See "`Efficient Protocols for Set Membership and Range Proofs`_" by Camenisch, Chaabouni and shelat, 2008.
+
+The verifier publishes Boneh-Boyen signatures :math:`A_i = \frac{1}{y + i} G_1` on the digits
+:math:`i = 0, \dots, u - 1` (see :py:class:`DigitSignatures`), with its public key
+:math:`Y = y G_2`. The prover writes :math:`x - l` and :math:`x - l + u^n - (v - l)` in base
+:math:`u`, with :math:`n` digits such that :math:`u^n \geq v - l`. For every digit :math:`d`, it
+blinds the signature on :math:`d` into :math:`V = t A_d`, and proves
+
+.. math::
+
+    e(V, Y) = -d \cdot e(V, G_2) + t \cdot e(G_1, G_2)
+
+Hence, a range of :math:`k` bits takes about :math:`2 k / \log_2 u` digit proofs, instead of the
+:math:`2 k` or-proofs of :py:mod:`zksk.primitives.rangeproof`. The second decomposition is not
+needed when :math:`u^n = v - l`.
+
+Larger bases mean fewer digits, but more signatures to publish and check.
+:py:func:`choose_base` picks the base that minimizes the proof size or the verification time for
+a given range.
+
+The protocol uses group pairings (see :py:mod:`zksk.pairings`). The commitment must be in the
+first group of the pair.
+
+.. _`Efficient Protocols for Set Membership and Range Proofs`:
+    https://infoscience.epfl.ch/record/128718/files/CCS08.pdf
+
+"""
+
+import warnings
+
+import attr
+
+from zksk.expr import Secret
+from zksk.exceptions import ValidationError
+from zksk.extended import ExtendedProofStmt
+from zksk.composition import AndProofStmt
+from zksk.primitives.dlrep import DLRep
+from zksk.utils import ensure_bn
+
+
+# Sizes in bytes of elements of the first group, of the second group and of scalars, on the curve
+# of ``bplib``. Used to estimate proof sizes.
+G1_SIZE = 33
+G2_SIZE = 65
+SCALAR_SIZE = 32
+
+# Rough relative costs of a multiplication in the first group, an exponentiation in the target
+# group, and a pairing. Used to estimate computation times.
+G1_MUL_COST = 1
+GT_EXP_COST = 4
+PAIRING_COST = 8
+
+
+@attr.s
+class DigitSignatures:
+    r"""
+    Signatures on the digits of a base, published by the verifier.
+
+    Attributes:
+        base: The base :math:`u`.
+        signatures: Signatures :math:`A_i` on the digits, in the first group.
+        pk: Public key :math:`Y`, in the second group.
+    """
+
+    base = attr.ib()
+    signatures = attr.ib()
+    pk = attr.ib()
+
+    def __attrs_post_init__(self):
+        self.g1 = self.signatures[0].group.generator()
+        self.g2 = self.pk.group.generator()
+        self.gt = self.g1.pair(self.g2)
+
+    @staticmethod
+    def generate(bilinear_pair, base):
+        """
+        Sign the digits of a base with a fresh key.
+
+        The secret key is not needed to verify the proofs, and is not kept.
+
+        Args:
+            bilinear_pair (:py:class:`zksk.pairings.BilinearGroupPair`): Bilinear group pair.
+            base: The base :math:`u`.
+
+        Returns:
+            :py:class:`DigitSignatures`: Signatures.
+        """
+        if base < 2:
+            raise ValueError("The base should be at least 2.")
+        order = bilinear_pair.G1.order()
+        g1 = bilinear_pair.G1.generator()
+        sk = order.random()
+        signatures = [(sk + i).mod_inverse(order) * g1 for i in range(base)]
+        return DigitSignatures(
+            base=base, signatures=signatures, pk=sk * bilinear_pair.G2.generator()
+        )
+
+    def verify(self):
+        """
+        Check the signatures, e.g., before proving with signatures received from a verifier.
+        """
+        return all(
+            sig.pair(self.pk + i * self.g2) == self.gt
+            for i, sig in enumerate(self.signatures)
+        )
+
+
+def num_digits(width, base):
+    """
+    Number of digits :math:`n` in base :math:`u` such that :math:`u^n` is at least the width.
+    """
+    n, power = 1, base
+    while power < width:
+        power *= base
+        n += 1
+    return n
+
+
+def _num_decompositions(width, base):
+    return 1 if base ** num_digits(width, base) == width else 2
+
+
+def estimate_proof_size(lo, hi, base):
+    """
+    Estimate the size in bytes of the digit proofs of a range proof, without the signatures.
+    """
+    width = int(hi) - int(lo)
+    digits = num_digits(width, base) * _num_decompositions(width, base)
+    # Blinded signature, and responses for the digit and the blinding factor.
+    return digits * (G1_SIZE + 2 * SCALAR_SIZE)
+
+
+def estimate_verification_cost(lo, hi, base):
+    """
+    Estimate the cost of verifying the digit proofs of a range proof, in multiplications in G1.
+    """
+    width = int(hi) - int(lo)
+    digits = num_digits(width, base) * _num_decompositions(width, base)
+    # Two pairings and a three-term exponentiation in GT per digit, and one term of the
+    # commitment equation.
+    return digits * (2 * PAIRING_COST + 3 * GT_EXP_COST + G1_MUL_COST)
+
+
+def _integer_root_ceil(value, n):
+    """
+    Smallest integer :math:`u` such that :math:`u^n` is at least the value.
+    """
+    root = max(2, int(round(value ** (1.0 / n))))
+    while root ** n < value:
+        root += 1
+    while root > 2 and (root - 1) ** n >= value:
+        root -= 1
+    return root
+
+
+def choose_base(lo, hi, objective="size", num_proofs=None, max_base=2 ** 16):
+    """
+    Pick the base that minimizes the size or the verification time of range proofs.
+
+    Larger bases take fewer digits, but more signatures. If ``num_proofs`` is given, the cost of
+    the signatures is counted once for these proofs: their size for ``"size"``, and the time for
+    the verifier to make them and for the prover to check them for ``"time"``. Otherwise, only the
+    proofs count, and the smallest base with the fewest digits wins.
+
+    >>> choose_base(0, 2 ** 64)
+    65536
+    >>> choose_base(0, 2 ** 64, num_proofs=1)
+    16
+
+    Args:
+        lo: Lower limit of the range.
+        hi: Upper limit of the range.
+        objective: ``"size"`` or ``"time"``.
+        num_proofs: Number of proofs made with the same signatures.
+        max_base: Largest base to consider.
+
+    Returns:
+        int: The base.
+    """
+    if objective == "size":
+        proof_cost = estimate_proof_size
+        signatures_cost = lambda base: base * G1_SIZE + G2_SIZE
+    elif objective == "time":
+        proof_cost = estimate_verification_cost
+        signatures_cost = lambda base: base * (G1_MUL_COST + PAIRING_COST)
+    else:
+        raise ValueError("Unknown objective: {}".format(objective))
+
+    width = int(hi) - int(lo)
+    if width < 1:
+        raise ValueError("Empty range [{}, {})".format(lo, hi))
+
+    best = None
+    # For a number of digits, the smallest base is the cheapest.
+    for n in range(1, max(2, width.bit_length() + 1)):
+        base = _integer_root_ceil(width, n)
+        if base > max_base:
+            continue
+        cost = proof_cost(lo, hi, base)
+        if num_proofs is not None:
+            cost = num_proofs * cost + signatures_cost(base)
+        if best is None or cost < best[0] or (cost == best[0] and base < best[1]):
+            best = (cost, base)
+    if best is None:
+        raise ValueError("No base up to {} fits the range.".format(max_base))
+    return best[1]
+
+
+def decompose_into_digits(value, base, n):
+    """
+    Digits of a value in a base, least significant first.
+
+    >>> decompose_into_digits(10, 3, 4)
+    [1, 0, 1, 0]
+    """
+    value = int(value)
+    if value < 0:
+        raise ValueError("Can't represent negative values")
+    digits = []
+    for _ in range(n):
+        value, digit = divmod(value, base)
+        digits.append(digit)
+    if value:
+        raise ValueError("Not enough digits to represent value")
+    return digits
+
+
+class BaseURangeStmt(ExtendedProofStmt):
+    r"""
+    A range proof statement from signatures on digits.
+
+    .. math::
+
+        PK \{ (r, x): C = x G + r H \land l \leq x < v \}
+
+    Args:
+        com: Value of the Pedersen commitment :math:`C = x G + r H`, in the first group.
+        g: First commitment base point :math:`G`
+        h: Second commitment base point :math:`H`
+        lo: Lower limit :math:`l`
+        hi: Upper limit :math:`v`
+        x: Secret value :math:`x`. Its value is only needed by the prover.
+        r: Secret randomizer :math:`r` of the commitment.
+        digit_signatures (:py:class:`DigitSignatures`): Signatures published by the verifier.
+    """
+
+    def __init__(self, com, g, h, lo, hi, x, r, digit_signatures):
+        self.lo = ensure_bn(lo)
+        self.hi = ensure_bn(hi)
+        width = self.hi - self.lo
+        if width < 1:
+            raise ValueError("Empty range [{}, {})".format(lo, hi))
+
+        self.com = com
+        self.g = g
+        self.h = h
+        self.x = x
+        self.r = r
+        self.digit_signatures = digit_signatures
+        self.order = g.group.order()
+
+        base = digit_signatures.base
+        self.num_digits = num_digits(int(width), base)
+        self.offset = ensure_bn(base ** self.num_digits) - width
+
+        # Shifted commitments to the values written in base u.
+        com_shifted = com - self.lo * g
+        self.shifted_coms = [com_shifted]
+        if self.offset != 0:
+            self.shifted_coms.append(com_shifted + self.offset * g)
+        self.powers = [ensure_bn(base ** j) * g for j in range(self.num_digits)]
+
+        # The digits, and the factors blinding their signatures.
+        num_secrets = self.num_digits * len(self.shifted_coms)
+        self.digits = [Secret() for _ in range(num_secrets)]
+        self.blinders = [Secret() for _ in range(num_secrets)]
+
+        self.is_prover = x.value is not None and r.value is not None
+        if self.is_prover:
+            value = ensure_bn(x.value)
+            if value < self.lo or value >= self.hi:
+                warnings.warn("Secret outside of given range [{}, {})".format(lo, hi))
+
+    def precommit(self):
+        """
+        Blind the signatures on the digits of the values.
+        """
+        base = self.digit_signatures.base
+        value = ensure_bn(self.x.value) - self.lo
+        values = [value, value + self.offset][: len(self.shifted_coms)]
+        digits = []
+        for v in values:
+            digits.extend(decompose_into_digits(v, base, self.num_digits))
+
+        precommitment = {"V": []}
+        for digit, digit_secret, blinder in zip(digits, self.digits, self.blinders):
+            digit_secret.value = ensure_bn(digit)
+            blinder.value = self.order.random()
+            precommitment["V"].append(
+                blinder.value * self.digit_signatures.signatures[digit]
+            )
+        return precommitment
+
+    def construct_stmt(self, precommitment):
+        """
+        Construct the internal proof statement.
+        """
+        stmts = [DLRep(self.com, self.x * self.g + self.r * self.h)]
+        for k, com in enumerate(self.shifted_coms):
+            digits = self.digits[k * self.num_digits : (k + 1) * self.num_digits]
+            expr = self.r * self.h
+            for digit, power in zip(digits, self.powers):
+                expr = expr + digit * power
+            stmts.append(DLRep(com, expr))
+
+        pk = self.digit_signatures.pk
+        g2 = self.digit_signatures.g2
+        gt = self.digit_signatures.gt
+        for V, digit, blinder in zip(precommitment["V"], self.digits, self.blinders):
+            stmts.append(
+                DLRep(V.pair(pk), digit * (-1 * V.pair(g2)) + blinder * gt)
+            )
+        return AndProofStmt(*stmts)
+
+    def simulate_precommit(self):
+        """
+        Draw the blinded signatures at random.
+        """
+        g1 = self.digit_signatures.g1
+        return {"V": [self.order.random() * g1 for _ in self.digits]}
+
+    def validate(self, precommitment):
+        """
+        Check the number of blinded signatures, and that none is the neutral element.
+        """
+        blinded = precommitment["V"]
+        if len(blinded) != len(self.digits):
+            raise ValidationError("Wrong number of blinded signatures.")
+        infinite = self.digit_signatures.g1.group.infinite()
+        if any(V == infinite for V in blinded):
+            raise ValidationError("A blinded signature is the neutral element.")
@@ -11,12 +11,20 @@ See "`Constant-Size Dynamic k-TAA`_" by Au et al., 2008 for the details.
 """
 
 import attr
+import msgpack
 
+from petlib.bn import Bn
+from petlib.pack import encode, decode
+
+from zksk.batch import verify_many
+from zksk.consts import BATCH_WEIGHT_LENGTH
+from zksk.exceptions import ValidationError
 from zksk.expr import Secret, wsum_secrets
 from zksk.extended import ExtendedProofStmt
 from zksk.composition import AndProofStmt
 from zksk.primitives.dlrep import DLRep
-from zksk.utils import make_generators
+from zksk.pairings import multi_pair, prepare
+from zksk.utils import batch_inverse, get_random_num, make_generators, precompute
 
 
 @attr.s
@@ -37,7 +45,9 @@ class BBSPlusSignature:
         product = generators[0] + generators[0].group.wsum(
             ([self.s] + messages), generators[1:]
         )
-        return self.A.pair(pk.w + self.e * pk.h0) == product.pair(pk.h0)
+        # e(A, w + e h0) = e(product, h0), as a single product of pairings.
+        pairing = multi_pair([self.A, self.e * self.A - product], [pk.w, pk.h0])
+        return pairing == pairing.group.infinite()
 
 
 @attr.s
@@ -58,15 +68,20 @@ class UserCommitmentMessage:
         if self.com_nizk_proof is None:
             raise ValueError("No proof to verify")
 
-        # TODO: Extract into a separate ExtendedProofStmt.
-        lhs = self.com_message
-        generators = pk.generators[1 : len(self.com_nizk_proof.responses) + 1]
-        secret_vars = [Secret() for _ in self.com_nizk_proof.responses]
-        proof = DLRep(lhs, wsum_secrets(secret_vars, generators))
-
+        num_secrets = len(self.com_nizk_proof.responses)
+        proof = _blinding_stmt(self.com_message, pk.generators, num_secrets)
         return proof.verify(self.com_nizk_proof)
 
 
+def _blinding_stmt(lhs, generators, num_secrets):
+    """
+    Statement of the blinding proof: the commitment opens to the blinding factor and messages.
+    """
+    # TODO: Extract into a separate ExtendedProofStmt.
+    secret_vars = [Secret() for _ in range(num_secrets)]
+    return DLRep(lhs, wsum_secrets(secret_vars, generators[1 : num_secrets + 1]))
+
+
 class BBSPlusSignatureCreator:
     """
     Pre-signed product along with a NIZK proof of correct construction.
@@ -104,8 +119,10 @@ class BBSPlusSignatureCreator:
             secrets = [self.s1] + messages
             rhs = wsum_secrets(secret_vars, self.pk.generators[1 : len(messages) + 2])
             com_stmt = DLRep(lhs, rhs)
+            # The commitment lets issuers verify many proofs at once, see
+            # BBSPlusSecretKey.sign_many.
             com_nizk_proof = com_stmt.prove(
-                {s: v for s, v in zip(secret_vars, secrets)}
+                {s: v for s, v in zip(secret_vars, secrets)}, include_commitment=True
             )
 
         return UserCommitmentMessage(com_message=lhs, com_nizk_proof=com_nizk_proof)
@@ -169,7 +186,12 @@ class BBSPlusPublicKey:
     """
     BBS+ public key.
 
-    Automatically pre-computes the generator pairings :math:`e(g_i, h_0)`.
+    Automatically prepares :math:`w` and :math:`h_0` to be paired many times (see
+    :py:class:`zksk.pairings.PreparedG2Point`).
+
+    The generator pairings :math:`e(g_i, h_0)` in ``gen_pairs`` are lazy: each one is only computed
+    the first time a statement needs its value, and then kept. A serialized key includes their
+    values, so that loading it doesn't recompute them.
     """
 
     w = attr.ib()
@@ -177,9 +199,93 @@ class BBSPlusPublicKey:
     generators = attr.ib()
 
     def __attrs_post_init__(self):
-        """Pre-compute the group pairings."""
+        """Prepare the points of G2 and set up the lazy group pairings."""
+        self.w = prepare(self.w)
+        self.h0 = prepare(self.h0)
         self.gen_pairs = [g.pair(self.h0) for g in self.generators]
 
+    def serialize(self, with_pairings=True):
+        """
+        Serialize the public key.
+
+        Args:
+            with_pairings (bool): Whether to include the values of the generator pairings. The
+                missing values are computed.
+        """
+        pairings = self.gen_pairs if with_pairings else []
+        as_list = [
+            encode(self.w),
+            encode(self.h0),
+            encode(self.generators),
+            [encode(pairing) for pairing in pairings],
+        ]
+        return msgpack.packb(as_list, use_bin_type=True)
+
+    @classmethod
+    def deserialize(cls, pk_raw):
+        """
+        Deserialize a public key.
+
+        The data can be any bytes-like object, e.g., a memory-mapped file.
+        """
+        w, h0, generators, pairings = msgpack.unpackb(pk_raw)
+        pk = cls(w=decode(w), h0=decode(h0), generators=decode(generators))
+        if pairings:
+            pk.gen_pairs = [
+                g.pair(pk.h0, value=decode(pairing))
+                for g, pairing in zip(pk.generators, pairings)
+            ]
+        return pk
+
+    def verify_many(self, signatures, message_lists):
+        r"""
+        Verify many signatures at once.
+
+        The verification equations of the signatures are combined with random weights
+        :math:`\rho_k` into a single one,
+
+        .. math::
+
+            e(\sum_k \rho_k A_k, w) = e(\sum_k \rho_k (g_0 + s_k g_1 + \sum_i m_{k,i} g_{i+2}
+            - e_k A_k), h_0)
+
+        which takes two pairings instead of two per signature. A batch with an invalid
+        signature passes with negligible probability.
+
+        Args:
+            signatures: Signatures :py:class:`BBSPlusSignature`.
+            message_lists: Lists of messages, one per signature.
+
+        Returns:
+            bool: Whether all the signatures are valid.
+        """
+        if len(signatures) != len(message_lists):
+            raise ValueError("Need one list of messages per signature.")
+        if not signatures:
+            return True
+
+        order = self.h0.group.order()
+        num_generators = max(len(messages) for messages in message_lists) + 2
+        # Weights of A_k, then of the generators.
+        weights = []
+        gen_weights = [Bn(0)] * num_generators
+        for signature, messages in zip(signatures, message_lists):
+            rho = get_random_num(BATCH_WEIGHT_LENGTH) + 1
+            weights.append(rho)
+            for i, m in enumerate([1, signature.s] + list(messages)):
+                gen_weights[i] = gen_weights[i] + rho * m
+
+        group = self.generators[0].group
+        As = [signature.A for signature in signatures]
+        lhs = group.wsum(weights, As)
+        rhs = group.wsum(
+            [(rho * signature.e).mod(order) for rho, signature in zip(weights, signatures)]
+            + [(-w).mod(order) for w in gen_weights],
+            As + self.generators[:num_generators],
+        )
+        pairing = multi_pair([lhs, rhs], [self.w, self.h0])
+        return pairing == pairing.group.infinite()
+
 
 @attr.s
 class BBSPlusSecretKey:
@@ -208,6 +314,65 @@ class BBSPlusSecretKey:
         A = (self.gamma + e).mod_inverse(self.h0.group.order()) * prod
         return BBSPlusSignature(A=A, e=e, s=s2)
 
+    def sign_many(self, commitment_messages):
+        r"""
+        Sign many committed messages, e.g., a burst of issuance requests.
+
+        The blinding proofs of the requests are verified together (see
+        :py:func:`zksk.batch.verify_many`), the inverses of :math:`e + \gamma` are computed with a
+        single modular inversion, and :math:`g_1` is multiplied with a table of precomputed
+        multiples, built on the first call and kept with the key.
+
+        Args:
+            commitment_messages: Requests (:py:class:`UserCommitmentMessage`). Requests without a
+                blinding proof are signed as with :py:meth:`sign`.
+
+        Returns:
+            list: Signatures, one per request. Users complete them as with :py:meth:`sign`.
+
+        Raises:
+            ValidationError: If a blinding proof is invalid.
+        """
+        # Blinding statements of the same size only differ by their left-hand side.
+        templates = {}
+        blinded, stmts = [], []
+        for idx, request in enumerate(commitment_messages):
+            if request.com_nizk_proof is None:
+                continue
+            num_secrets = len(request.com_nizk_proof.responses)
+            if num_secrets not in templates:
+                templates[num_secrets] = _blinding_stmt(
+                    request.com_message, self.generators, num_secrets
+                ).compile()
+            blinded.append(idx)
+            stmts.append(templates[num_secrets].instantiate(request.com_message))
+
+        nizks = [commitment_messages[idx].com_nizk_proof for idx in blinded]
+        invalid = [idx for idx, valid in zip(blinded, verify_many(stmts, nizks)) if not valid]
+        if invalid:
+            raise ValidationError("Invalid blinding proofs for requests {}".format(invalid))
+
+        order = self.h0.group.order()
+        es = [order.random() for _ in commitment_messages]
+        inverses = batch_inverse([self.gamma + e for e in es], order)
+        g1 = self._precomputed_g1()
+        signatures = []
+        for request, e, inverse in zip(commitment_messages, es, inverses):
+            s2 = order.random()
+            prod = self.generators[0] + s2 * g1 + request.com_message
+            signatures.append(BBSPlusSignature(A=inverse * prod, e=e, s=s2))
+        return signatures
+
+    def _precomputed_g1(self):
+        """
+        Return :math:`g_1` with its table of precomputed multiples, built once per generator.
+        """
+        g1 = self.generators[1]
+        cached = getattr(self, "_g1_table", None)
+        if cached is None or cached[0] is not g1:
+            cached = self._g1_table = (g1, precompute(g1))
+        return cached[1]
+
 
 class BBSPlusSignatureStmt(ExtendedProofStmt):
     """
@@ -312,6 +477,12 @@ class BBSPlusSignatureStmt(ExtendedProofStmt):
         constructed_stmt.lhs = [p.lhs for p in constructed_stmt.subproofs]
         return constructed_stmt
 
+    def get_outer_proof_id(self):
+        return (
+            [self.bases, self.pk.w, self.pk.h0],
+            self.secret_vars + [self.r1, self.r2, self.delta1, self.delta2],
+        )
+
     def simulate_precommit(self):
         """
         Draw :math:`A_1`, :math:`A_2` at random.
@@ -322,3 +493,124 @@ class BBSPlusSignatureStmt(ExtendedProofStmt):
         precommitment["A1"] = group.order().random() * group.generator()
         precommitment["A2"] = group.order().random() * group.generator()
         return precommitment
+
+
+class BBSPlusPairingFreeStmt(ExtendedProofStmt):
+    r"""
+    Proof of knowledge of a BBS+ signature over a set of (hidden) messages, without pairings for
+    the prover.
+
+    A drop-in replacement for :py:class:`BBSPlusSignatureStmt`, with the same arguments. See
+    "`Anonymous Attestation Using the Strong Diffie Hellman Assumption Revisited`_" by Camenisch,
+    Drijvers and Lehmann, 2016.
+
+    With :math:`b = g_0 + s g_1 + \sum_i m_i g_{i+2}`, so that :math:`A = \frac{1}{e + \gamma} b`,
+    the prover randomizes the signature into :math:`A' = r_1 A`, :math:`\bar{A} = r_1 b - e A'`
+    (that is, :math:`\gamma A'`) and :math:`d = r_1 b - r_2 g_1`, and proves in G1 that
+
+    .. math::
+
+        \bar{A} - d = -e A' + r_2 g_1 \land -g_0 = -r_3 d + s' g_1 + \sum_i m_i g_{i+2}
+
+    with :math:`r_3 = r_1^{-1}` and :math:`s' = s - r_2 r_3`. The verifier checks that
+    :math:`A' \neq 0` and that :math:`e(A', w) = e(\bar{A}, h_0)`, with a single
+    :py:func:`zksk.pairings.multi_pair`.
+
+    The secret :math:`s` is replaced by :math:`s'` in the proof, so it is not bound to other
+    proofs. The statement can't be simulated, e.g., in or-proofs: the pairing check of the
+    verifier holds only for randomized signatures.
+
+    .. _`Anonymous Attestation Using the Strong Diffie Hellman Assumption Revisited`:
+       https://eprint.iacr.org/2016/663.pdf
+
+    Args:
+        secret_vars: Secret variables.
+            If binding, the two first elements of secret_vars as the Secret variables for the ``e``
+            and ``s`` attributes of the signature.
+        pk (:py:class:`BBSPlusPublicKey`): Public key.
+        signature (:py:class:`BBSPlusSignature`): Signature. Required if used for proving.
+        binding (bool): Whether the signature is binding.
+        simulated (bool): If this proof is a part of an or-proof: whether it should be simulated.
+    """
+
+    def __init__(self, secret_vars, pk, signature=None, binding=True, simulated=False):
+        self.pk = pk
+        self.signature = signature
+        if not binding:
+            secret_vars = [Secret(), Secret()] + secret_vars
+
+        self.bases = pk.generators[: len(secret_vars)]
+        self.order = self.bases[0].group.order()
+        self.r2, self.r3, self.s_prime = Secret(), Secret(), Secret()
+
+        self.secret_vars = secret_vars
+        if signature is not None:
+            self.secret_vars[0].value = signature.e
+            self.secret_vars[1].value = signature.s
+
+        self.set_simulated(simulated)
+
+    def precommit(self):
+        r"""
+        Randomize the signature.
+
+        The precommitment comprises :math:`A'`, :math:`\bar{A}` and :math:`d`.
+        """
+        if self.signature is None:
+            raise ValueError("No signature given!")
+
+        e, s = self.signature.e, self.signature.s
+        messages = [v.value for v in self.secret_vars[2:]]
+        g0, g1 = self.bases[0], self.bases[1]
+        b = g0 + g0.group.wsum([s] + messages, self.bases[1:])
+
+        r1 = self.order.random()
+        while r1 == 0:
+            r1 = self.order.random()
+        r2 = self.order.random()
+        r3 = r1.mod_inverse(self.order)
+        self.r2.value, self.r3.value = r2, r3
+        self.s_prime.value = (s - r2 * r3) % self.order
+
+        A_prime = r1 * self.signature.A
+        b_prime = r1 * b
+        return {
+            "A_prime": A_prime,
+            "A_bar": b_prime - e * A_prime,
+            "d": b_prime - r2 * g1,
+        }
+
+    def construct_stmt(self, precommitment):
+        """
+        Proof of knowledge of a randomized signature, in G1.
+        """
+        A_prime, A_bar, d = (precommitment[k] for k in ("A_prime", "A_bar", "d"))
+        g0, g1 = self.bases[0], self.bases[1]
+
+        dl1 = DLRep(A_bar - d, self.secret_vars[0] * (-1 * A_prime) + self.r2 * g1)
+        dl2 = DLRep(
+            -1 * g0,
+            wsum_secrets(
+                [self.r3, self.s_prime] + self.secret_vars[2:],
+                [-1 * d, g1] + self.bases[2:],
+            ),
+        )
+        return AndProofStmt(dl1, dl2)
+
+    def get_outer_proof_id(self):
+        # The secret s is not part of the proof.
+        return (
+            [self.bases, self.pk.w, self.pk.h0],
+            self.secret_vars[:1] + self.secret_vars[2:] + [self.r2, self.r3, self.s_prime],
+        )
+
+    def validate(self, precommitment):
+        """
+        Check that the randomized signature is valid for the public key.
+        """
+        A_prime, A_bar = precommitment["A_prime"], precommitment["A_bar"]
+        if A_prime == A_prime.group.infinite():
+            raise ValidationError("The randomized signature is the neutral element.")
+        pairing = multi_pair([A_prime, -1 * A_bar], [self.pk.w, self.pk.h0])
+        if pairing != pairing.group.infinite():
+            raise ValidationError("The randomized signature is invalid.")
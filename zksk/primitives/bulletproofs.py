@@ -0,0 +1,414 @@
+r"""
+Bulletproofs range proof: ZK proof that committed values lie within a range, of size logarithmic
+in the size of the range.
+
+.. math::
+
+    PK \{ (r, x): \underbrace{C = x G + r H}_{Commitment} \land \underbrace{l \leq x < u}_{Range} \}
+
+See "`Bulletproofs: Short Proofs for Confidential Transactions and More`_" by Bünz et al., 2018.
+
+The range :math:`[l, u)` is reduced to power-of-two ranges :math:`[0, 2^n)`, as in
+:py:mod:`zksk.primitives.rangeproof`: :math:`x - l` and :math:`x - l + 2^n - (u - l)` are both in
+:math:`[0, 2^n)`, with :math:`n` the bit length of :math:`u - l - 1`, rounded up to a power of
+two. The second value is not needed when :math:`u - l = 2^n`. The values of several commitments can
+be aggregated into a single proof.
+
+The aggregated Bulletproof is computed as the precommitment of the statement, with its own
+Fiat-Shamir transcript, and checked when validating the statement. The rest of the proof is a
+:py:class:`zksk.primitives.dlrep.DLRep` of each commitment, which binds the secrets :math:`x` and
+:math:`r` to the other statements of a conjunction. As Bulletproofs cannot be simulated without the
+secrets, the statement cannot be used in or-proofs.
+
+.. _`Bulletproofs: Short Proofs for Confidential Transactions and More`:
+    https://eprint.iacr.org/2017/1066.pdf
+
+"""
+
+import warnings
+from hashlib import sha256
+
+from petlib.bn import Bn
+
+from zksk.composition import AndProofStmt
+from zksk.exceptions import ValidationError
+from zksk.extended import ExtendedProofStmt
+from zksk.primitives.dlrep import DLRep
+from zksk.utils import ensure_bn, multiexp, weigh_equations, check_equations
+from zksk.utils.encoding import update_hash
+
+
+# Domain separation tag of the generators and transcripts.
+DOMAIN = b"zksk.bulletproofs"
+
+# Cache of the generator vectors, by group and label.
+_GENERATORS = {}
+
+
+def _get_generators(group, label, num):
+    """
+    Return the first ``num`` generators of a vector, hashed to the group.
+    """
+    generators = _GENERATORS.setdefault((group.nid(), label), [])
+    while len(generators) < num:
+        seed = DOMAIN + b"." + label + b"." + str(len(generators)).encode()
+        generators.append(group.hash_to_point(seed))
+    return generators[:num]
+
+
+def _next_power_of_two(n):
+    return 1 if n <= 1 else 1 << (n - 1).bit_length()
+
+
+def _mod_inverse(x, order):
+    return int(ensure_bn(x).mod_inverse(ensure_bn(order)))
+
+
+def _inner_product(a, b, order):
+    return sum(x * y for x, y in zip(a, b)) % order
+
+
+class _Transcript:
+    """
+    Fiat-Shamir transcript of a Bulletproof.
+    """
+
+    def __init__(self, order, *items):
+        self.order = order
+        self.hasher = sha256(DOMAIN)
+        self.append(*items)
+
+    def append(self, *items):
+        for item in items:
+            update_hash(self.hasher, item)
+
+    def challenge(self):
+        digest = self.hasher.digest()
+        self.append(digest)
+        return int.from_bytes(digest, "big") % self.order
+
+
+def _prove(group, g, h, values, gammas, num_bits, coms):
+    """
+    Compute an aggregated Bulletproof.
+
+    Args:
+        values: Python integers, in :math:`[0, 2^n)`.
+        gammas: Randomizers of the commitments to the values.
+        num_bits: Bit length :math:`n`, a power of two.
+        coms: Commitments to the values.
+
+    Returns:
+        dict: The proof.
+    """
+    order = int(group.order())
+    m = _next_power_of_two(len(values))
+    values = values + [0] * (m - len(values))
+    gammas = gammas + [0] * (m - len(gammas))
+    size = num_bits * m
+    Gs = _get_generators(group, b"G", size)
+    Hs = _get_generators(group, b"H", size)
+    u = _get_generators(group, b"u", 1)[0]
+    transcript = _Transcript(order, num_bits, len(coms), g, h, coms)
+
+    def rand():
+        return int(group.order().random())
+
+    a_left = [(v >> i) & 1 for v in values for i in range(num_bits)]
+    a_right = [(a - 1) % order for a in a_left]
+    alpha = rand()
+    A = multiexp([alpha] + a_left + a_right, [h] + Gs + Hs)
+
+    s_left = [rand() for _ in range(size)]
+    s_right = [rand() for _ in range(size)]
+    rho = rand()
+    S = multiexp([rho] + s_left + s_right, [h] + Gs + Hs)
+
+    transcript.append(A, S)
+    y = transcript.challenge()
+    z = transcript.challenge()
+
+    y_powers = [pow(y, i, order) for i in range(size)]
+    z_two_powers = [
+        pow(z, 2 + j, order) * 2 ** i % order for j in range(m) for i in range(num_bits)
+    ]
+    l0 = [(a - z) % order for a in a_left]
+    r0 = [
+        (yp * (a + z) + zt) % order
+        for yp, a, zt in zip(y_powers, a_right, z_two_powers)
+    ]
+    r1 = [yp * s % order for yp, s in zip(y_powers, s_right)]
+    t1 = (_inner_product(l0, r1, order) + _inner_product(s_left, r0, order)) % order
+    t2 = _inner_product(s_left, r1, order)
+
+    tau1, tau2 = rand(), rand()
+    T1 = multiexp([t1, tau1], [g, h])
+    T2 = multiexp([t2, tau2], [g, h])
+
+    transcript.append(T1, T2)
+    x = transcript.challenge()
+
+    taux = tau2 * x * x + tau1 * x
+    for j, gamma in enumerate(gammas):
+        taux += pow(z, 2 + j, order) * gamma
+    taux %= order
+    mu = (alpha + rho * x) % order
+    a = [(l + s * x) % order for l, s in zip(l0, s_left)]
+    b = [(r + s * x) % order for r, s in zip(r0, r1)]
+    t = _inner_product(a, b, order)
+
+    transcript.append(taux, mu, t)
+    w = transcript.challenge()
+
+    # Inner-product argument for <a, G> + <b, H'> + <a, b> U, with H'_i = y^-i H_i and U = w u.
+    y_inv = _mod_inverse(y, order)
+    Gs = list(Gs)
+    Hs = [ensure_bn(pow(y_inv, i, order)) * H for i, H in enumerate(Hs)]
+    U = ensure_bn(w) * u
+    Ls, Rs = [], []
+    while len(a) > 1:
+        half = len(a) // 2
+        a_lo, a_hi = a[:half], a[half:]
+        b_lo, b_hi = b[:half], b[half:]
+        G_lo, G_hi = Gs[:half], Gs[half:]
+        H_lo, H_hi = Hs[:half], Hs[half:]
+        c_left = _inner_product(a_lo, b_hi, order)
+        c_right = _inner_product(a_hi, b_lo, order)
+        L = multiexp(a_lo + b_hi + [c_left], G_hi + H_lo + [U])
+        R = multiexp(a_hi + b_lo + [c_right], G_lo + H_hi + [U])
+        Ls.append(L)
+        Rs.append(R)
+
+        transcript.append(L, R)
+        e = transcript.challenge()
+        e_inv = _mod_inverse(e, order)
+        a = [(al * e + ah * e_inv) % order for al, ah in zip(a_lo, a_hi)]
+        b = [(bl * e_inv + bh * e) % order for bl, bh in zip(b_lo, b_hi)]
+        Gs = [multiexp([e_inv, e], [gl, gh]) for gl, gh in zip(G_lo, G_hi)]
+        Hs = [multiexp([e, e_inv], [hl, hh]) for hl, hh in zip(H_lo, H_hi)]
+
+    return {
+        "A": A,
+        "S": S,
+        "T1": T1,
+        "T2": T2,
+        "taux": ensure_bn(taux),
+        "mu": ensure_bn(mu),
+        "t": ensure_bn(t),
+        "L": Ls,
+        "R": Rs,
+        "a": ensure_bn(a[0]),
+        "b": ensure_bn(b[0]),
+    }
+
+
+def _get_equations(group, g, h, num_bits, coms, proof):
+    """
+    Express the verification of an aggregated Bulletproof as two group equations.
+
+    See :py:meth:`zksk.composition.ComposableProofStmt.get_verification_equations` for the format
+    of the equations.
+    """
+    order = int(group.order())
+    m = _next_power_of_two(len(coms))
+    size = num_bits * m
+    rounds = size.bit_length() - 1
+    Ls, Rs = list(proof["L"]), list(proof["R"])
+    if len(Ls) != rounds or len(Rs) != rounds:
+        raise ValidationError("Wrong number of rounds in the range proof.")
+
+    A, S, T1, T2 = proof["A"], proof["S"], proof["T1"], proof["T2"]
+    for point in [A, S, T1, T2] + Ls + Rs:
+        if not hasattr(point, "group") or point.group != group:
+            raise ValidationError("The range proof holds values that are not points.")
+    taux, mu, t = int(proof["taux"]), int(proof["mu"]), int(proof["t"])
+    a, b = int(proof["a"]), int(proof["b"])
+    Gs = _get_generators(group, b"G", size)
+    Hs = _get_generators(group, b"H", size)
+    u = _get_generators(group, b"u", 1)[0]
+
+    transcript = _Transcript(order, num_bits, len(coms), g, h, coms)
+    transcript.append(A, S)
+    y = transcript.challenge()
+    z = transcript.challenge()
+    transcript.append(T1, T2)
+    x = transcript.challenge()
+    transcript.append(taux, mu, t)
+    w = transcript.challenge()
+    challenges = []
+    for L, R in zip(Ls, Rs):
+        transcript.append(L, R)
+        challenges.append(transcript.challenge())
+
+    # t G + taux H = sum_j z^(2+j) V_j + delta(y, z) G + x T1 + x^2 T2
+    y_powers_sum = sum(pow(y, i, order) for i in range(size)) % order
+    two_powers_sum = 2 ** num_bits - 1
+    delta = (z - z * z) * y_powers_sum
+    for j in range(m):
+        delta -= pow(z, 3 + j, order) * two_powers_sum
+    z_powers = [pow(z, 2 + j, order) for j in range(len(coms))]
+    poly_equation = (
+        group,
+        [t - delta, taux] + [-zp for zp in z_powers] + [-x, -x * x],
+        [g, h] + list(coms) + [T1, T2],
+    )
+
+    # The inner-product argument: with s_i the product of the challenges e_j or their inverses,
+    # depending on the bits of i,
+    #   a <s, G> + b <s^-1, H'> + a b U = P + sum_j (e_j^2 L_j + e_j^-2 R_j)
+    # where P = A + x S - z <1, G> + <z y^n + z^(2+j) 2^n, H'> - mu H + t U.
+    scalars = [1]
+    for e in reversed(challenges):
+        e_inv = _mod_inverse(e, order)
+        scalars = [s * e_inv % order for s in scalars] + [s * e % order for s in scalars]
+
+    y_inv = _mod_inverse(y, order)
+    y_inv_power = 1
+    g_weights = []
+    h_weights = []
+    for i in range(size):
+        j, k = divmod(i, num_bits)
+        s_inv = scalars[size - 1 - i]
+        g_weights.append(a * scalars[i] + z)
+        h_weights.append(
+            y_inv_power * (b * s_inv - pow(z, 2 + j, order) * 2 ** k) - z
+        )
+        y_inv_power = y_inv_power * y_inv % order
+    ipa_equation = (
+        group,
+        g_weights
+        + h_weights
+        + [(a * b - t) * w, mu, -1, -x]
+        + [-e * e for e in challenges]
+        + [-_mod_inverse(e * e, order) for e in challenges],
+        Gs + Hs + [u, h, A, S] + Ls + Rs,
+    )
+    return [poly_equation, ipa_equation]
+
+
+class BulletproofRangeStmt(ExtendedProofStmt):
+    r"""
+    A range proof statement, using an aggregated Bulletproof.
+
+    .. math::
+
+        PK \{ (r, x): C = x G + r H \land l \leq x < u \}
+
+    Several values can be proven in range at once, by passing lists of commitments and secrets.
+    The proof grows with the logarithm of the number of values:
+
+    >>> from zksk import Secret
+    >>> from zksk.utils import make_generators
+    >>> g, h = make_generators(2)
+    >>> x, r = Secret(value=3), Secret(value=42)
+    >>> stmt = BulletproofRangeStmt((3 * g + 42 * h), g, h, 0, 2 ** 32, x, r)
+    >>> nizk = stmt.prove()
+    >>> BulletproofRangeStmt(3 * g + 42 * h, g, h, 0, 2 ** 32, Secret(), Secret()).verify(nizk)
+    True
+
+    Args:
+        com: Value of the Pedersen commitment :math:`C = x G + r H`, or a list of them.
+        g: First commitment base point :math:`G`
+        h: Second commitment base point :math:`H`
+        lo: Lower limit :math:`l`
+        hi: Upper limit :math:`u`
+        x: Secret value :math:`x`, or a list of them. Values are only needed by the prover.
+        r: Secret randomizer :math:`r` of the commitment, or a list of them.
+    """
+
+    def __init__(self, com, g, h, lo, hi, x, r):
+        if not isinstance(com, (list, tuple)):
+            com, x, r = [com], [x], [r]
+        if not len(com) == len(x) == len(r) or not com:
+            raise ValueError("Need as many commitments as values and randomizers.")
+
+        self.lo = ensure_bn(lo)
+        self.hi = ensure_bn(hi)
+        if self.hi <= self.lo:
+            raise ValueError("Empty range [{}, {})".format(lo, hi))
+
+        self.com = list(com)
+        self.g = g
+        self.h = h
+        self.x = list(x)
+        self.r = list(r)
+
+        width = self.hi - self.lo
+        self.num_bits = _next_power_of_two((width - 1).num_bits())
+        self.offset = Bn(2) ** self.num_bits - width
+
+        # The values are only bounded if the bits of all of them do not wrap modulo the order.
+        num_values = len(self.com) * (1 if self.offset == 0 else 2)
+        if self.num_bits * _next_power_of_two(num_values) >= g.group.order().num_bits():
+            raise ValueError(
+                "Range [{}, {}) too large for {} values in this group.".format(
+                    lo, hi, len(self.com)
+                )
+            )
+
+        self.is_prover = all(s.value is not None for s in self.x + self.r)
+        if self.is_prover:
+            for s in self.x:
+                value = ensure_bn(s.value)
+                if value < self.lo or value >= self.hi:
+                    warnings.warn(
+                        "Secret outside of given range [{}, {})".format(lo, hi)
+                    )
+
+    def _get_range_coms(self):
+        """
+        Commitments to the values proven in :math:`[0, 2^n)`.
+        """
+        coms = [c - self.lo * self.g for c in self.com]
+        if self.offset != 0:
+            coms += [c + self.offset * self.g for c in coms]
+        return coms
+
+    def precommit(self):
+        """
+        Compute the Bulletproof.
+        """
+        values = [int(ensure_bn(s.value) - self.lo) for s in self.x]
+        gammas = [int(ensure_bn(s.value)) for s in self.r]
+        if self.offset != 0:
+            values += [v + int(self.offset) for v in values]
+            gammas += gammas
+        return _prove(
+            self.g.group,
+            self.g,
+            self.h,
+            values,
+            gammas,
+            self.num_bits,
+            self._get_range_coms(),
+        )
+
+    def construct_stmt(self, precommitment):
+        """
+        Construct the internal proof statement: knowledge of the openings of the commitments.
+        """
+        stmts = [
+            DLRep(com, x * self.g + r * self.h)
+            for com, x, r in zip(self.com, self.x, self.r)
+        ]
+        if len(stmts) == 1:
+            return stmts[0]
+        return AndProofStmt(*stmts)
+
+    def validate(self, precommitment):
+        """
+        Check the Bulletproof.
+        """
+        try:
+            equations = _get_equations(
+                self.g.group,
+                self.g,
+                self.h,
+                self.num_bits,
+                self._get_range_coms(),
+                precommitment,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValidationError("Malformed range proof.") from e
+        if not check_equations(weigh_equations(equations)):
+            raise ValidationError("The range proof does not verify.")
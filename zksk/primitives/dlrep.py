@@ -18,7 +18,8 @@ from petlib.bn import Bn
 
 from zksk.base import Verifier, Prover, SimulationTranscript
 from zksk.expr import Secret, Expression
-from zksk.utils import get_random_num
+from zksk.utils import get_random_num, ensure_bn, multiexp, check_point
+from zksk.utils.encoding import update_hash
 from zksk.consts import CHALLENGE_LENGTH
 from zksk.composition import ComposableProofStmt
 from zksk.exceptions import IncompleteValuesError, InvalidExpression
@@ -134,7 +135,7 @@ class DLRep(ComposableProofStmt):
         # We check everything is indeed a big number, else we cast it
         for name, sec in secrets_dict.items():
             if not isinstance(sec, Bn):
-                secrets_dict[name] = Bn(sec)
+                secrets_dict[name] = ensure_bn(sec)
 
         return DLRepProver(self, secrets_dict)
 
@@ -148,6 +149,24 @@ class DLRep(ComposableProofStmt):
         proof_id = super().get_proof_id(secret_id_map)
         return proof_id + [self.lhs]
 
+    def _compute_digest(self, key):
+        # Compiled statements hash their identifier up to the left-hand side only once.
+        compiled = self.__dict__.get("_compiled")
+        if compiled is None:
+            return super()._compute_digest(key)
+        h = compiled.digest_prefix.copy()
+        update_hash(h, self.lhs)
+        return h.digest(), compiled.secret_names
+
+    def get_order(self):
+        """
+        Return the order of the group of the bases.
+        """
+        compiled = self.__dict__.get("_compiled")
+        if compiled is not None:
+            return compiled.order
+        return self.bases[0].group.order()
+
     def get_randomizers(self):
         """
         Initialize randomizers for each secret.
@@ -164,17 +183,32 @@ class DLRep(ComposableProofStmt):
                 of the proof.
         """
         output = {}
-        order = self.bases[0].group.order()
+        order = self.get_order()
         for sec in set(self.secret_vars):
             output.update({sec: order.random()})
         return output
 
     def recompute_commitment(self, challenge, responses):
-
-        commitment = (
-            self.lhs.group.wsum(responses, self.bases) + (-challenge) * self.lhs
+        return multiexp(
+            list(responses) + [-challenge],
+            self.bases + [self.lhs],
+            group=self.lhs.group,
         )
-        return commitment
+
+    def get_verification_equations(self, challenge, responses, commitment):
+        """
+        Express the verification identity :math:`R = s_0 G_0 + ... + s_n G_n - c Y`.
+
+        Returns:
+            list: A single equation ``(group, weights, points)``.
+
+        Raises:
+            ValidationError: If the commitment is not a point of the group of the statement.
+        """
+        check_point(commitment, self.lhs.group)
+        weights = list(responses) + [-challenge, Bn(-1)]
+        points = list(self.bases) + [self.lhs, commitment]
+        return [(self.lhs.group, weights, points)]
 
     def simulate_proof(self, responses_dict=None, challenge=None):
         """
@@ -218,14 +252,9 @@ class DLRepProver(Prover):
 
         # Compute an ordered list of randomizers mirroring the Secret objects
         self.ks = [randomizers_dict[sec] for sec in self.stmt.secret_vars]
-        subcommits = [a * b for a, b in zip(self.ks, self.stmt.bases)]
-
-        # We build the commitment doing the product k0 * g0 + k1 * g1...
-        result = self.stmt.bases[0].group.infinite()
-        for com in subcommits:
-            result = result + com
 
-        return result
+        # We build the commitment k0 * g0 + k1 * g1... as a single multi-exponentiation
+        return multiexp(self.ks, self.stmt.bases)
 
     def compute_response(self, challenge):
         """
@@ -240,7 +269,7 @@ class DLRepProver(Prover):
         Returns:
             A list of responses
         """
-        order = self.stmt.bases[0].group.order()
+        order = self.stmt.get_order()
         resps = [
             (self.secret_values[self.stmt.secret_vars[i]] * challenge + k) % order
             for i, k in enumerate(self.ks)
@@ -8,19 +8,34 @@ Range proof: ZK proof that a committed value lies within a range.
 This module implements a Schoenmakers' range proof, a conjuction of or-proofs for each bit of the
 value.
 
+The conjunction of or-proofs is not built as a tree of :py:class:`zksk.composition.AndProofStmt`,
+:py:class:`zksk.composition.OrProofStmt` and :py:class:`zksk.primitives.dlrep.DLRep` statements,
+which would be rebuilt for every proof and every verification. A dedicated statement keeps the bit
+commitments, challenges and responses in flat lists. Its proofs and digests are the same as those
+of the tree.
+
 """
 
 import warnings
+from hashlib import sha256
 
 from petlib.bn import Bn
 from petlib.ec import EcGroup
 
 from zksk import Secret
+from zksk.base import Prover, Verifier, SimulationTranscript
+from zksk.consts import CHALLENGE_LENGTH, DEFAULT_GROUP
 from zksk.primitives.dlrep import DLRep
-from zksk.exceptions import ValidationError
+from zksk.exceptions import ValidationError, InconsistentChallengeError
 from zksk.extended import ExtendedProofStmt
-from zksk.utils import make_generators, get_random_num, ensure_bn
-from zksk.composition import AndProofStmt
+from zksk.utils import make_generators, get_random_num, ensure_bn, multiexp
+from zksk.utils import weigh_equations, check_equations, check_point
+from zksk.utils.encoding import update_hash, update_hash_prefix
+from zksk.composition import (
+    AndProofStmt,
+    ComposableProofStmt,
+    _find_residual_challenge,
+)
 
 
 def decompose_into_n_bits(value, n):
@@ -37,6 +52,227 @@ def decompose_into_n_bits(value, n):
     return base + [0] * extra_bits
 
 
+class _BitProofsStmt(ComposableProofStmt):
+    r"""
+    Conjunction of proofs that commitments are to bits.
+
+    Stands for the statement
+
+    .. math::
+
+        \bigwedge_i PK \{ (r_i): C_i = r_i H \lor C_i - G = r_i H \}
+
+    built as ``AndProofStmt(*[DLRep(C_i, r_i * h) | DLRep(C_i - g, r_i * h) ...])``, with the
+    same identifier, digest, commitments and responses. The responses for bit :math:`i` are
+    ``([c_0, c_1], [[s_0], [s_1]])``.
+
+    Args:
+        Cs: Bit commitments :math:`C_i`
+        g: First commitment base point :math:`G`
+        h: Second commitment base point :math:`H`
+        randomizers: Secrets :math:`r_i`
+        bits: The bits, if proving.
+    """
+
+    def __init__(self, Cs, g, h, randomizers, bits=None):
+        self.Cs = Cs
+        self.g = g
+        self.h = h
+        self.randomizers = randomizers
+        self.bits = bits
+        self.order = h.group.order()
+
+        # Left-hand sides of the two or-clauses of each bit.
+        self.lhs = [[C, C - g] for C in Cs]
+
+    def get_secret_vars(self):
+        return [r for r in self.randomizers for _ in range(2)]
+
+    def get_bases(self):
+        return [self.h] * (2 * len(self.randomizers))
+
+    def get_proof_id(self, secret_id_map=None):
+        if secret_id_map is None:
+            secret_id_map = {s.name: i for i, s in enumerate(self.randomizers)}
+        proof_ids = []
+        for r, lhs in zip(self.randomizers, self.lhs):
+            ids = [secret_id_map[r.name]]
+            proof_ids.append(
+                ("OrProofStmt", [["DLRep", [self.h], ids, point] for point in lhs])
+            )
+        return ("AndProofStmt", proof_ids)
+
+    def _compute_digest(self, key):
+        # Mirror the digests of the DLRep leaves, or-proofs and and-proof of the tree.
+        prefix = sha256()
+        update_hash_prefix(prefix, ["DLRep", [self.h], [0]], 4)
+        or_digests = []
+        for lhs in self.lhs:
+            leaf_digests = []
+            for point in lhs:
+                h = prefix.copy()
+                update_hash(h, point)
+                leaf_digests.append(h.digest())
+            h = sha256()
+            update_hash(h, ["OrProofStmt", leaf_digests, [0, 0]])
+            or_digests.append(h.digest())
+
+        secret_ids = [i for i in range(len(self.randomizers)) for _ in range(2)]
+        h = sha256()
+        update_hash(h, ["AndProofStmt", or_digests, secret_ids])
+        return h.digest(), tuple(s.name for s in self.get_secret_vars())
+
+    def get_prover(self, secrets_dict=None):
+        if self.simulated or self.bits is None:
+            return None
+        return _BitProofsProver(self, secrets_dict)
+
+    def get_verifier(self):
+        return _BitProofsVerifier(self)
+
+    def _check_responses(self, responses, commitment=None):
+        # Without these checks, ``zip`` would silently drop the bits with missing responses.
+        num_bits = len(self.randomizers)
+        if len(self.lhs) != num_bits or len(responses) != num_bits:
+            raise ValidationError("Wrong number of bit proofs.")
+        if commitment is not None and (
+            not isinstance(commitment, (list, tuple))
+            or len(commitment) != num_bits
+            or any(not isinstance(coms, (list, tuple)) or len(coms) != 2 for coms in commitment)
+        ):
+            raise ValidationError("Wrong number of bit commitments.")
+        for response in responses:
+            if len(response) != 2:
+                raise ValidationError("Malformed bit proof.")
+            or_challenges, or_responses = response
+            if len(or_challenges) != 2 or len(or_responses) != 2:
+                raise ValidationError("Malformed bit proof.")
+            if any(len(s) != 1 for s in or_responses):
+                raise ValidationError("Malformed bit proof.")
+
+    def _check_challenges(self, challenge, responses):
+        for or_challenges, _ in responses:
+            if _find_residual_challenge(
+                or_challenges, challenge, CHALLENGE_LENGTH
+            ) != Bn(0):
+                raise InconsistentChallengeError("Inconsistent challenges.")
+
+    def _commitment(self, challenge, response, lhs):
+        # Commitment s H - c Y of a clause, with the negative weight reduced for the native sum.
+        weights = [ensure_bn(response) % self.order, (-challenge) % self.order]
+        return self.h.group.wsum(weights, [self.h, lhs])
+
+    def recompute_commitment(self, challenge, responses):
+        self._check_responses(responses)
+        self._check_challenges(challenge, responses)
+        return [
+            [
+                self._commitment(c, s[0], point)
+                for c, s, point in zip(or_challenges, or_responses, lhs)
+            ]
+            for (or_challenges, or_responses), lhs in zip(responses, self.lhs)
+        ]
+
+    def get_verification_equations(self, challenge, responses, commitment):
+        self._check_responses(responses, commitment)
+        self._check_challenges(challenge, responses)
+        equations = []
+        for (or_challenges, or_responses), lhs, coms in zip(
+            responses, self.lhs, commitment
+        ):
+            for c, s, point, com in zip(or_challenges, or_responses, lhs, coms):
+                check_point(com, self.h.group)
+                equations.append(
+                    (self.h.group, [s[0], -c, Bn(-1)], [self.h, point, com])
+                )
+        return equations
+
+    def _simulate_clause(self, lhs, challenge=None):
+        if challenge is None:
+            challenge = get_random_num(CHALLENGE_LENGTH)
+        response = self.order.random()
+        return challenge, response, self._commitment(challenge, response, lhs)
+
+    def simulate_proof(self, responses_dict=None, challenge=None):
+        if challenge is None:
+            challenge = get_random_num(CHALLENGE_LENGTH)
+        commitment = []
+        responses = []
+        for lhs in self.lhs:
+            c0, s0, com0 = self._simulate_clause(lhs[0])
+            c1 = _find_residual_challenge([c0], challenge, CHALLENGE_LENGTH)
+            c1, s1, com1 = self._simulate_clause(lhs[1], c1)
+            commitment.append([com0, com1])
+            responses.append(([c0, c1], [[s0], [s1]]))
+
+        return SimulationTranscript(
+            commitment=commitment,
+            challenge=challenge,
+            responses=responses,
+            precommitment=[[None, None] for _ in self.lhs],
+        )
+
+
+class _BitProofsProver(Prover):
+    """
+    Prover for the bit proofs: proves the true clause of each bit, and simulates the other.
+    """
+
+    def internal_commit(self, randomizers_dict=None):
+        """
+        Commit for the true clauses, and simulate the others.
+
+        As in or-proofs, the randomizers of the true clauses are drawn independently of the
+        ``randomizers_dict``.
+        """
+        stmt = self.stmt
+        self.ks = []
+        self.simulations = []
+        commitment = []
+        for bit, lhs in zip(stmt.bits, stmt.lhs):
+            k = stmt.order.random()
+            simulation = stmt._simulate_clause(lhs[1 - bit])
+            coms = [None, None]
+            coms[bit] = k * stmt.h
+            coms[1 - bit] = simulation[2]
+            self.ks.append(k)
+            self.simulations.append(simulation)
+            commitment.append(coms)
+        return commitment
+
+    def compute_response(self, challenge):
+        stmt = self.stmt
+        responses = []
+        for bit, r, k, (c_sim, s_sim, _) in zip(
+            stmt.bits, stmt.randomizers, self.ks, self.simulations
+        ):
+            residual = _find_residual_challenge([c_sim], challenge, CHALLENGE_LENGTH)
+            s = (r.value * residual + k) % stmt.order
+            challenges = [None, None]
+            challenges[bit], challenges[1 - bit] = residual, c_sim
+            resps = [None, None]
+            resps[bit], resps[1 - bit] = [s], [s_sim]
+            responses.append((challenges, resps))
+        return responses
+
+
+class _BitProofsVerifier(Verifier):
+    """
+    Verifier for the bit proofs.
+    """
+
+    def send_challenge(self, commitment, ignore_statement_hash_checks=False):
+        if ignore_statement_hash_checks:
+            self.commitment = commitment
+            self.challenge = get_random_num(CHALLENGE_LENGTH)
+            return self.challenge
+        return super().send_challenge(commitment)
+
+    def check_responses_consistency(self, responses, responses_dict=None):
+        # Every clause has its own challenge, and a single secret.
+        return True
+
+
 class PowerTwoRangeStmt(ExtendedProofStmt):
     r"""
     A power-two range proof statement.
@@ -111,26 +347,18 @@ class PowerTwoRangeStmt(ExtendedProofStmt):
         """
         Construct the internal proof statement.
         """
-        if self.is_prover:
-            # Indicators that tell us which or-clause is true
+        bits = None
+        if self.is_prover and not self.simulated:
+            # The bits tell which or-clause is true.
             actual_value = ensure_bn(self.x.value)
-            value_as_bits = decompose_into_n_bits(actual_value, self.num_bits)
-            zero_simulated = [b == 1 for b in value_as_bits]
-            one_simulated = [b == 0 for b in value_as_bits]
-
-        bit_proofs = []
-        for i in range(self.num_bits):
-            p0 = DLRep(precommitment["Cs"][i], self.randomizers[i] * self.h)
-            p1 = DLRep(precommitment["Cs"][i] - self.g, self.randomizers[i] * self.h)
-
-            # When we are a prover, mark which disjunct is true
-            if self.is_prover:
-                p0.set_simulated(zero_simulated[i])
-                p1.set_simulated(one_simulated[i])
+            bits = decompose_into_n_bits(actual_value, self.num_bits)
 
-            bit_proofs.append(p0 | p1)
+        return _BitProofsStmt(
+            precommitment["Cs"], self.g, self.h, self.randomizers, bits
+        )
 
-        return AndProofStmt(*bit_proofs)
+    def get_outer_proof_id(self):
+        return [self.com, self.g, self.h, self.num_bits], self.randomizers
 
     def simulate_precommit(self):
         randomizers = [self.order.random() for _ in range(self.num_bits)]
@@ -153,18 +381,191 @@ class PowerTwoRangeStmt(ExtendedProofStmt):
         Check the commitment to the bit-decomposition is correct.
         """
         rand = precommitment["rand"]
+        if len(precommitment["Cs"]) != self.num_bits:
+            raise ValidationError("Wrong number of bit commitments.")
 
         # Combine bit commitments into value commitment
-        combined = self.g.group.infinite()
-        power = Bn(1)
-        for c in precommitment["Cs"]:
-            combined += power * c
-            power *= 2
+        powers = [Bn(2) ** i for i in range(len(precommitment["Cs"]))]
+        combined = multiexp(powers, precommitment["Cs"], group=self.g.group)
 
         if combined != self.com + rand * self.h:
             raise ValidationError("The commitments do not combine correctly")
 
 
+class MultiRangeStmt(ExtendedProofStmt):
+    r"""
+    A range proof statement for many committed values.
+
+    .. math::
+
+        PK \{ (r_j, x_j)_j: \bigwedge_j C_j = x_j G + r_j H \land l_j \leq x_j < u_j \}
+
+    Equivalent to a conjunction of :py:obj:`RangeStmt` statements, but all the values share one
+    precommitment, one statement of bit proofs, and one multi-exponentiation to check that the
+    bit commitments combine into the commitments.
+
+    >>> group = EcGroup()
+    >>> g, h = make_generators(2, group)
+    >>> xs = [Secret(value=v) for v in [3, 14, 7]]
+    >>> rs = [Secret(value=group.order().random()) for _ in xs]
+    >>> coms = [(x * g + r * h).eval() for x, r in zip(xs, rs)]
+    >>> nizk = MultiRangeStmt(coms, g, h, 0, 16, xs, rs).prove()
+    >>> verifier = MultiRangeStmt(
+    ...     coms, g, h, 0, 16, [Secret() for _ in coms], [Secret() for _ in coms]
+    ... )
+    >>> verifier.verify(nizk)
+    True
+
+    Args:
+        coms: Values of the Pedersen commitments :math:`C_j = x_j G + r_j H`
+        g: First commitment base point :math:`G`
+        h: Second commitment base point :math:`H`
+        lo: Lower limit :math:`l`, or a list of lower limits :math:`l_j`
+        hi: Upper limit :math:`u`, or a list of upper limits :math:`u_j`
+        xs: Secret values :math:`x_j`
+        rs: Secret randomizers :math:`r_j` of the commitments
+    """
+
+    def __init__(self, coms, g, h, lo, hi, xs, rs):
+        if not isinstance(lo, (list, tuple)):
+            lo = [lo] * len(coms)
+        if not isinstance(hi, (list, tuple)):
+            hi = [hi] * len(coms)
+        if not len(coms) == len(lo) == len(hi) == len(xs) == len(rs):
+            raise ValueError("Need as many bounds and secrets as commitments.")
+
+        self.coms = coms
+        self.g = g
+        self.h = h
+        self.xs = xs
+        self.rs = rs
+        self.order = g.group.order()
+        self.is_prover = all(x.value is not None for x in xs) and all(
+            r.value is not None for r in rs
+        )
+
+        # Values shifted into power-of-two ranges: for each, the index of the committed value, the
+        # shift of the value, the shifted commitment and the number of bits.
+        self.shifted = []
+        for j, (com, a, b) in enumerate(zip(coms, lo, hi)):
+            a = ensure_bn(a)
+            b = ensure_bn(b)
+            if b - a < 1:
+                raise ValueError("Empty range [{}, {})".format(a, b))
+            num_bits = max(1, (b - a - 1).num_bits())
+            offset = Bn(2) ** num_bits - (b - a)
+            com_shifted = com - a * g
+            self.shifted.append((j, -a, com_shifted, num_bits))
+            if offset != 0:
+                self.shifted.append((j, offset - a, com_shifted + offset * g, num_bits))
+
+            if self.is_prover:
+                value = ensure_bn(xs[j].value)
+                if value < a or value >= b:
+                    warnings.warn("Secret outside of given range [{}, {})".format(a, b))
+
+        num_bits = sum(n for _, _, _, n in self.shifted)
+        self.randomizers = [Secret() for _ in range(num_bits)]
+
+    def _get_bits(self):
+        bits = []
+        for j, shift, _, num_bits in self.shifted:
+            value = ensure_bn(self.xs[j].value) + shift
+            bits.extend(decompose_into_n_bits(value, num_bits))
+        return bits
+
+    def precommit(self):
+        """
+        Commit to the bit-decompositions of the values.
+        """
+        bits = self._get_bits()
+        for rand in self.randomizers:
+            rand.value = self.order.random()
+        precommitment = {}
+        precommitment["Cs"] = [
+            r.value * self.h + self.g if b else r.value * self.h
+            for b, r in zip(bits, self.randomizers)
+        ]
+
+        # Compute the revealed randomizers, one per shifted value.
+        precommitment["rands"] = []
+        randomizers = iter(self.randomizers)
+        for j, _, _, num_bits in self.shifted:
+            rand = Bn(0)
+            power = Bn(1)
+            for _ in range(num_bits):
+                rand = rand.mod_add(next(randomizers).value * power, self.order)
+                power *= 2
+            precommitment["rands"].append(
+                rand.mod_sub(ensure_bn(self.rs[j].value), self.order)
+            )
+        return precommitment
+
+    def construct_stmt(self, precommitment):
+        """
+        Construct the internal proof statement.
+        """
+        bits = None
+        if self.is_prover and not self.simulated:
+            bits = self._get_bits()
+        com_stmts = [
+            DLRep(com, x * self.g + r * self.h)
+            for com, x, r in zip(self.coms, self.xs, self.rs)
+        ]
+        bit_stmt = _BitProofsStmt(
+            precommitment["Cs"], self.g, self.h, self.randomizers, bits
+        )
+        return AndProofStmt(*com_stmts, bit_stmt)
+
+    def get_outer_proof_id(self):
+        shifts = [[j, shift, num_bits] for j, shift, _, num_bits in self.shifted]
+        return (
+            [self.coms, self.g, self.h, shifts],
+            self.xs + self.rs + self.randomizers,
+        )
+
+    def simulate_precommit(self):
+        precommitment = {"Cs": [], "rands": []}
+        for _, _, com_shifted, num_bits in self.shifted:
+            randomizers = [self.order.random() for _ in range(num_bits)]
+            Cs = [r * self.h for r in randomizers]
+            Cs[0] += com_shifted
+            precommitment["Cs"].extend(Cs)
+
+            rand = Bn(0)
+            power = Bn(1)
+            for r in randomizers:
+                rand = rand.mod_add(r * power, self.order)
+                power *= 2
+            precommitment["rands"].append(rand)
+        return precommitment
+
+    def validate(self, precommitment):
+        """
+        Check that the bit commitments combine into the commitments, all at once.
+        """
+        Cs = precommitment["Cs"]
+        rands = precommitment["rands"]
+        if len(Cs) != len(self.randomizers) or len(rands) != len(self.shifted):
+            raise ValidationError("Wrong number of commitments.")
+
+        equations = []
+        start = 0
+        for (_, _, com_shifted, num_bits), rand in zip(self.shifted, rands):
+            powers = [Bn(2) ** i for i in range(num_bits)]
+            equations.append(
+                (
+                    self.g.group,
+                    powers + [Bn(-1), -rand],
+                    Cs[start : start + num_bits] + [com_shifted, self.h],
+                )
+            )
+            start += num_bits
+
+        if not check_equations(weigh_equations(equations)):
+            raise ValidationError("The commitments do not combine correctly")
+
+
 class GenericRangeStmtMaker:
     r"""
     Auxiliary builder class for generic range proofs.
@@ -275,35 +676,75 @@ class GenericRangeOnlyStmtMaker:
             b: Upper limit :math:`b`
             x: Value for which we construct a range proof
         """
-        group = EcGroup()
-        g = group.hash_to_point(b"g")
-        h = group.hash_to_point(b"h")
+        return self.many(a, b, [x])[0]
 
-        r = Secret(value=group.order().random())
-        com = (x * g + r * h).eval()
+    def many(self, a, b, xs):
+        """
+        Get range proofs for many values in the same range.
+
+        The generators, bounds and shifts are computed once for all the values.
+
+        >>> stmts = RangeOnlyStmt.many(0, 5, [Secret(value=v) for v in range(5)])
+        >>> all(stmt.verify(stmt.prove()) for stmt in stmts)
+        True
+
+        Args:
+            a: Lower limit :math:`a`
+            b: Upper limit :math:`b`
+            xs: Values for which we construct range proofs
+
+        Returns:
+            list: One statement per value.
+        """
+        group = DEFAULT_GROUP
+        g, h = _get_range_only_generators(group)
+        order = group.order()
 
         a = ensure_bn(a)
         b = ensure_bn(b)
         num_bits = (b - a - 1).num_bits()
         offset = Bn(2) ** num_bits - (b - a)
-        com_shifted1 = com - a * g
-        com_shifted2 = com_shifted1 + offset * g
+        shift1 = a * g
+        shift2 = shift1 - offset * g
 
-        x1 = Secret()
-        x2 = Secret()
-        if x is not None:
-            x1.value = x.value - a
-            x2.value = x.value - a + offset
+        stmts = []
+        for x in xs:
+            r = Secret(value=order.random())
+            com = (x * g + r * h).eval()
+            com_shifted1 = com - shift1
+            com_shifted2 = com - shift2
 
-        com_stmt = DLRep(com, x * g + r * h)
-        p1 = PowerTwoRangeStmt(
-            com=com_shifted1, g=g, h=h, num_bits=num_bits, x=x1, randomizer=r,
-        )
-        p2 = PowerTwoRangeStmt(
-            com=com_shifted2, g=g, h=h, num_bits=num_bits, x=x2, randomizer=r,
-        )
+            x1 = Secret()
+            x2 = Secret()
+            if x is not None:
+                x1.value = x.value - a
+                x2.value = x.value - a + offset
 
-        return com_stmt & p1 & p2
+            com_stmt = DLRep(com, x * g + r * h)
+            p1 = PowerTwoRangeStmt(
+                com=com_shifted1, g=g, h=h, num_bits=num_bits, x=x1, randomizer=r,
+            )
+            p2 = PowerTwoRangeStmt(
+                com=com_shifted2, g=g, h=h, num_bits=num_bits, x=x2, randomizer=r,
+            )
+            stmts.append(com_stmt & p1 & p2)
+
+        return stmts
+
+
+# Generators of range-only statements, hashed to the group once per group identifier.
+_RANGE_ONLY_GENERATORS = {}
+
+
+def _get_range_only_generators(group):
+    """
+    Return the generators of range-only statements in a group.
+    """
+    generators = _RANGE_ONLY_GENERATORS.get(group.nid())
+    if generators is None:
+        generators = (group.hash_to_point(b"g"), group.hash_to_point(b"h"))
+        _RANGE_ONLY_GENERATORS[group.nid()] = generators
+    return generators
 
 
 # TODO: Make a regular class.
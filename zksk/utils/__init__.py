@@ -3,5 +3,12 @@ from zksk.utils.groups import (
     get_random_point,
     get_random_num,
     sum_bn_array,
+    batch_inverse,
     ensure_bn,
+    check_point,
+    weigh_equations,
+    check_equations,
 )
+from zksk.utils.multiexp import multiexp
+from zksk.utils.fixedbase import precompute, PrecomputedBase, PrecomputedEcPt
+from zksk.utils.encoding import canonical_encode, update_hash
@@ -0,0 +1,211 @@
+"""
+Canonical binary encoding of statement identifiers.
+
+Statement digests are computed over this encoding. Every value is a one-byte type tag followed by
+length-prefixed content, so that distinct values have distinct encodings:
+
+- byte strings and strings: their bytes (UTF-8 for strings);
+- integers and big numbers: sign and big-endian magnitude;
+- points: class name and export, in the default (for ``EcPt``, compressed) form;
+- lists, tuples and dictionaries: number of elements, then the elements. The entries of
+  dictionaries are sorted by the encoding of their keys;
+- None: the tag alone.
+
+Other values, e.g., custom precommitments, are encoded with ``petlib.pack.encode``.
+
+Decoding points checks that they are on their curve, and decompresses them. :py:func:`unpack_lazily`
+decodes a ``petlib.pack`` encoding but keeps its points encoded, as ``msgpack.ExtType`` values,
+until :py:func:`decode_points` is called. Such a point has the canonical encoding of the decoded
+point, and is re-encoded by ``petlib.pack.encode`` as it was.
+
+The encoding can be streamed into a hash object, without building the whole byte string:
+
+>>> from hashlib import sha256
+>>> h = sha256()
+>>> update_hash(h, ["DLRep", [1, 2], None])
+>>> h.digest() == sha256(canonical_encode(["DLRep", [1, 2], None])).digest()
+True
+>>> canonical_encode([1, "a"])
+b'l\\x00\\x00\\x00\\x02n\\x00\\x00\\x00\\x02\\x00\\x01s\\x00\\x00\\x00\\x01a'
+
+"""
+
+import struct
+
+import msgpack
+from petlib.bn import Bn
+from petlib.ec import EcPt
+from petlib.pack import encode, ext_hook
+
+from zksk.exceptions import ValidationError
+from zksk.utils.fixedbase import unwrap
+
+
+def _length(n):
+    return struct.pack(">I", n)
+
+
+def _encode_int(x, write):
+    sign = b"\x01" if x < 0 else b"\x00"
+    if x < 0:
+        x = -x
+    if isinstance(x, Bn):
+        magnitude = x.binary() if x != 0 else b""
+    else:
+        magnitude = x.to_bytes((x.bit_length() + 7) // 8, "big")
+    write(b"n" + _length(len(magnitude) + 1) + sign + magnitude)
+
+
+def _encode(obj, write):
+    if isinstance(obj, EcPt):
+        # Subclasses such as PrecomputedEcPt encode as plain points.
+        data = obj.export()
+        write(b"p\x00\x00\x00\x04EcPt" + _length(len(data)) + data)
+    elif isinstance(obj, msgpack.ExtType) and obj.code in _LAZY_POINTS:
+        name = _LAZY_POINTS[obj.code][0]
+        data = _get_export(obj)
+        write(b"p" + _length(len(name)) + name + _length(len(data)) + data)
+    elif obj is None:
+        write(b"0")
+    elif isinstance(obj, bytes):
+        write(b"b" + _length(len(obj)) + obj)
+    elif isinstance(obj, str):
+        data = obj.encode()
+        write(b"s" + _length(len(data)) + data)
+    elif isinstance(obj, (int, Bn)):
+        _encode_int(obj, write)
+    elif isinstance(obj, (list, tuple)):
+        write(b"l" + _length(len(obj)))
+        for item in obj:
+            _encode(item, write)
+    elif isinstance(obj, dict):
+        entries = sorted(
+            ((canonical_encode(key), value) for key, value in obj.items()),
+            key=lambda entry: entry[0],
+        )
+        write(b"d" + _length(len(entries)))
+        for key, value in entries:
+            write(key)
+            _encode(value, write)
+    elif hasattr(obj, "export"):
+        obj = unwrap(obj)
+        if isinstance(obj, EcPt):
+            _encode(obj, write)
+            return
+        name = type(obj).__name__.encode()
+        data = obj.export()
+        write(b"p" + _length(len(name)) + name + _length(len(data)) + data)
+    else:
+        data = encode(obj)
+        write(b"x" + _length(len(data)) + data)
+
+
+def update_hash(hasher, obj):
+    """
+    Update a hash object with the canonical encoding of a value.
+
+    Args:
+        hasher: Object with an ``update`` method, e.g., from ``hashlib``.
+        obj: Value to encode.
+    """
+    _encode(obj, hasher.update)
+
+
+def update_hash_prefix(hasher, items, length):
+    """
+    Update a hash object with the beginning of the canonical encoding of a list.
+
+    The hash object can then be copied, and each copy completed with the encoding of the remaining
+    elements of the list, one :py:func:`update_hash` call per element.
+
+    Args:
+        hasher: Object with an ``update`` method, e.g., from ``hashlib``.
+        items: First elements of the list.
+        length: Total number of elements of the list.
+    """
+    hasher.update(b"l" + _length(length))
+    for item in items:
+        _encode(item, hasher.update)
+
+
+def canonical_encode(obj):
+    """
+    Return the canonical encoding of a value.
+    """
+    chunks = []
+    _encode(obj, chunks.append)
+    return b"".join(chunks)
+
+
+# Points that can be kept encoded: for each ``petlib.pack`` extension code, the name of the class
+# of the points, and a function that returns the export of a point from its packed data.
+_LAZY_POINTS = {}
+
+
+def register_lazy_point(code, name, get_export):
+    """
+    Let :py:func:`unpack_lazily` keep the points of an extension code encoded.
+
+    Args:
+        code: Extension code of the points in ``petlib.pack``.
+        name: Name of the class of the points.
+        get_export: Function that returns the export of a point from its packed data.
+    """
+    _LAZY_POINTS[code] = (name.encode(), get_export)
+
+
+def _get_ecpt_export(data):
+    _, export = msgpack.unpackb(data)
+    return export
+
+
+register_lazy_point(2, "EcPt", _get_ecpt_export)
+
+
+def _lazy_ext_hook(code, data):
+    if code in _LAZY_POINTS:
+        return msgpack.ExtType(code, data)
+    return ext_hook(code, data)
+
+
+def _get_export(point):
+    try:
+        export = _LAZY_POINTS[point.code][1](point.data)
+    except Exception:
+        export = None
+    if not isinstance(export, bytes):
+        raise ValidationError("Malformed point.")
+    return export
+
+
+def unpack_lazily(data):
+    """
+    Decode a ``petlib.pack`` encoding, but keep its points encoded.
+    """
+    return msgpack.unpackb(data, ext_hook=_lazy_ext_hook, raw=False)
+
+
+def decode_points(obj):
+    """
+    Decode the points that :py:func:`unpack_lazily` kept encoded in a value.
+
+    Raises:
+        ValidationError: If a point is malformed, or not encoded as its export, so that its
+            canonical encoding would change once decoded.
+    """
+    if isinstance(obj, msgpack.ExtType) and obj.code in _LAZY_POINTS:
+        export = _get_export(obj)
+        try:
+            point = ext_hook(obj.code, obj.data)
+        except Exception:
+            raise ValidationError("Malformed point.")
+        if point.export() != export:
+            raise ValidationError("The point is not encoded canonically.")
+        return point
+    if isinstance(obj, list):
+        return [decode_points(item) for item in obj]
+    if isinstance(obj, tuple):
+        return tuple(decode_points(item) for item in obj)
+    if isinstance(obj, dict):
+        return {key: decode_points(value) for key, value in obj.items()}
+    return obj
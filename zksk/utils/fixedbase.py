@@ -0,0 +1,174 @@
+"""
+Precomputation for fixed bases.
+
+Proofs are usually built against the same generators for the life of a process, so multiples of
+these generators can be precomputed once to speed up every later scalar multiplication.
+
+:py:func:`precompute` wraps a point into an object that can be used in its place, e.g., in
+expressions: ``Secret() * precompute(g)``. Multiplying the wrapped point by a scalar returns a
+plain point.
+
+- For points of ``petlib`` curves, the Python-level table lookups would cost more than the native
+  scalar multiplication, so only the group generator gets faster: it is wrapped into a
+  :py:class:`PrecomputedEcPt`, an ``EcPt`` that uses OpenSSL's precomputed multiples of the
+  generator. Any other point of a ``petlib`` curve is returned as is, as there is nothing to gain.
+- Other points, such as those of :py:mod:`zksk.pairings`, are wrapped into a
+  :py:class:`PrecomputedBase`. It keeps a table of windowed multiples, so that a multiplication
+  only costs one addition per window of the scalar.
+
+>>> from petlib.ec import EcGroup
+>>> group = EcGroup()
+>>> g = group.generator()
+>>> pg = precompute(g)
+>>> 42 * pg == 42 * g
+True
+>>> isinstance(pg, EcPt)
+True
+
+"""
+
+from petlib.bn import Bn
+from petlib.ec import EcPt
+from petlib.bindings import _C, _FFI
+
+
+# Window width of the fixed-base tables.
+FIXED_BASE_WINDOW = 6
+
+
+def precompute(point, window=FIXED_BASE_WINDOW):
+    """
+    Wrap a point to speed up its later scalar multiplications.
+
+    Args:
+        point: Point to wrap. Already wrapped points are returned as is.
+        window: Window width of the table, for points that use one.
+
+    Returns:
+        :py:class:`PrecomputedEcPt` or :py:class:`PrecomputedBase`: Wrapped point. Points of
+        ``petlib`` curves other than the group generator are returned unwrapped.
+    """
+    if isinstance(point, (PrecomputedEcPt, PrecomputedBase)):
+        return point
+    if isinstance(point, EcPt):
+        if point != point.group.generator():
+            return point
+        return PrecomputedEcPt(point)
+    return PrecomputedBase(point, window=window)
+
+
+def _to_bn(nb):
+    return nb if isinstance(nb, Bn) else Bn(nb)
+
+
+def unwrap(point):
+    """
+    Return the plain point behind a wrapped point.
+    """
+    if isinstance(point, PrecomputedBase):
+        return point.point
+    return point
+
+
+class PrecomputedEcPt(EcPt):
+    """
+    A point of a ``petlib`` curve with fast multiplications when it is the group generator.
+
+    Args:
+        point (``petlib.ec.EcPt``): Point.
+    """
+
+    def __init__(self, point):
+        super().__init__(point.group)
+        _C.EC_POINT_copy(self.pt, point.pt)
+        self.is_generator = point == point.group.generator()
+
+    def __copy__(self):
+        return PrecomputedEcPt(self)
+
+    def __rmul__(self, other):
+        if not self.is_generator:
+            return super().__rmul__(other)
+        scalar = _to_bn(other)
+        result = EcPt(self.group)
+        err = _C.EC_POINT_mul(
+            self.group.ecg, result.pt, scalar.bn, _FFI.NULL, _FFI.NULL, _FFI.NULL
+        )
+        if not err:
+            raise RuntimeError("Scalar multiplication failed.")
+        return result
+
+    __mul__ = __rmul__
+    pt_mul = __rmul__
+
+
+class PrecomputedBase:
+    """
+    A point with a table of precomputed multiples.
+
+    The scalar is split into windows of :math:`w` bits, and the table holds :math:`d 2^{wj} P` for
+    every digit :math:`d` and window :math:`j`. A multiplication is then a sum of table entries.
+
+    Args:
+        point: Point to wrap.
+        window: Window width :math:`w`.
+    """
+
+    def __init__(self, point, window=FIXED_BASE_WINDOW):
+        self.point = point
+        self.group = point.group
+        self.window = window
+
+        self.order = self.group.order()
+        num_windows = -(-self.order.num_bits() // window)
+        self.table = []
+        base = point
+        for _ in range(num_windows):
+            row = [base]
+            for _ in range(2 ** window - 2):
+                row.append(row[-1] + base)
+            self.table.append(row)
+            base = row[-1] + base
+
+    def __mul__(self, nb):
+        k = int(_to_bn(nb) % self.order)
+        mask = 2 ** self.window - 1
+        result = None
+        for row in self.table:
+            digit = k & mask
+            if digit:
+                result = row[digit - 1] if result is None else result + row[digit - 1]
+            k >>= self.window
+        return self.group.infinite() if result is None else result
+
+    __rmul__ = __mul__
+
+    def __add__(self, other):
+        return self.point + unwrap(other)
+
+    def __radd__(self, other):
+        return unwrap(other) + self.point
+
+    def __sub__(self, other):
+        return self.point + (-1 * unwrap(other))
+
+    def __rsub__(self, other):
+        return unwrap(other) + (-1 * self.point)
+
+    def __neg__(self):
+        return self * -1
+
+    def __eq__(self, other):
+        return self.point == unwrap(other)
+
+    def __hash__(self):
+        return hash(self.point)
+
+    def __getattr__(self, name):
+        # Forward the rest, e.g., ``pt``, ``bp``, ``export`` or ``pair``, to the wrapped point.
+        if name == "point":
+            raise AttributeError(name)
+        return getattr(self.point, name)
+
+    def __repr__(self):
+        return repr(self.point)
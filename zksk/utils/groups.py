@@ -5,8 +5,9 @@ import warnings
 
 from petlib.bn import Bn
 
-from zksk.consts import DEFAULT_GROUP
-from zksk.exceptions import InvalidExpression
+from zksk.consts import DEFAULT_GROUP, BATCH_WEIGHT_LENGTH
+from zksk.exceptions import InvalidExpression, ValidationError
+from zksk.utils.fixedbase import unwrap
 
 
 def get_random_point(group=None, random_bits=256, seed=None):
@@ -65,13 +66,12 @@ def make_generators(num, group=None, random_bits=256, seed=42):
     """
     if group is None:
         group = DEFAULT_GROUP
-    generators = [
+    return [
         get_random_point(
             group, random_bits, seed=seed + i if seed is not None else None
         )
         for i in range(num)
     ]
-    return generators
 
 
 def get_random_num(bits):
@@ -105,6 +105,39 @@ def sum_bn_array(arr, modulus):
     return res
 
 
+def batch_inverse(values, modulus):
+    """
+    Invert many numbers modulo a prime with a single modular inversion.
+
+    Uses Montgomery's trick: the product of all the numbers is inverted, and each inverse is then
+    recovered with multiplications.
+
+    >>> batch_inverse([2, 3, 4], 7) == [Bn(4), Bn(5), Bn(2)]
+    True
+
+    Raises:
+        ValueError: If a number is not invertible.
+    """
+    modulus = ensure_bn(modulus)
+    values = [ensure_bn(v) % modulus for v in values]
+    if any(v == 0 for v in values):
+        raise ValueError("Zero is not invertible.")
+    if not values:
+        return []
+
+    # prefix[i] is the product of the first i numbers.
+    prefix = [Bn(1)]
+    for v in values:
+        prefix.append(prefix[-1].mod_mul(v, modulus))
+    inverse = prefix[-1].mod_inverse(modulus)
+
+    inverses = [None] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        inverses[i] = inverse.mod_mul(prefix[i], modulus)
+        inverse = inverse.mod_mul(values[i], modulus)
+    return inverses
+
+
 def ensure_bn(x):
     """
     Ensure that value is big number.
@@ -113,8 +146,95 @@ def ensure_bn(x):
     True
     >>> isinstance(ensure_bn(Bn(42)), Bn)
     True
+    >>> ensure_bn(-2 ** 100) == -Bn(2) ** 100
+    True
     """
     if isinstance(x, Bn):
         return x
-    else:
+    elif abs(x) < 2 ** 32:
         return Bn(x)
+    else:
+        # Bn only converts integers that fit in a machine word.
+        magnitude = abs(x)
+        bn = Bn.from_binary(magnitude.to_bytes((magnitude.bit_length() + 7) // 8, "big"))
+        return -bn if x < 0 else bn
+
+
+def check_point(point, group):
+    """
+    Check that an untrusted value, e.g., read from a proof, is a point of a group.
+
+    >>> g = DEFAULT_GROUP.generator()
+    >>> check_point(g, DEFAULT_GROUP)
+    >>> check_point(5, DEFAULT_GROUP)
+    Traceback (most recent call last):
+    ...
+    zksk.exceptions.ValidationError: Not a point of the group.
+
+    Raises:
+        ValidationError: If it is not.
+    """
+    point_group = getattr(unwrap(point), "group", None)
+    # Groups of different types cannot be compared.
+    if type(point_group) is not type(group) or point_group != group:
+        raise ValidationError("Not a point of the group.")
+
+
+def weigh_equations(equations):
+    """
+    Assign independent random weights to group equations.
+
+    Args:
+        equations: Tuples ``(group, weights, points)``, each standing for the claim that the
+            weighted sum of the points is the neutral element of the group.
+
+    Returns:
+        list: Pairs ``(weight, equation)`` to be passed to :py:func:`check_equations`.
+    """
+    # Zero weights would let invalid equations through.
+    return [(get_random_num(bits=BATCH_WEIGHT_LENGTH) + 1, eq) for eq in equations]
+
+
+def check_equations(weighted_equations):
+    """
+    Check that a random linear combination of group equations vanishes.
+
+    If any of the equations does not hold, the combination vanishes with negligible probability.
+    Terms with the same point object are merged, so that bases shared by several equations only
+    appear once in the single multi-exponentiation done for each group.
+
+    >>> g = DEFAULT_GROUP.generator()
+    >>> true_eq = (DEFAULT_GROUP, [Bn(2), Bn(-1)], [g, 2 * g])
+    >>> false_eq = (DEFAULT_GROUP, [Bn(3), Bn(-1)], [g, 2 * g])
+    >>> check_equations(weigh_equations([true_eq, true_eq]))
+    True
+    >>> check_equations(weigh_equations([true_eq, false_eq]))
+    False
+
+    Args:
+        weighted_equations: Pairs ``(weight, equation)``, see :py:func:`weigh_equations`.
+    """
+    # One accumulator per group: a mapping from point ids to [point, weight] pairs.
+    accumulators = []
+    for weight, (group, weights, points) in weighted_equations:
+        for acc_group, acc in accumulators:
+            if acc_group == group:
+                break
+        else:
+            acc = {}
+            accumulators.append((group, acc))
+
+        order = group.order()
+        for w, p in zip(weights, points):
+            term = weight.mod_mul(ensure_bn(w), order)
+            if id(p) in acc:
+                acc[id(p)][1] = acc[id(p)][1].mod_add(term, order)
+            else:
+                acc[id(p)] = [unwrap(p), term]
+
+    for group, acc in accumulators:
+        points = [p for p, _ in acc.values()]
+        weights = [w for _, w in acc.values()]
+        if group.wsum(weights, points) != group.infinite():
+            return False
+    return True
@@ -15,3 +15,36 @@ def get_default_attr(obj, attr, default_value=None):
     if not hasattr(obj, attr):
         setattr(obj, attr, default_value)
     return getattr(obj, attr)
+
+
+def map_in_order(executor, func, items):
+    """
+    Apply a function to items, possibly concurrently, and return the results in order.
+
+    Items that no worker has started when their result is needed are processed by the caller
+    itself. Hence, the function may call :py:func:`map_in_order` with the same executor without
+    risking a deadlock, even if all the workers are busy.
+
+    >>> map_in_order(None, abs, [-1, 2, -3])
+    [1, 2, 3]
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> with ThreadPoolExecutor(max_workers=1) as executor:
+    ...     map_in_order(executor, lambda x: map_in_order(executor, abs, x), [[-1], [-2, 3]])
+    [[1], [2, 3]]
+
+    Args:
+        executor: A ``concurrent.futures.Executor``, or None to work sequentially.
+        func: Function of one argument.
+        items: List of arguments.
+    """
+    if executor is None or len(items) < 2:
+        return [func(item) for item in items]
+
+    futures = [executor.submit(func, item) for item in items[1:]]
+    results = [func(items[0])]
+    for item, future in zip(items[1:], futures):
+        if future.cancel():
+            results.append(func(item))
+        else:
+            results.append(future.result())
+    return results
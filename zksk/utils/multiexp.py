@@ -0,0 +1,174 @@
+"""
+Multi-exponentiation: computing weighted sums of group elements.
+
+Computing :math:`w_0 P_0 + w_1 P_1 + ... + w_n P_n` term by term costs :math:`n` full scalar
+multiplications. Multi-exponentiation algorithms share the doublings among all the terms:
+
+- Straus' algorithm (interleaved windows) precomputes a small table of multiples of every point,
+  and is the fastest for few terms.
+- Pippenger's algorithm (bucket method) sorts the points into buckets by window digit, and wins
+  for many terms.
+
+Groups that provide a native multi-exponentiation (``petlib.ec.EcGroup.wsum``, or groups with a
+``native_multiexp`` method, such as the pairing groups of :py:mod:`zksk.pairings`) use it instead.
+Otherwise, the terms whose base has a table of precomputed multiples (see
+:py:mod:`zksk.utils.fixedbase`) are computed with their table.
+
+>>> from petlib.ec import EcGroup
+>>> group = EcGroup()
+>>> g, h = group.generator(), group.hash_to_point(b"h")
+>>> multiexp([2, 3], [g, h]) == 2 * g + 3 * h
+True
+>>> multiexp([2, 3], [g, h], algorithm="pippenger") == 2 * g + 3 * h
+True
+
+"""
+
+from petlib.ec import EcGroup
+
+from zksk.utils.groups import ensure_bn
+from zksk.utils.fixedbase import PrecomputedBase, unwrap
+
+
+# Number of terms from which the bucket method beats interleaved windows.
+PIPPENGER_THRESHOLD = 64
+
+# Window width of Straus' algorithm.
+STRAUS_WINDOW = 4
+
+
+def multiexp(weights, points, group=None, algorithm=None):
+    """
+    Compute the weighted sum of group elements.
+
+    Weights are reduced modulo the group order, and terms with a null weight are skipped.
+
+    Args:
+        weights: Integers or big numbers.
+        points: Group elements, all from the same group.
+        group: Group of the points. Required if there are no points.
+        algorithm: Force the generic algorithm: ``"straus"`` or ``"pippenger"``. By default the
+            native multi-exponentiation of the group is used if it has one, else the generic
+            algorithm is chosen from the number of terms.
+
+    Returns:
+        The weighted sum of the points.
+    """
+    if group is None:
+        if not points:
+            raise ValueError("Need a group to sum an empty list of points.")
+        group = points[0].group
+
+    order = group.order()
+    terms = []
+    for w, p in zip(weights, points):
+        w = ensure_bn(w) % order
+        if w != 0:
+            terms.append((w, p))
+    if not terms:
+        return group.infinite()
+
+    if algorithm is None:
+        weights = [w for w, _ in terms]
+        points = [unwrap(p) for _, p in terms]
+        if isinstance(group, EcGroup):
+            return group.wsum(weights, points)
+        if hasattr(group, "native_multiexp"):
+            return group.native_multiexp(weights, points)
+
+    # Bases with precomputed tables are cheaper to multiply on their own.
+    fixed = [w * p for w, p in terms if isinstance(p, PrecomputedBase)]
+    terms = [(w, p) for w, p in terms if not isinstance(p, PrecomputedBase)]
+    result = None
+    if terms:
+        weights = [int(w) for w, _ in terms]
+        points = [p for _, p in terms]
+        if algorithm is None:
+            algorithm = "straus" if len(points) < PIPPENGER_THRESHOLD else "pippenger"
+        if algorithm == "straus":
+            result = straus(weights, points)
+        elif algorithm == "pippenger":
+            result = pippenger(weights, points)
+        else:
+            raise ValueError(
+                "Unknown multi-exponentiation algorithm: {}".format(algorithm)
+            )
+    for point in fixed:
+        result = _add(result, point)
+    return result
+
+
+def _add(acc, point):
+    return point if acc is None else acc + point
+
+
+def straus(weights, points, window=STRAUS_WINDOW):
+    """
+    Straus' algorithm (interleaved fixed windows).
+
+    Args:
+        weights: Non-negative Python integers, at least one of which is non-zero.
+        points: Group elements.
+        window: Window width in bits.
+    """
+    # tables[i][d] = (d + 1) * points[i]
+    tables = []
+    for p in points:
+        table = [p]
+        for _ in range(2 ** window - 2):
+            table.append(table[-1] + p)
+        tables.append(table)
+
+    mask = 2 ** window - 1
+    num_windows = -(-max(w.bit_length() for w in weights) // window)
+    result = None
+    for j in reversed(range(num_windows)):
+        if result is not None:
+            for _ in range(window):
+                result = result + result
+        shift = j * window
+        for w, table in zip(weights, tables):
+            digit = (w >> shift) & mask
+            if digit:
+                result = _add(result, table[digit - 1])
+    return result
+
+
+def pippenger(weights, points, window=None):
+    """
+    Pippenger's algorithm (bucket method).
+
+    Args:
+        weights: Non-negative Python integers, at least one of which is non-zero.
+        points: Group elements.
+        window: Window width in bits. Chosen from the number of points by default.
+    """
+    if window is None:
+        window = max(2, len(points).bit_length() - 3)
+
+    mask = 2 ** window - 1
+    num_windows = -(-max(w.bit_length() for w in weights) // window)
+    result = None
+    for j in reversed(range(num_windows)):
+        if result is not None:
+            for _ in range(window):
+                result = result + result
+
+        shift = j * window
+        buckets = [None] * mask
+        for w, p in zip(weights, points):
+            digit = (w >> shift) & mask
+            if digit:
+                buckets[digit - 1] = _add(buckets[digit - 1], p)
+
+        # sum_d d * bucket[d], as a sum of running sums from the top bucket down.
+        running = None
+        window_sum = None
+        for bucket in reversed(buckets):
+            if bucket is not None:
+                running = _add(running, bucket)
+            if running is not None:
+                window_sum = _add(window_sum, running)
+        if window_sum is not None:
+            result = _add(result, window_sum)
+    return result
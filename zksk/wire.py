@@ -0,0 +1,315 @@
+"""
+Compact binary format of non-interactive proofs.
+
+:py:meth:`zksk.base.NIZK.serialize` tags every value with its type and length, and keeps the keys
+of precommitment dictionaries. Yet, all the proofs of a statement template share the same layout:
+the same numbers of responses, the same precommitment structure, and points from the same groups.
+A :py:class:`WireFormat` fixes this layout once, from a sample proof, and then writes every proof as
+a sequence of fixed-width fields without any tag:
+
+- a bitmap of the signs of the scalars (challenges of or-proofs can be negative);
+- the challenge, as 32 bytes, and the statement hash;
+- the scalars, as big-endian magnitudes of the size of the group order, or of the size of
+  challenges for the scalars that fit in it in the sample proof, e.g., the challenges of
+  or-proofs;
+- the points, in compressed or uncompressed form. The neutral element is written as zeros.
+
+Decoding checks the size of the data before parsing anything, and reads the fields from slices of a
+``memoryview`` of the data.
+
+>>> from zksk import Secret, DLRep
+>>> from zksk.utils import make_generators
+>>> g, h = make_generators(2)
+>>> x, r = Secret(), Secret()
+>>> stmt = DLRep(3 * g + 4 * h, x * g + r * h)
+>>> nizk = stmt.prove({x: 3, r: 4})
+>>> wire = WireFormat(nizk)
+>>> data = wire.encode(nizk)
+>>> len(data) < len(nizk.serialize())
+True
+>>> stmt.verify(wire.decode(data))
+True
+
+"""
+
+from petlib.bn import Bn
+from petlib.ec import EcPt, POINT_CONVERSION_COMPRESSED, POINT_CONVERSION_UNCOMPRESSED
+
+from zksk.base import NIZK
+from zksk.consts import CHALLENGE_LENGTH, DEFAULT_GROUP
+from zksk.utils.fixedbase import unwrap
+
+
+# Default limits on the size of encoded proofs, and on the nesting of their values.
+MAX_SIZE = 1 << 20
+MAX_DEPTH = 16
+
+# Sizes in bytes of the challenge (a SHA-256 hash) and of the statement hash.
+CHALLENGE_SIZE = 32
+STMT_HASH_SIZE = 32
+
+_POINT_FORMS = {
+    "compressed": POINT_CONVERSION_COMPRESSED,
+    "uncompressed": POINT_CONVERSION_UNCOMPRESSED,
+}
+
+
+class _Scalar:
+    """
+    Layout of a scalar: a fixed-width magnitude, and a bit of the sign bitmap.
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+    def write(self, value, out, signs):
+        value = Bn(value) if not isinstance(value, Bn) else value
+        negative = value < 0
+        signs.append(negative)
+        if negative:
+            value = -value
+        data = value.binary() if value != 0 else b""
+        if len(data) > self.size:
+            raise ValueError("Scalar does not fit in {} bytes.".format(self.size))
+        out.append(bytes(self.size - len(data)) + data)
+
+    def read(self, view, offset, signs):
+        value = Bn.from_binary(bytes(view[offset : offset + self.size]))
+        if next(signs):
+            value = -value
+        return value
+
+
+class _Point:
+    """
+    Layout of a point: its export in a fixed form, or zeros for the neutral element.
+    """
+
+    def __init__(self, sample, form):
+        self.form = form
+        self.cls = type(sample)
+        self.group = sample.group
+        # Points of zksk.pairings wrap points of bplib.
+        self.elem_cls = None if isinstance(sample, EcPt) else type(sample.pt)
+        data = self._export(sample)
+        if data == b"\x00":
+            data = self._export(self.group.generator())
+        self.size = len(data)
+
+    def _export(self, point):
+        return point.export(self.form)
+
+    def write(self, value, out, signs):
+        data = self._export(unwrap(value))
+        if data == b"\x00":
+            data = bytes(self.size)
+        elif len(data) != self.size:
+            raise ValueError("Point does not fit in {} bytes.".format(self.size))
+        out.append(data)
+
+    def read(self, view, offset, signs):
+        block = view[offset : offset + self.size]
+        if not any(block):
+            return self.group.infinite()
+        if self.elem_cls is None:
+            return EcPt.from_binary(bytes(block), self.group)
+        bp = self.group.bp
+        return self.cls(self.elem_cls.from_bytes(bytes(block), bp.bpgp), bp)
+
+
+class _Seq:
+    def __init__(self, items, cls):
+        self.items = items
+        self.cls = cls
+
+    def build(self, values):
+        return self.cls(item.build(values) for item in self.items)
+
+
+class _Dict:
+    def __init__(self, keys, items):
+        self.keys = keys
+        self.items = items
+
+    def build(self, values):
+        return {key: item.build(values) for key, item in zip(self.keys, self.items)}
+
+
+class _Leaf:
+    def __init__(self, index):
+        self.index = index
+
+    def build(self, values):
+        return values[self.index]
+
+
+class _Const:
+    def __init__(self, value):
+        self.value = value
+
+    def build(self, values):
+        return self.value
+
+
+class WireFormat:
+    """
+    Fixed layout of the proofs of a statement template.
+
+    Args:
+        sample (:py:class:`zksk.base.NIZK`): A proof of the template.
+        group: Group of the statement, whose order fixes the size of scalars. Defaults to
+            :py:data:`zksk.consts.DEFAULT_GROUP`. For statements over several groups, pass the group
+            with the largest order.
+        point_form (str): ``"compressed"`` or ``"uncompressed"``.
+        max_size (int): Maximum size of encoded proofs, in bytes.
+        max_depth (int): Maximum nesting of lists and dictionaries in proofs.
+
+    Raises:
+        ValueError: If the proof has values that can't be laid out, or exceeds the limits.
+    """
+
+    def __init__(
+        self,
+        sample,
+        group=None,
+        point_form="compressed",
+        max_size=MAX_SIZE,
+        max_depth=MAX_DEPTH,
+    ):
+        if point_form not in _POINT_FORMS:
+            raise ValueError("Unknown point form: {}".format(point_form))
+        if group is None:
+            group = DEFAULT_GROUP
+        self.challenge_size = (int(CHALLENGE_LENGTH) + 7) // 8
+        self.scalar_size = max((group.order().num_bits() + 7) // 8, self.challenge_size)
+        self.form = _POINT_FORMS[point_form]
+        self.max_depth = max_depth
+
+        # Leaves in order, and the structure that rebuilds the proof from their values.
+        self.leaves = []
+        self.has_commitment = sample.commitment is not None
+        fields = [sample.responses, sample.precommitment]
+        if self.has_commitment:
+            fields.append(sample.commitment)
+        self.structure = [self._layout(field, 0) for field in fields]
+
+        self.num_scalars = sum(isinstance(leaf, _Scalar) for leaf in self.leaves)
+        self.header_size = (self.num_scalars + 7) // 8 + CHALLENGE_SIZE + STMT_HASH_SIZE
+        self.offsets = []
+        offset = self.header_size
+        for leaf in self.leaves:
+            self.offsets.append(offset)
+            offset += leaf.size
+        self.size = offset
+        if self.size > max_size:
+            raise ValueError("Proofs take {} bytes, more than {}.".format(self.size, max_size))
+
+    def _layout(self, value, depth):
+        if depth > self.max_depth:
+            raise ValueError("Proofs are nested deeper than {}.".format(self.max_depth))
+        value = unwrap(value)
+        if value is None:
+            return _Const(None)
+        if isinstance(value, (int, Bn)) and not isinstance(value, bool):
+            # Other scalars, e.g., responses, are random modulo the group order.
+            small = abs(int(value)).bit_length() <= int(CHALLENGE_LENGTH)
+            return self._add_leaf(_Scalar(self.challenge_size if small else self.scalar_size))
+        if isinstance(value, (list, tuple)):
+            items = [self._layout(item, depth + 1) for item in value]
+            return _Seq(items, type(value))
+        if isinstance(value, dict):
+            keys = sorted(value)
+            items = [self._layout(value[key], depth + 1) for key in keys]
+            return _Dict(keys, items)
+        if hasattr(value, "export") and hasattr(value, "group"):
+            return self._add_leaf(_Point(value, self.form))
+        raise ValueError("Can't lay out values of type {}.".format(type(value).__name__))
+
+    def _add_leaf(self, leaf):
+        self.leaves.append(leaf)
+        return _Leaf(len(self.leaves) - 1)
+
+    def _flatten(self, value, layout, out):
+        if isinstance(layout, _Leaf):
+            out.append(value)
+        elif isinstance(layout, _Const):
+            if value is not None:
+                raise ValueError("The proof does not match the format.")
+        elif isinstance(layout, _Seq):
+            if len(value) != len(layout.items):
+                raise ValueError("The proof does not match the format.")
+            for item, item_layout in zip(value, layout.items):
+                self._flatten(item, item_layout, out)
+        else:
+            if sorted(value) != layout.keys:
+                raise ValueError("The proof does not match the format.")
+            for key, item_layout in zip(layout.keys, layout.items):
+                self._flatten(value[key], item_layout, out)
+
+    def encode(self, nizk):
+        """
+        Encode a proof of the template.
+
+        Raises:
+            ValueError: If the proof does not match the format.
+        """
+        fields = [nizk.responses, nizk.precommitment]
+        if self.has_commitment:
+            fields.append(nizk.commitment)
+        values = []
+        for field, layout in zip(fields, self.structure):
+            self._flatten(field, layout, values)
+
+        out, signs = [], []
+        for value, leaf in zip(values, self.leaves):
+            leaf.write(value, out, signs)
+
+        bitmap = bytearray((len(signs) + 7) // 8)
+        for i, negative in enumerate(signs):
+            if negative:
+                bitmap[i // 8] |= 1 << (i % 8)
+        challenge = nizk.challenge.binary() if nizk.challenge != 0 else b""
+        if nizk.challenge < 0 or len(challenge) > CHALLENGE_SIZE:
+            raise ValueError("The challenge does not fit in {} bytes.".format(CHALLENGE_SIZE))
+        if len(nizk.stmt_hash) != STMT_HASH_SIZE:
+            raise ValueError("The statement hash should take {} bytes.".format(STMT_HASH_SIZE))
+        header = [
+            bytes(bitmap),
+            bytes(CHALLENGE_SIZE - len(challenge)) + challenge,
+            nizk.stmt_hash,
+        ]
+        return b"".join(header + out)
+
+    def decode(self, data):
+        """
+        Decode a proof of the template.
+
+        Args:
+            data: Bytes-like object, e.g., ``bytes`` or a memory-mapped file.
+
+        Raises:
+            ValueError: If the data does not have the size of the proofs of the template.
+        """
+        view = memoryview(data)
+        if len(view) != self.size:
+            raise ValueError("Expected {} bytes, got {}.".format(self.size, len(view)))
+
+        bitmap_size = (self.num_scalars + 7) // 8
+        bitmap = view[:bitmap_size]
+        signs = (bool(bitmap[i // 8] >> (i % 8) & 1) for i in range(self.num_scalars))
+        offset = bitmap_size
+        challenge = Bn.from_binary(bytes(view[offset : offset + CHALLENGE_SIZE]))
+        offset += CHALLENGE_SIZE
+        stmt_hash = bytes(view[offset : offset + STMT_HASH_SIZE])
+
+        values = [
+            leaf.read(view, offset, signs) for leaf, offset in zip(self.leaves, self.offsets)
+        ]
+        fields = [layout.build(values) for layout in self.structure]
+        return NIZK(
+            challenge=challenge,
+            responses=fields[0],
+            precommitment=fields[1],
+            stmt_hash=stmt_hash,
+            commitment=fields[2] if self.has_commitment else None,
+        )